@@ -0,0 +1,8 @@
+"""
+Shared helpers for the protocols in this repository.
+
+Protocols import these with ``from lib.<module> import ...``. When simulating
+locally, run from the repository root so ``lib`` is importable. On the robots,
+copy this folder to ``/data/user_storage/lib`` (the protocols add
+``/data/user_storage`` to ``sys.path``).
+"""
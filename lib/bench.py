@@ -0,0 +1,162 @@
+"""
+Protocol benchmark
+==================
+
+Simulates every protocol under production/ and deprecated/ with lib.sim and
+ranks them by modeled run time. Each protocol runs once with its
+``add_parameters`` defaults and then once per swept value: each parameter is
+varied on its own (others at default) through its minimum and maximum, every
+choice, or both booleans.
+
+Every run records modeled seconds, tips used, gantry path length, module
+actions and gripper moves. Results are written as JSON so they can be kept as
+a baseline and diffed after a change:
+
+    python -m lib.bench --out bench_baseline.json
+    ... edit add_sypro ...
+    python -m lib.bench --baseline bench_baseline.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from lib.sim import REPO_ROOT, parameter_definitions, load_protocol, simulate, stand_in_opentrons
+
+
+SEARCH_DIRS = ("production", "deprecated")
+METRICS = ("seconds", "tips", "path_mm", "module_actions", "gripper_moves")
+TOLERANCE = 0.01     # relative change below which a metric counts as unchanged
+
+
+def protocol_files(dirs=SEARCH_DIRS) -> list[Path]:
+    """Every .py under ``dirs`` that defines run(protocol)."""
+    files = []
+    for folder in dirs:
+        for path in sorted((REPO_ROOT / folder).rglob("*.py")):
+            if "def run(" in path.read_text():
+                files.append(path)
+    return files
+
+
+def sweep(definitions: dict[str, dict]) -> list[dict]:
+    """Defaults first, then one-parameter-at-a-time variations."""
+    runs = [{}]
+    for name, spec in definitions.items():
+        if spec.get("choices"):
+            values = [choice["value"] for choice in spec["choices"]]
+        elif spec["kind"] == "bool":
+            values = [True, False]
+        elif spec["kind"] in ("int", "float"):
+            values = [spec.get("minimum"), spec.get("maximum")]
+        else:
+            values = []
+        for value in values:
+            if value is not None and value != spec["default"]:
+                runs.append({name: value})
+    return runs
+
+
+def benchmark(path: Path, full_sweep: bool = True) -> list[dict]:
+    name = str(path.relative_to(REPO_ROOT))
+    try:
+        with stand_in_opentrons():
+            definitions = parameter_definitions(load_protocol(path))
+    except Exception as error:
+        return [{"protocol": name, "params": {}, "error": f"{type(error).__name__}: {error}"}]
+
+    results = []
+    for params in (sweep(definitions) if full_sweep else [{}]):
+        try:
+            result = simulate(path, params).summary()
+        except Exception as error:
+            result = {"protocol": name, "error": f"{type(error).__name__}: {error}"}
+        result["params"] = params
+        results.append(result)
+    return results
+
+
+def key(result: dict) -> str:
+    params = ",".join(f"{name}={value}" for name, value in sorted(result["params"].items()))
+    return f"{result['protocol']}[{params}]" if params else result["protocol"]
+
+
+def run_all(dirs=SEARCH_DIRS, full_sweep: bool = True) -> list[dict]:
+    results = []
+    for path in protocol_files(dirs):
+        results.extend(benchmark(path, full_sweep))
+    return results
+
+
+def format_table(results: list[dict]) -> str:
+    ranked = sorted(results, key=lambda r: -r.get("seconds", -1))
+    lines = [f"{'minutes':>8} {'tips':>5} {'path m':>7} {'mod':>4} {'grip':>4}  protocol"]
+    for result in ranked:
+        if "error" in result:
+            lines.append(f"{'-':>8} {'-':>5} {'-':>7} {'-':>4} {'-':>4}  {key(result)}  "
+                         f"({result['error']})")
+            continue
+        lines.append(f"{result['seconds'] / 60:8.1f} {result['tips']:5d} "
+                     f"{result['path_mm'] / 1000:7.1f} {result['module_actions']:4d} "
+                     f"{result['gripper_moves']:4d}  {key(result)}")
+    return "\n".join(lines)
+
+
+def diff(baseline: list[dict], results: list[dict], tolerance: float = TOLERANCE) -> tuple[str, int]:
+    """Describe metric changes against a baseline; also return the regression count."""
+    before = {key(result): result for result in baseline}
+    lines, regressions = [], 0
+    for result in results:
+        name = key(result)
+        old = before.pop(name, None)
+        if old is None:
+            lines.append(f"new       {name}")
+            continue
+        if "error" in result or "error" in old:
+            if result.get("error") != old.get("error"):
+                lines.append(f"error     {name}: {old.get('error', 'ok')} -> {result.get('error', 'ok')}")
+                regressions += "error" in result
+            continue
+        changes = []
+        worse = False
+        for metric in METRICS:
+            a, b = old[metric], result[metric]
+            if abs(b - a) > tolerance * max(abs(a), 1):
+                changes.append(f"{metric} {a:g} -> {b:g} ({(b - a) / max(abs(a), 1):+.1%})")
+                worse |= b > a
+        if changes:
+            regressions += worse
+            lines.append(f"{'slower' if worse else 'faster':<9} {name}: " + ", ".join(changes))
+    for name in before:
+        lines.append(f"removed   {name}")
+    return "\n".join(lines) or "no changes", regressions
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Rank protocols by modeled run time.")
+    parser.add_argument("dirs", nargs="*", default=list(SEARCH_DIRS),
+                        help="folders to search (default: production deprecated)")
+    parser.add_argument("--out", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="diff against a JSON file from --out")
+    parser.add_argument("--defaults-only", action="store_true",
+                        help="skip the parameter sweep")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help="relative change treated as noise (default 0.01)")
+    args = parser.parse_args(argv)
+
+    results = run_all(args.dirs, full_sweep=not args.defaults_only)
+    if args.out:
+        Path(args.out).write_text(json.dumps(results, indent=2) + "\n")
+    if args.baseline:
+        report, regressions = diff(json.loads(Path(args.baseline).read_text()), results,
+                                   args.tolerance)
+        print(report)
+        sys.exit(1 if regressions else 0)
+    print(format_table(results))
+
+
+if __name__ == "__main__":
+    main()
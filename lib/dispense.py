@@ -0,0 +1,170 @@
+"""
+Wash-aware multi-dispense planning
+==================================
+
+Protocols that reuse one set of tips for a whole plate (and wash them in
+water troughs instead of swapping) used to wash after every single
+destination, because every transfer ended with a mix in the well.
+
+``plan_dispense`` splits that into two passes:
+
+* a dispense pass. One aspirate serves as many destinations as the tip
+  holds. Every dispense is made into the liquid, just above the well
+  bottom, so small drops don't stay hanging on the tip. That puts the tip
+  in the well contents, so it only goes on to the next well, or back to the
+  source, when the carryover rule allows it, and is washed otherwise. The
+  disposal volume is blown back into the source, but only after a tipful
+  that touched nothing the source must not get.
+* a mix pass (if ``mix`` is given), under the same rule. Nothing is
+  aspirated from the source after that.
+
+The carryover rule works on concentrations, not volumes. ``concentrations``
+gives, for every destination, the concentration of each analyte that
+matters (a metal series, EDTA, ...). Going from well a to well b carries
+``carryover`` µL of a into ``dest_volume`` µL of b. That is fine only if
+it changes every analyte in b by at most ``tolerance`` of its own
+concentration, and never brings an analyte into a well without it. The
+source counts as a well without analytes. Without ``concentrations`` every
+destination counts as different, so each one gets a clean tip (``{}`` for
+every destination says they all hold nothing that matters yet). Both passes
+run in the order that needs the fewest washes: low to high concentration
+within an analyte::
+
+    sypro = Reagent("sypro", trough.wells()[1], tolerance=0.005)
+    contents = [{f"metals {i}": c} for i, c in ...]
+    steps = plan_dispense(sypro, 2.5, plate.rows()[0], max_volume=20,
+                          dest_volume=20, mix=(3, 10), concentrations=contents)
+    run_plan(p20m, steps, wash=lambda: clean_tips(p20m, 20, protocol))
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable
+
+
+CARRYOVER_UL = 0.1     # liquid a wetted tip brings from one well to the next (per channel)
+DISPOSAL_UL = 1.0      # extra aspirated per multi-dispense, blown back into the source
+DISPENSE_MM = 1.0      # dispense height above the well bottom: in the liquid
+
+
+@dataclass
+class Reagent:
+    """A reagent source and how much contamination the wells it goes to can take."""
+    name: str
+    source: object
+    tolerance: float = 0.0             # acceptable relative change of an analyte in a well
+    carryover: float = CARRYOVER_UL
+
+
+@dataclass
+class Step:
+    action: str                        # aspirate, dispense, blow_out, mix or wash
+    volume: float = 0
+    location: object = None
+    repetitions: int = 0
+
+
+def shareable(before: dict, after: dict, reagent: Reagent, dest_volume: float) -> bool:
+    """Can a tip that mixed in a well with ``before`` go on to mix one with ``after``?"""
+    share = reagent.carryover / dest_volume
+    for analyte in set(before) | set(after):
+        carried, present = before.get(analyte, 0.0), after.get(analyte, 0.0)
+        if present == 0:
+            if carried:
+                return False
+        elif share * abs(carried - present) / present > reagent.tolerance:
+            return False
+    return True
+
+
+def mix_order(concentrations: list[dict], reagent: Reagent, dest_volume: float) -> list[int]:
+    """Destination indices in an order that lets the tip go on as often as possible."""
+    def key(i):
+        return (sorted(concentrations[i]), sum(concentrations[i].values()))
+
+    remaining = sorted(range(len(concentrations)), key=key)
+    order = []
+    while remaining:
+        current = concentrations[order[-1]] if order else None
+        following = [i for i in remaining
+                     if current is not None and shareable(current, concentrations[i], reagent, dest_volume)]
+        chosen = (following or remaining)[0]
+        remaining.remove(chosen)
+        order.append(chosen)
+    return order
+
+
+def plan_dispense(reagent: Reagent, volume: float, destinations: list, max_volume: float,
+                  dest_volume: float, mix: tuple[int, float] | None = None,
+                  concentrations: list[dict] | None = None,
+                  disposal: float = DISPOSAL_UL) -> list[Step]:
+    """Steps that put ``volume`` of ``reagent`` in every destination, and mix them."""
+    if volume <= 0 or volume > max_volume:
+        raise ValueError(f"Can't dispense {volume} µL with a {max_volume} µL tip.")
+    if concentrations is not None and len(concentrations) != len(destinations):
+        raise ValueError(f"{len(concentrations)} concentrations for {len(destinations)} destinations.")
+    if volume + disposal > max_volume:
+        disposal = 0
+    per_tip = int((max_volume - disposal) // volume)
+    if concentrations is None:
+        order = list(range(len(destinations)))
+    else:
+        order = mix_order(concentrations, reagent, dest_volume)
+
+    def follows(i, j):
+        return concentrations is not None and shareable(
+            concentrations[i], concentrations[j], reagent, dest_volume)
+
+    def to_source(i):
+        return concentrations is not None and shareable(concentrations[i], {}, reagent, dest_volume)
+
+    chunks = []
+    for i in order:
+        if chunks and len(chunks[-1]) < per_tip and follows(chunks[-1][-1], i):
+            chunks[-1].append(i)
+        else:
+            chunks.append([i])
+
+    steps = []
+    touched = None                     # last well the tip was in since its last wash
+    for chunk in chunks:
+        if touched is not None and not to_source(touched):
+            steps.append(Step("wash"))
+        extra = disposal if len(chunk) > 1 and all(to_source(i) for i in chunk) else 0
+        steps.append(Step("aspirate", volume * len(chunk) + extra, reagent.source))
+        for i in chunk:
+            steps.append(Step("dispense", volume, destinations[i].bottom(DISPENSE_MM)))
+        if extra:
+            steps.append(Step("blow_out", location=reagent.source.top()))
+        touched = chunk[-1]
+    if not mix:
+        return steps
+
+    for i in order:
+        if not follows(touched, i) and touched != i:
+            steps.append(Step("wash"))
+        steps.append(Step("mix", mix[1], destinations[i], mix[0]))
+        touched = i
+    return steps
+
+
+def run_plan(pipette, steps: list[Step], wash: Callable[[], None]) -> None:
+    """Carry out a plan with tips that are already on ``pipette``."""
+    for step in steps:
+        if step.action == "aspirate":
+            pipette.aspirate(step.volume, step.location)
+        elif step.action == "dispense":
+            pipette.dispense(step.volume, step.location)
+        elif step.action == "blow_out":
+            pipette.blow_out(step.location)
+        elif step.action == "mix":
+            pipette.mix(step.repetitions, step.volume, step.location)
+        elif step.action == "wash":
+            wash()
+        else:
+            raise ValueError(f"Unknown step {step.action!r}.")
+
+
+def washes(steps: list[Step]) -> int:
+    return sum(step.action == "wash" for step in steps)
@@ -0,0 +1,226 @@
+"""
+Labware geometry index
+======================
+
+Protocols look wells up as ``plate.rows()[row][col]`` or ``plate.wells()[i]``
+in their inner loops. Every call builds the well lists again (lib.sim also
+sorted them by name), and the spot planners walked the definition dicts
+well by well.
+
+``LabwareIndex`` compiles a definition once into NumPy arrays: well index,
+name, (row, column) and position. A row, a column or a block of them is one
+array lookup. Indexes are cached per load name, so every plate of one kind
+shares one. They cover the JSON in custom_labware/ and the stock
+definitions lib.sim builds from load names. ``take`` turns indices back into
+the wells of a loaded labware.
+
+Custom definitions are parsed and checked once per content. The index
+(geometry arrays plus the rest of the definition as metadata) is then
+stored as ``.npz`` under ``.labware_cache/`` next to ``lib/``, named after
+the SHA-256 of the JSON. An edited definition hashes differently and is
+parsed again, and the entry for the old content is removed. A cache that
+can't be written or read only costs the parse::
+
+    index = labware_index("nunc_384_wellplate_120ul")
+    index.row(2)                          # indices of row C, left to right
+    index.block(range(0, 16, 2), [0])     # every other row of column 1
+    index.names[index.column(3)]          # ['A4', 'B4', ...]
+    index.xyz[index.at("P24")]            # offset from the labware origin
+    wells = index.take(plate, index.row(2)[::2])
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+import tempfile
+import zipfile
+from pathlib import Path
+
+import numpy as np
+
+
+USER_STORAGE = Path(__file__).resolve().parent.parent
+CUSTOM_LABWARE = USER_STORAGE / "custom_labware"
+CACHE = USER_STORAGE / ".labware_cache"
+CACHE_VERSION = 1           # bump when the stored arrays change
+WELL_FIELDS = {"depth": "depth", "volume": "totalLiquidVolume", "diameter": "diameter",
+               "length": "xDimension", "width": "yDimension"}
+
+
+def split_name(name: str) -> tuple[str, int]:
+    """("AB", 12) for well "AB12"."""
+    letters = name.rstrip("0123456789")
+    return letters, int(name[len(letters):])
+
+
+class LabwareIndex:
+    """Wells of one definition in its own order (column by column)."""
+
+    ARRAYS = ("names", "rowcol", "xyz", "grid", *WELL_FIELDS)
+
+    def __init__(self, names, rowcol, xyz, grid, meta: dict, **fields) -> None:
+        self.names = np.asarray(names)
+        self.rowcol = np.asarray(rowcol, dtype=int).reshape(-1, 2)
+        self.xyz = np.asarray(xyz, dtype=float).reshape(-1, 3)
+        self.grid = np.asarray(grid, dtype=int)
+        self.meta = meta
+        for name in WELL_FIELDS:        # NaN where a well doesn't have it
+            setattr(self, name, np.asarray(fields[name], dtype=float))
+        self.by_name = {name: i for i, name in enumerate(self.names.tolist())}
+        self._specs = None
+
+    @classmethod
+    def from_definition(cls, definition: dict) -> LabwareIndex:
+        wells = definition["wells"]
+        names = [name for column in definition["ordering"] for name in column]
+        parts = [split_name(name) for name in names]
+        row_names = sorted({letters for letters, _ in parts}, key=lambda r: (len(r), r))
+        column_numbers = sorted({number for _, number in parts})
+        row_of = {letters: i for i, letters in enumerate(row_names)}
+        column_of = {number: i for i, number in enumerate(column_numbers)}
+
+        rowcol = np.array([(row_of[letters], column_of[number]) for letters, number in parts],
+                          dtype=int).reshape(-1, 2)
+        grid = np.full((len(row_names), len(column_numbers)), -1, dtype=int)
+        grid[rowcol[:, 0], rowcol[:, 1]] = np.arange(len(names))
+        fields = {name: [wells[well].get(key, math.nan) for well in names]
+                  for name, key in WELL_FIELDS.items()}
+        xyz = [(wells[name]["x"], wells[name]["y"], wells[name]["z"]) for name in names]
+        meta = {key: value for key, value in definition.items() if key not in ("wells", "ordering")}
+        return cls(names, rowcol, xyz, grid, meta, **fields)
+
+    def save(self, path: Path) -> None:
+        """Write to a temporary file next to ``path`` and move it into place."""
+        path = Path(path)
+        handle = tempfile.NamedTemporaryFile(dir=path.parent, prefix=f".{path.stem}.", suffix=".tmp",
+                                             delete=False)
+        try:
+            with handle:
+                np.savez(handle, meta=np.array(json.dumps(self.meta)),
+                         **{name: getattr(self, name) for name in self.ARRAYS})
+            os.replace(handle.name, path)
+        except BaseException:
+            Path(handle.name).unlink(missing_ok=True)
+            raise
+
+    @classmethod
+    def load(cls, path: Path) -> LabwareIndex:
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {name: data[name] for name in cls.ARRAYS}
+            meta = json.loads(data["meta"].item())
+        return cls(meta=meta, **arrays)
+
+    @property
+    def specs(self) -> list[dict]:
+        """Definition-style spec of every well (built once, shared; don't modify)."""
+        if self._specs is None:
+            columns = {key: getattr(self, name).tolist() for name, key in WELL_FIELDS.items()}
+            self._specs = []
+            for i, (x, y, z) in enumerate(self.xyz.tolist()):
+                spec = {"x": x, "y": y, "z": z}
+                spec.update((key, values[i]) for key, values in columns.items() if not math.isnan(values[i]))
+                self._specs.append(spec)
+        return self._specs
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.grid.shape
+
+    def at(self, name: str) -> int:
+        return self.by_name[name]
+
+    def indices(self, names) -> np.ndarray:
+        return np.array([self.by_name[name] for name in names], dtype=int)
+
+    def row(self, row: int) -> np.ndarray:
+        indices = self.grid[row]
+        return indices[indices >= 0]
+
+    def column(self, column: int) -> np.ndarray:
+        indices = self.grid[:, column]
+        return indices[indices >= 0]
+
+    def block(self, rows, columns) -> np.ndarray:
+        """Indices of ``rows`` x ``columns`` (-1 where there is no well)."""
+        return self.grid[np.ix_(np.atleast_1d(rows), np.atleast_1d(columns))]
+
+    def rows(self) -> list[np.ndarray]:
+        return [self.row(row) for row in range(self.shape[0])]
+
+    def columns(self) -> list[np.ndarray]:
+        return [self.column(column) for column in range(self.shape[1])]
+
+    @staticmethod
+    def take(labware, indices) -> list:
+        """Wells of a loaded ``labware`` at ``indices``."""
+        wells = labware.wells()
+        return [wells[i] for i in np.atleast_1d(indices)]
+
+
+def validate(definition: dict, load_name: str) -> None:
+    """Raise ValueError if ``definition`` is missing what the helpers and lib.sim read."""
+    for key in ("ordering", "wells", "dimensions", "parameters"):
+        if key not in definition:
+            raise ValueError(f"{load_name}: no {key!r} in the definition.")
+    if definition["parameters"].get("loadName") != load_name:
+        raise ValueError(f"{load_name}: loadName is {definition['parameters'].get('loadName')!r}.")
+    names = [name for column in definition["ordering"] for name in column]
+    if len(set(names)) != len(names):
+        raise ValueError(f"{load_name}: a well is listed twice in the ordering.")
+    for name in names:
+        spec = definition["wells"].get(name)
+        if spec is None:
+            raise ValueError(f"{load_name}: well {name} is in the ordering but not in wells.")
+        if not all(isinstance(spec.get(axis), (int, float)) for axis in "xyz"):
+            raise ValueError(f"{load_name}: well {name} has no x, y, z position.")
+        if not name.rstrip("0123456789") or not name[len(name.rstrip("0123456789")):]:
+            raise ValueError(f"{load_name}: well name {name!r} isn't a row and a column.")
+
+
+def cached_index(path: Path, cache: Path | None = CACHE) -> LabwareIndex:
+    """The index of the definition at ``path``, parsed only if its content is new."""
+    path = Path(path)
+    content = path.read_bytes()
+    digest = hashlib.sha256(content + f"v{CACHE_VERSION}".encode()).hexdigest()[:16]
+    entry = cache / f"{path.stem}.{digest}.npz" if cache is not None else None
+    if entry is not None and entry.exists():
+        try:
+            return LabwareIndex.load(entry)
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+            entry.unlink(missing_ok=True)       # damaged (e.g. an interrupted write); parse again
+    definition = json.loads(content)
+    validate(definition, path.stem)
+    index = LabwareIndex.from_definition(definition)
+    if entry is not None:
+        try:
+            cache.mkdir(exist_ok=True)
+            for stale in cache.glob(f"{path.stem}.*.npz"):
+                stale.unlink()
+            index.save(entry)
+        except OSError:
+            pass
+    return index
+
+
+_INDEXES: dict[str, LabwareIndex] = {}
+
+
+def labware_index(load_name: str, directory: Path = CUSTOM_LABWARE,
+                  cache: Path | None = CACHE) -> LabwareIndex:
+    """The index of ``load_name``: custom from ``directory``, else the lib.sim stock one."""
+    index = _INDEXES.get(load_name)
+    if index is None:
+        path = Path(directory) / f"{load_name}.json"
+        if path.exists():
+            index = cached_index(path, cache)
+        else:
+            from lib.sim import stock_definition     # lib.sim imports this module
+            index = LabwareIndex.from_definition(stock_definition(load_name))
+        _INDEXES[load_name] = index
+    return index
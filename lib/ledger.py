@@ -0,0 +1,384 @@
+"""
+Liquid-volume ledger
+====================
+
+``load_liquid`` tells the app what goes into each well at the start of a run,
+but nothing keeps count afterwards. That is why reservoirs get loaded with
+far more than a run needs, and why aspirations go to a fixed ``.bottom(1)``
+whatever is left in the well.
+
+``VolumeLedger`` keeps one NumPy array of volumes per labware. A pipette
+wrapped with ``track`` updates it on every ``aspirate``, ``dispense``,
+``transfer``, ``distribute`` and ``consolidate`` (``mix`` moves nothing). A
+call works out which wells it touches from the active nozzle layout and the
+well outlines, so an 8-channel in a reservoir draws eight times the volume
+and a 96-channel on a plate draws from every well under a tip.
+
+An aspirate that would take a well below its dead volume is flagged *before*
+it happens. The ledger pauses the run for a refill and then carries on as if
+the well was loaded again (``strict=True`` raises ``ValueError`` instead, so
+a simulation fails right away).
+
+Heights come from the cross-section of the well. ``shape`` declares a
+round (U or V) bottom, whose cross-section grows from nothing at the very
+bottom to the full well at ``bottom`` mm, and a dead volume for one
+labware. ``meniscus`` is given the volume about to be drawn, so the tip
+starts deep enough to still be under the surface when the aspirate ends::
+
+    ledger = VolumeLedger(protocol)
+    ledger.shape(deep_plate, bottom=8.85, dead_volume=500)
+    ledger.load_liquid(trough.wells()[0], buffer, 12000)
+    p300m = ledger.track(protocol.load_instrument("p300_multi_gen2", "left"))
+    p300m.aspirate(200, ledger.meniscus(trough.wells()[0], 200))
+    ...
+    protocol.comment(ledger.report())
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+
+
+PITCH = 9.0             # mm between neighbouring nozzles
+IMMERSION = 2.0         # mm a tip goes below the surface
+FLOOR = 1.0             # mm above the bottom a tip never goes below
+
+
+@dataclass
+class Plate:
+    """Per-well arrays for one labware."""
+    labware: object
+    wells: list
+    centers: np.ndarray                 # (wells, 2) x/y in deck coordinates
+    half: np.ndarray                    # (wells, 2) half the x/y extent of each well
+    area: np.ndarray                    # mm², so µL / area = mm of liquid
+    depth: np.ndarray
+    capacity: np.ndarray
+    dead: np.ndarray                    # µL an aspirate must leave behind
+    bottom: np.ndarray = None           # mm of round bottom under the straight walls
+    volume: np.ndarray = None
+    loaded: np.ndarray = None
+    lowest: np.ndarray = None           # least each well held during the run
+    drawn: np.ndarray = None
+
+    def __post_init__(self) -> None:
+        count = len(self.wells)
+        self.bottom = np.zeros(count) if self.bottom is None else self.bottom
+        self.volume = np.zeros(count)
+        self.loaded = np.zeros(count)
+        self.lowest = np.full(count, np.inf)
+        self.drawn = np.zeros(count)
+
+    def index(self, well) -> int:
+        return self.wells.index(well)
+
+    def heights(self, volume: np.ndarray | None = None) -> np.ndarray:
+        """Liquid heights; in the round bottom the cross-section grows linearly with height."""
+        volume = np.maximum(self.volume if volume is None else volume, 0.0)
+        bowl = self.area * self.bottom / 2
+        in_bowl = np.sqrt(2 * volume * self.bottom / self.area)
+        above = self.bottom + (volume - bowl) / self.area
+        return np.minimum(np.where(volume <= bowl, in_bowl, above), self.depth)
+
+
+@dataclass
+class Entry:
+    """One liquid-handling call and where it left the wells it touched."""
+    action: str
+    labware: str
+    wells: list[str]
+    volume: float                       # per tip, + into the wells, - out of them
+    remaining: list[float]
+    heights: list[float]
+
+
+@dataclass
+class Layout:
+    """Active nozzles as a grid, growing from the primary nozzle."""
+    rows: int
+    cols: int
+    down: bool = True                   # primary nozzle in row A, so the rest are in front of it
+    right: bool = True                  # primary nozzle in column 1
+
+    def offsets(self, spacing: int = 1) -> np.ndarray:
+        rows = np.arange(0, self.rows, spacing) * PITCH * (-1 if self.down else 1)
+        cols = np.arange(0, self.cols, spacing) * PITCH * (1 if self.right else -1)
+        return np.array([(x, y) for y in rows for x in cols])
+
+
+def nozzle_layout(channels: int, style="ALL", start: str | None = None,
+                  end: str | None = None) -> Layout:
+    style = getattr(style, "name", style)
+    start = start or "A1"
+    down, right = start[0] == "A", start[1:] == "1"
+    if channels == 1 or style == "SINGLE":
+        return Layout(1, 1)
+    if style == "ROW":
+        return Layout(1, 12, down, right)
+    if style == "PARTIAL_COLUMN":
+        return Layout(abs(ord(end[0]) - ord(start[0])) + 1, 1, down, right)
+    if style == "COLUMN" or channels == 8:
+        return Layout(8, 1, down, right)
+    return Layout(8, 12, down, right)
+
+
+class VolumeLedger:
+    """Volumes of every well the tracked pipettes touch."""
+
+    def __init__(self, protocol, dead_volume: float = 0.0, strict: bool = False) -> None:
+        self.protocol = protocol
+        self.dead_volume = dead_volume
+        self.strict = strict
+        self.plates: dict[int, Plate] = {}
+        self.history: list[Entry] = []
+        self.underruns: list[str] = []
+        self.overfills: list[str] = []
+
+    # -- wells ----------------------------------------------------------------
+
+    def plate(self, labware) -> Plate:
+        key = id(labware)
+        if key not in self.plates:
+            wells = labware.wells()
+            centers = np.array([_xy(well.center()) for well in wells])
+            size = np.array([_size(well) for well in wells], dtype=float)
+            depth = np.array([well.depth for well in wells], dtype=float)
+            capacity = np.array([well.max_volume for well in wells], dtype=float)
+            circular = np.array([bool(getattr(well, "diameter", None)) for well in wells])
+            known = ~np.isnan(size[:, 0])
+            area = np.where(circular, np.pi * (size[:, 0] / 2) ** 2,
+                            np.where(known, size[:, 0] * size[:, 1], capacity / depth))
+            size[~known] = _spacing(centers) * 0.9
+            dead = np.full(len(wells), self.dead_volume)
+            self.plates[key] = Plate(labware, wells, centers, size / 2, area, depth, capacity, dead)
+        return self.plates[key]
+
+    def shape(self, labware, bottom: float = 0.0, dead_volume: float | None = None) -> None:
+        """Give ``labware``'s wells a round bottom ``bottom`` mm deep and their own dead volume."""
+        plate = self.plate(labware)
+        plate.bottom[:] = bottom
+        if dead_volume is not None:
+            plate.dead[:] = dead_volume
+
+    def load_liquid(self, well, liquid, volume: float) -> None:
+        """``well.load_liquid`` that also puts the volume in the ledger."""
+        well.load_liquid(liquid=liquid, volume=volume)
+        plate = self.plate(well.parent)
+        i = plate.index(well)
+        plate.volume[i] = plate.loaded[i] = volume
+        plate.lowest[i] = min(plate.lowest[i], volume)
+        if volume > plate.capacity[i]:
+            self.overfills.append(f"{well}: {volume:g} µL loaded into a {plate.capacity[i]:g} µL well")
+
+    def volume(self, well) -> float:
+        plate = self.plate(well.parent)
+        return float(plate.volume[plate.index(well)])
+
+    def height(self, well, drawn: float = 0.0) -> float:
+        """Expected liquid height above the bottom of ``well`` (mm) once ``drawn`` µL are out."""
+        plate = self.plate(well.parent)
+        i = plate.index(well)
+        volume = plate.volume.copy()
+        volume[i] -= drawn
+        return float(plate.heights(volume)[i])
+
+    def meniscus(self, well, volume: float = 0.0, immersion: float = IMMERSION, floor: float = FLOOR):
+        """Where to aspirate ``volume`` µL: ``immersion`` mm under the surface as it will be
+        at the end of the aspirate, but not below ``floor``."""
+        return well.bottom(max(self.height(well, volume) - immersion, floor))
+
+    # -- pipetting ------------------------------------------------------------
+
+    def track(self, pipette, spacing: int = 1) -> "TrackedPipette":
+        """Wrap ``pipette`` so its liquid handling updates the ledger.
+
+        ``spacing=2`` is for racks with a tip on every other nozzle (the
+        96-channel's 24-tip layouts).
+        """
+        return TrackedPipette(self, pipette, spacing)
+
+    def footprint(self, location, offsets: np.ndarray):
+        """The plate a location is in and the tips that end up in each of its wells."""
+        well = _well(location)
+        if well is None:
+            return None, None
+        plate = self.plate(well.parent)
+        # the labware may have moved since its outlines were taken, so work relative to the well
+        center = plate.centers[plate.index(well)]
+        point = center + _xy(location) - _xy(well.center()) if hasattr(location, "point") else center
+        nozzles = point + offsets
+        inside = (np.abs(nozzles[:, np.newaxis, :] - plate.centers) <= plate.half).all(axis=2)
+        tips = inside.sum(axis=0)
+        if not tips.any():
+            tips[plate.index(well)] = 1
+        return plate, tips
+
+    def move(self, action: str, location, volume: float, offsets: np.ndarray) -> None:
+        """Book ``volume`` µL per tip into (+) or out of (-) the wells under the tips."""
+        plate, tips = self.footprint(location, offsets)
+        if plate is None or not volume:
+            return
+        change = volume * tips
+        if volume < 0:
+            self._check(plate, tips, change)
+            plate.drawn -= change
+        plate.volume += change
+        plate.lowest = np.minimum(plate.lowest, plate.volume)
+        touched = np.nonzero(tips)[0]
+        heights = plate.heights()
+        self.history.append(Entry(action, str(plate.labware),
+                                  [plate.wells[i].well_name for i in touched], volume,
+                                  plate.volume[touched].tolist(), heights[touched].tolist()))
+
+    def _check(self, plate: Plate, tips: np.ndarray, change: np.ndarray) -> None:
+        short = (tips > 0) & (plate.volume + change < plate.dead - 1e-9)
+        if not short.any():
+            return
+        names = ", ".join(plate.wells[i].well_name for i in np.nonzero(short)[0])
+        needed = float(-change[short].max())
+        left = float(plate.volume[short].min())
+        message = (f"{plate.labware} {names}: next aspirate needs {needed:g} µL per well, "
+                   f"about {left:g} µL left.")
+        self.underruns.append(message)
+        if self.strict:
+            raise ValueError(f"Under-run: {message}")
+        self.protocol.pause(f"Refill {message}")
+        refill = short & (plate.loaded > 0)
+        plate.volume[refill] = plate.loaded[refill]
+
+    # -- reporting ------------------------------------------------------------
+
+    def report(self) -> str:
+        """Loaded vs used per source, and every under-run or overfill."""
+        lines = []
+        for plate in self.plates.values():
+            sources = plate.loaded > 0
+            if not sources.any():
+                continue
+            spare = np.maximum(plate.lowest[sources] - plate.dead[sources], 0.0)
+            lines.append(f"{plate.labware}: {plate.loaded[sources].sum():g} µL loaded, "
+                         f"{plate.drawn[sources].sum():g} µL drawn, "
+                         f"{spare.sum():g} µL never needed.")
+        lines += [f"Over capacity: {message}" for message in self.overfills]
+        lines += [f"Under-run: {message}" for message in self.underruns]
+        return "\n".join(lines)
+
+
+class TrackedPipette:
+    """A pipette whose liquid handling goes through a ``VolumeLedger``."""
+
+    def __init__(self, ledger: VolumeLedger, pipette, spacing: int = 1) -> None:
+        self._ledger = ledger
+        self._pipette = pipette
+        self._spacing = spacing
+        self._channels = getattr(pipette, "channels", 1)
+        self._layout = nozzle_layout(self._channels)
+
+    def __getattr__(self, name):
+        return getattr(self._pipette, name)
+
+    def _offsets(self) -> np.ndarray:
+        return self._layout.offsets(self._spacing)
+
+    def configure_nozzle_layout(self, style, start: str | None = None, end: str | None = None,
+                                **kwargs):
+        self._layout = nozzle_layout(self._channels, style, start, end)
+        if start is not None:
+            kwargs["start"] = start
+        if end is not None:
+            kwargs["end"] = end
+        return self._pipette.configure_nozzle_layout(style=style, **kwargs)
+
+    def aspirate(self, volume: float | None = None, location=None, rate: float = 1.0, **kwargs):
+        if volume is None:
+            volume = self._pipette.max_volume - self._pipette.current_volume
+        self._ledger.move("aspirate", location, -volume, self._offsets())
+        self._pipette.aspirate(volume, location, rate, **kwargs)
+        return self
+
+    def dispense(self, volume: float | None = None, location=None, rate: float = 1.0, **kwargs):
+        if volume is None:
+            volume = self._pipette.current_volume
+        self._ledger.move("dispense", location, volume, self._offsets())
+        self._pipette.dispense(volume, location, rate, **kwargs)
+        return self
+
+    def transfer(self, volume, source, dest, **kwargs):
+        self._book("transfer", volume, source, dest)
+        self._pipette.transfer(volume, source, dest, **kwargs)
+        return self
+
+    def distribute(self, volume, source, dest, **kwargs):
+        self._book("distribute", volume, source, dest)
+        self._pipette.distribute(volume, source, dest, **kwargs)
+        return self
+
+    def consolidate(self, volume, source, dest, **kwargs):
+        self._book("consolidate", volume, source, dest)
+        self._pipette.consolidate(volume, source, dest, **kwargs)
+        return self
+
+    def _book(self, action: str, volume, source, dest) -> None:
+        sources, dests = _flatten(source), _flatten(dest)
+        count = max(len(sources), len(dests))
+        volumes = list(volume) if isinstance(volume, (list, tuple, np.ndarray)) else [volume] * count
+        if len(sources) == 1:
+            sources = sources * count
+        if len(dests) == 1:
+            dests = dests * count
+        if not len(sources) == len(dests) == len(volumes):
+            raise ValueError(f"Can't pair {len(sources)} sources with {len(dests)} "
+                             f"destinations and {len(volumes)} volumes.")
+        offsets = self._offsets()
+        for vol, src, dst in zip(volumes, sources, dests):
+            self._ledger.move(action, src, -vol, offsets)
+            self._ledger.move(action, dst, vol, offsets)
+
+
+def _flatten(locations) -> list:
+    if not isinstance(locations, (list, tuple)):
+        return [locations]
+    flat = []
+    for item in locations:
+        flat.extend(_flatten(item))
+    return flat
+
+
+def _well(location):
+    """The well a Well or Location points at, None for trash bins and the like."""
+    if hasattr(location, "well_name"):
+        return location
+    labware = getattr(location, "labware", None)
+    if hasattr(labware, "well_name"):
+        return labware
+    if hasattr(labware, "as_well"):
+        try:
+            return labware.as_well()
+        except Exception:
+            return None
+    return None
+
+
+def _xy(location) -> np.ndarray:
+    point = location.point
+    return np.array([point.x, point.y], dtype=float)
+
+
+def _size(well) -> tuple[float, float]:
+    diameter = getattr(well, "diameter", None)
+    if diameter:
+        return diameter, diameter
+    length, width = getattr(well, "length", None), getattr(well, "width", None)
+    if length and width:
+        return length, width
+    return np.nan, np.nan
+
+
+def _spacing(centers: np.ndarray) -> float:
+    """Centre-to-centre distance of the closest wells; a lone well spans the deck slot."""
+    if len(centers) < 2:
+        return 1000.0
+    gaps = np.linalg.norm(centers[:, np.newaxis] - centers, axis=2)
+    return float(gaps[gaps > 0].min())
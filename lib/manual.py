@@ -0,0 +1,164 @@
+"""
+Manual steps, notifications and operator latency
+================================================
+
+A ``protocol.pause`` stops the robot until someone notices it. With one
+pause per centrifuge spin, foil removal and plate return, most of an ICP-MS
+run is the robot waiting for a person.
+
+``ManualSteps`` changes that in two ways:
+
+* ``request`` hands the operator a step without stopping the robot. Robot
+  work that doesn't need the plate in question runs right after it, and
+  ``wait`` pauses once for everything requested so far, with all the
+  actions in one message.
+* every pause is pushed to a local endpoint with the action and how long
+  it should take, so nobody has to watch the touchscreen. After the run is
+  resumed, the time from request to resume and how long the robot sat
+  paused are appended to a CSV log.
+
+The endpoint comes from ``notify.json`` next to ``lib/`` (on the robot,
+``/data/user_storage/notify.json``), e.g. ``{"url": "http://10.0.0.5:8080/ot2"}``
+for a JSON POST or ``{"url": "tcp://10.0.0.5:9000"}`` for a JSON line on a
+socket. Without the file, or when a notification fails, the run goes on
+with the plain pause. Nothing is sent or logged while simulating::
+
+    manual = ManualSteps(protocol, metadata['protocolName'])
+    manual.request("Remove the foil and spin the desalt plate, then put it in slot 1.", minutes=5)
+    add_acid(protocol)          # robot-only work while the operator is busy
+    manual.wait()
+    ...
+    protocol.comment(manual.report())
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+import socket
+import time
+import urllib.request
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlparse
+
+
+USER_STORAGE = Path(__file__).resolve().parent.parent
+CONFIG = USER_STORAGE / "notify.json"
+LOG = USER_STORAGE / "operator_log.csv"
+TIMEOUT_S = 2.0
+SCHEMES = ("http", "https", "tcp")
+
+
+@dataclass
+class Request:
+    action: str
+    minutes: float
+    issued: float            # time.monotonic() when handed to the operator
+
+
+@dataclass
+class Wait:
+    actions: list[str]
+    expected: float          # s the actions should take
+    response: float          # s from the first request to the resume
+    idle: float              # s the robot sat paused
+
+
+def load_endpoint(path: Path = CONFIG) -> str | None:
+    """The ``url`` from ``path``, or None if there is none we can send to."""
+    try:
+        config = json.loads(Path(path).read_text())
+    except (OSError, ValueError):
+        return None
+    url = config.get("url") if isinstance(config, dict) else None
+    if not isinstance(url, str) or urlparse(url).scheme not in SCHEMES:
+        return None
+    return url
+
+
+def send(url: str, message: dict) -> None:
+    """POST ``message`` as JSON, or write it as one line to a ``tcp://`` socket."""
+    data = json.dumps(message).encode()
+    target = urlparse(url)
+    if target.scheme == "tcp":
+        with socket.create_connection((target.hostname, target.port), timeout=TIMEOUT_S) as conn:
+            conn.sendall(data + b"\n")
+    else:
+        request = urllib.request.Request(url, data, {"Content-Type": "application/json"})
+        urllib.request.urlopen(request, timeout=TIMEOUT_S).close()
+
+
+class ManualSteps:
+    """Operator steps of one run, batched into as few pauses as possible."""
+
+    def __init__(self, protocol, name: str = "", url: str | None = None,
+                 log: Path | None = LOG) -> None:
+        self.protocol = protocol
+        self.name = name
+        self.simulating = protocol.is_simulating()
+        self.url = None if self.simulating else (url or load_endpoint())
+        self.log = None if self.simulating else log
+        self.pending: list[Request] = []
+        self.waits: list[Wait] = []
+
+    def notify(self, event: str, actions: list[str], minutes: float) -> None:
+        if self.url is None:
+            return
+        message = {"protocol": self.name, "event": event, "actions": actions,
+                   "expected_minutes": minutes, "time": datetime.now().isoformat(timespec="seconds")}
+        try:
+            send(self.url, message)
+        except Exception as error:      # a failed push must never stop the run
+            self.protocol.comment(f"Notification to {self.url} failed: {error}")
+
+    def request(self, action: str, minutes: float = 0) -> None:
+        """Give the operator a step; the robot keeps going until ``wait``."""
+        self.pending.append(Request(action, minutes, time.monotonic()))
+        self.protocol.comment(f"Operator: {action}")
+        self.notify("request", [action], minutes)
+
+    def wait(self) -> None:
+        """One pause for every step requested since the last one."""
+        if not self.pending:
+            return
+        actions = [request.action for request in self.pending]
+        minutes = max(request.minutes for request in self.pending)
+        self.notify("pause", actions, minutes)
+        message = " ".join(f"{i}) {action}" for i, action in enumerate(actions, 1)) if len(actions) > 1 else actions[0]
+        paused = time.monotonic()
+        self.protocol.pause(message + " Resume when done.")
+        resumed = time.monotonic()
+        if self.simulating:
+            paused = resumed = self.pending[0].issued
+        self.waits.append(Wait(actions, 60 * minutes, resumed - self.pending[0].issued, resumed - paused))
+        self._log(self.waits[-1])
+        self.pending = []
+
+    def pause(self, action: str, minutes: float = 0) -> None:
+        """A step the robot has nothing to do during."""
+        self.pending.append(Request(action, minutes, time.monotonic()))
+        self.wait()
+
+    def _log(self, wait: Wait) -> None:
+        if self.log is None:
+            return
+        new = not self.log.exists()
+        try:
+            with open(self.log, "a", newline="") as handle:
+                writer = csv.writer(handle)
+                if new:
+                    writer.writerow(["time", "protocol", "actions", "expected_s", "response_s", "robot_idle_s"])
+                writer.writerow([datetime.now().isoformat(timespec="seconds"), self.name,
+                                 " | ".join(wait.actions), f"{wait.expected:.0f}", f"{wait.response:.0f}",
+                                 f"{wait.idle:.0f}"])
+        except OSError as error:
+            self.protocol.comment(f"Couldn't write {self.log}: {error}")
+
+    def report(self) -> str:
+        steps = sum(len(wait.actions) for wait in self.waits)
+        idle = sum(wait.idle for wait in self.waits)
+        late = sum(max(wait.response - wait.expected, 0) for wait in self.waits)
+        return (f"{steps} manual steps in {len(self.waits)} pauses; robot paused {idle / 60:.1f} min, "
+                f"operator {late / 60:.1f} min over the expected step times.")
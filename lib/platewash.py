@@ -0,0 +1,102 @@
+"""
+Plate washing for a stack of plates
+===================================
+
+Washes every plate of a work set together instead of plate by plate. A
+wash cycle is made of passes:
+
+* a fill pass puts ``volume`` in every well of every plate, multi-dispensed
+  from one water well per plate, and starts each plate's soak;
+* a consolidate pass empties the plates into the waste in the same order,
+  as many wells per trip as the tip holds. It only waits on a plate's soak
+  for whatever of it the other plates' fills didn't cover.
+
+So with a few plates the soak costs nothing, and nothing is mixed well by
+well. Water wells are used in order, one per plate and cycle; when they run
+out, or the waste would overflow, the run pauses for a refill or an empty::
+
+    wash = PlateWash(protocol, p300m, plates, water=trough.wells(), waste=res1.wells()[0],
+                     volume=30, soak=60)
+    wash.empty(20)
+    wash.run(cycles=3)
+    protocol.comment(wash.report())
+"""
+
+from __future__ import annotations
+
+from lib.timers import Deadline, now
+
+
+WASTE_FILL = 0.9       # fraction of the waste well used before asking for it to be emptied
+
+
+class PlateWash:
+    """Fill, soak and empty passes over a set of plates with one pipette."""
+
+    def __init__(self, protocol, pipette, plates: list, water: list, waste, rows=(0, 1),
+                 volume: float = 30, soak: float = 60) -> None:
+        self.protocol = protocol
+        self.pipette = pipette
+        self.plates = plates
+        self.water = water
+        self.waste = waste
+        self.rows = rows
+        self.volume = volume
+        self.soak = soak
+        self.next_water = 0
+        self.waste_volume = 0.0
+        self.waits: list[Deadline] = []
+        self.start = now(protocol)
+
+    def wells(self, plate) -> list:
+        """Wells the pipette's primary nozzle visits on ``plate``."""
+        return [well for row in self.rows for well in plate.rows()[row]]
+
+    def _water(self):
+        if self.next_water == len(self.water):
+            self.protocol.pause("Out of wash water. Refill the water troughs.")
+            self.next_water = 0
+        well = self.water[self.next_water]
+        self.next_water += 1
+        return well
+
+    def _consolidate(self, plate, volume: float) -> None:
+        wells = self.wells(plate)
+        removed = volume * len(wells) * self.pipette.channels
+        if self.waste_volume + removed > WASTE_FILL * self.waste.max_volume:
+            self.protocol.pause("Empty the waste reservoir.")
+            self.waste_volume = 0.0
+        self.pipette.consolidate(volume, wells, self.waste.top(), new_tip='never')
+        self.waste_volume += removed
+
+    def empty(self, volume: float) -> None:
+        """Take the reactions out of every plate."""
+        self.pipette.pick_up_tip()
+        for plate in self.plates:
+            self._consolidate(plate, volume)
+        self.pipette.return_tip()
+
+    def cycle(self) -> None:
+        """One fill pass and one consolidate pass, with fresh tips."""
+        self.pipette.pick_up_tip()
+        soaks = []
+        for plate in self.plates:
+            self.pipette.distribute(self.volume, self._water(), self.wells(plate), new_tip='never')
+            soaks.append(Deadline(self.protocol, seconds=self.soak, label=f"soak {plate}"))
+        for plate, soak in zip(self.plates, soaks):
+            soak.wait()
+            self._consolidate(plate, self.volume)
+        self.pipette.return_tip()
+        self.waits += soaks
+
+    def run(self, cycles: int) -> None:
+        for _ in range(cycles):
+            self.cycle()
+
+    def report(self) -> str:
+        minutes = (now(self.protocol) - self.start) / 60
+        overlapped = sum(soak.overlapped for soak in self.waits) / 60
+        soaked = sum(soak.duration for soak in self.waits) / 60
+        return (f"Washed {len(self.plates)} plate(s) in {minutes:.1f} min "
+                f"({minutes / len(self.plates):.1f} min per plate); "
+                f"{overlapped:.1f} of {soaked:.1f} min of soaking overlapped with other plates.")
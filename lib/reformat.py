@@ -0,0 +1,153 @@
+"""
+Plate reformatting with multi-channel groupings
+===============================================
+
+Reformatting protocols used to loop over wells and call ``transfer`` once per
+well, with a fresh tip each time, whatever pipette was loaded. A multi-channel
+can move a whole run of wells at once when the source wells and the
+destination wells both sit one nozzle pitch (9 mm) apart in a column, in
+the same order.
+
+``map_wells`` turns a mapping function into (source, destination) pairs.
+``plan_reformat`` chains the pairs whose sources and destinations both
+continue one nozzle pitch towards the front, and cuts every chain into
+groups of at most ``channels`` wells. Each group is one partial-column
+pickup. Groups that start from the same source wells share their tips. A
+single-channel pipette, or labware whose pitch doesn't match the nozzles
+(the Thomson 24 well plates are 18.6 mm apart), gives groups of one::
+
+    pairs = map_wells(wells24, plate96, lambda plate, well: well*4 + plate)
+    groups = plan_reformat(pairs, channels=p300m.channels)
+    protocol.comment(report(groups, volume, p300m.max_volume))
+    run_reformat(p300m, groups, volume, tips)
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Callable
+
+from lib.tips import ROWS
+
+
+NOZZLE_PITCH_MM = 9.0
+
+
+@dataclass
+class Group:
+    """Wells one pickup serves: ``sources`` back to front, one row of ``dests`` per trip."""
+    sources: list
+    dests: list[list]
+
+    @property
+    def tips(self) -> int:
+        return len(self.sources)
+
+
+def map_wells(sources: list, dest, mapping: Callable[[int, int], int | None]) -> list[tuple]:
+    """(source, destination) for every well of ``sources``.
+
+    ``mapping(plate, well)`` gives the index into ``dest.wells()`` for well
+    number ``well`` of source plate number ``plate``, or None to skip it.
+    """
+    dest_wells = dest.wells()
+    pairs = []
+    for plate, labware in enumerate(sources):
+        for well, source in enumerate(labware.wells()):
+            index = mapping(plate, well)
+            if index is not None:
+                pairs.append((source, dest_wells[index]))
+    return pairs
+
+
+def _key(well) -> tuple:
+    point = well.center().point
+    return (id(well.parent), round(point[0], 1), round(point[1], 1))
+
+
+def plan_reformat(pairs: list[tuple], channels: int = 1, pitch: float = NOZZLE_PITCH_MM,
+                  key: Callable[[object], tuple] = _key) -> list[Group]:
+    """Fewest pickups that carry out ``pairs`` with up to ``channels`` nozzles.
+
+    ``key`` gives (labware, x, y) for a source or destination; the default
+    reads loaded wells.
+    """
+    channels = min(channels, ROWS)
+    by_source = {}
+    for pair in pairs:
+        by_source.setdefault(key(pair[0]), []).append(pair)
+
+    def following(pair):
+        """The pair one nozzle further forward on both sides, if there is one."""
+        source, dest = key(pair[0]), key(pair[1])
+        for candidate in by_source.get((source[0], source[1], round(source[2] - pitch, 1)), []):
+            if key(candidate[1]) == (dest[0], dest[1], round(dest[2] - pitch, 1)):
+                return candidate
+        return None
+
+    nexts = {id(pair): following(pair) for pair in pairs} if channels > 1 else {}
+    followers = {id(pair) for pair in nexts.values() if pair is not None}
+    groups: dict[tuple, Group] = {}
+    for pair in pairs:
+        if id(pair) in followers:
+            continue
+        chain = [pair]
+        while nexts.get(id(chain[-1])) is not None:
+            chain.append(nexts[id(chain[-1])])
+        for start in range(0, len(chain), channels):
+            run = chain[start:start + channels]
+            sources = [source for source, _ in run]
+            dests = [dest for _, dest in run]
+            start_key = tuple(key(source) for source in sources)
+            if start_key in groups:
+                groups[start_key].dests.append(dests)
+            else:
+                groups[start_key] = Group(sources, [dests])
+    return list(groups.values())
+
+
+def trips(volume: float, max_volume: float) -> int:
+    return math.ceil(volume / max_volume)
+
+
+def report(groups: list[Group], volume: float, max_volume: float) -> str:
+    """Tips, pickups and gantry moves against one pickup and tip per well."""
+    wells = sum(group.tips * len(group.dests) for group in groups)
+    tips = sum(group.tips for group in groups)
+    per_well = trips(volume, max_volume)
+    # a pickup, an aspirate and a dispense per trip, and the tip going back
+    moves = sum(2 + 2 * per_well * len(group.dests) for group in groups)
+    naive = wells * (2 + 2 * per_well)
+    largest = max((group.tips for group in groups), default=0)
+    line = (f"Reformat: {wells} wells in {len(groups)} pickups of up to {largest} tips; "
+            f"{tips} tips (saves {wells - tips}), {moves} moves (saves {naive - moves}) "
+            f"against one tip per well")
+    if largest <= 1:
+        line += " (no multi-channel grouping for this pipette and labware)"
+    return line
+
+
+def primary(group: Group, pipette, tips) -> int:
+    """Index in ``group`` of the well the pipette's primary nozzle goes to."""
+    # A1 for full columns and A1 starts, otherwise the front tip
+    first = group.tips == ROWS or tips.pool(pipette).start == "A1" or pipette.channels == 1
+    return 0 if first else -1
+
+
+def run_reformat(pipette, groups: list[Group], volume: float, tips) -> None:
+    """Carry out a plan, picking up tips through ``tips`` (a ``TipAllocator``).
+
+    Used tips go to the pipette's dirty rack if it has one, otherwise to the
+    trash, never back among the clean tips.
+    """
+    dirty = bool(tips.pool(pipette).dirty_racks)
+    for group in groups:
+        tips.pickup_tips(group.tips, pipette)
+        index = primary(group, pipette, tips)
+        for dests in group.dests:
+            pipette.transfer(volume, group.sources[index], dests[index], new_tip='never')
+        if dirty:
+            tips.return_tips(pipette)
+        else:
+            pipette.drop_tip()
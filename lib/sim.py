@@ -0,0 +1,1121 @@
+"""
+Offline dry-run simulator
+=========================
+
+Runs any ``run(protocol)`` in this repository against a stand-in
+ProtocolContext and models how long each step would take on the robot. No
+robot, network or Opentrons install is needed: while a protocol is loaded and
+run, ``opentrons``, ``opentrons.protocol_api`` and ``opentrons.types`` are
+replaced by the stand-ins below.
+
+The result is a ``Timeline`` of steps (move, aspirate, dispense, mix, tip
+pickup/drop, delay, pause, gripper, module) with modeled durations, plus the
+total gantry path length and tips used per pipette.
+
+The model is deliberately simple and meant for comparing protocol variants,
+not for predicting a run to the second:
+    * Gantry moves are trapezoidal per axis. Moves between labware rise to
+      SAFE_Z first; moves within one labware go straight.
+    * Aspirate/dispense take volume / flow rate, plus a plunger settle.
+    * Tip pickup/drop, gripper moves and module actions are fixed costs.
+    * Pauses cost no robot time but are counted (they wait on a person).
+    * Stock labware geometry is approximated from the load name; custom
+      labware is read from custom_labware/ through the lib.geometry cache.
+
+Usage:
+    python -m lib.sim production/dsf/dsf_30_metals_triplicate.py
+    python -m lib.sim production/xo/xo_standard.py --param samples=16 --steps
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import re
+import sys
+import types
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from lib.geometry import labware_index, split_name as _split_name
+
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+CUSTOM_LABWARE = REPO_ROOT / "custom_labware"
+
+
+# ---------------------------------------------------------------------------
+# Timing model  (mm, s, µL)
+# ---------------------------------------------------------------------------
+
+XY_SPEED = 400          # mm/s
+XY_ACC = 1000           # mm/s^2
+Z_SPEED = 125           # mm/s
+Z_ACC = 800             # mm/s^2
+SAFE_Z = 150            # travel height between labware (mm above deck)
+
+PLUNGER_SETTLE = 0.2    # per aspirate/dispense
+TIP_PICKUP = 5.0
+TIP_PICKUP_96 = 12.0
+TIP_DROP = 3.0
+BLOW_OUT = 1.0
+TOUCH_TIP = 2.0
+
+GRIPPER_MOVE = 18.0
+MAGNET_MOVE = 3.0
+LATCH = 2.0
+SHAKE_RAMP = 5.0
+TEMP_RATE = 0.1         # °C/s for temperature ramps
+MODULE_ACTION = 1.0     # anything else a module does
+
+# Default flow rates (µL/s) by nominal pipette volume.
+FLOW_RATES = {20: 7.56, 50: 8.0, 300: 92.86, 1000: 274.7}
+FLEX_FLOW_RATE = 160.0
+
+# Deck slot origins (front-left corner of the slot).
+OT2_SLOTS = {str(n): (((n - 1) % 3) * 132.5, ((n - 1) // 3) * 90.5) for n in range(1, 13)}
+FLEX_SLOTS = {f"{row}{col}": ((col - 1) * 164.0, (3 - "ABCD".index(row)) * 107.0)
+              for row in "ABCD" for col in range(1, 5)}
+OT2_HOME = (418.0, 353.0, 205.0)
+FLEX_HOME = (477.0, 493.0, 250.0)
+
+# Height a module adds under its labware (mm).
+MODULE_HEIGHTS = {"magnetic": 40.0, "temperature": 80.0, "heatershaker": 70.0,
+                  "thermocycler": 100.0}
+
+# Stock labware grids by well count: rows, cols, A1 x, A1 y, pitch.
+GRIDS = {
+    1: (1, 1, 63.88, 42.74, 0.0),
+    6: (2, 3, 35.0, 60.0, 35.0),
+    12: (1, 12, 14.38, 42.78, 9.0),
+    15: (3, 5, 13.88, 67.75, 25.0),
+    24: (4, 6, 18.21, 75.43, 19.3),
+    48: (6, 8, 18.16, 74.24, 13.0),
+    96: (8, 12, 14.38, 74.24, 9.0),
+    384: (16, 24, 12.13, 76.48, 4.5),
+}
+
+ALL = "ALL"
+COLUMN = "COLUMN"
+ROW = "ROW"
+SINGLE = "SINGLE"
+PARTIAL_COLUMN = "PARTIAL_COLUMN"
+OFF_DECK = "offDeck"
+
+
+class SimulationError(RuntimeError):
+    """The protocol asked for something the robot could not do."""
+
+
+def move_time(distance: float, speed: float, acc: float) -> float:
+    """Trapezoidal (or triangular, for short moves) velocity profile."""
+    distance = abs(distance)
+    if distance == 0:
+        return 0.0
+    if distance < speed * speed / acc:
+        return 2 * math.sqrt(distance / acc)
+    return distance / speed + speed / acc
+
+
+# ---------------------------------------------------------------------------
+# opentrons.types stand-ins
+# ---------------------------------------------------------------------------
+
+class Point(tuple):
+    """x, y, z in mm; supports + and - like opentrons.types.Point."""
+
+    def __new__(cls, x: float = 0.0, y: float = 0.0, z: float = 0.0):
+        return super().__new__(cls, (float(x), float(y), float(z)))
+
+    x = property(lambda self: self[0])
+    y = property(lambda self: self[1])
+    z = property(lambda self: self[2])
+
+    def __add__(self, other):
+        return Point(self[0] + other[0], self[1] + other[1], self[2] + other[2])
+
+    def __sub__(self, other):
+        return Point(self[0] - other[0], self[1] - other[1], self[2] - other[2])
+
+    def magnitude_to(self, other) -> float:
+        return math.dist(self, other)
+
+
+class Location:
+    """A point on the deck plus the well or labware it belongs to."""
+
+    def __init__(self, point: Point, labware=None) -> None:
+        self.point = point
+        self.labware = labware
+
+    def move(self, point) -> "Location":
+        return Location(self.point + point, self.labware)
+
+    @property
+    def well(self):
+        return self.labware if isinstance(self.labware, Well) else None
+
+    def __repr__(self) -> str:
+        return f"Location({self.point}, {self.labware})"
+
+
+# ---------------------------------------------------------------------------
+# Timeline
+# ---------------------------------------------------------------------------
+
+@dataclass
+class Step:
+    start: float
+    duration: float
+    kind: str
+    detail: str
+
+
+@dataclass
+class Timeline:
+    """Every modeled step of a run, in order."""
+    name: str = ""
+    steps: list[Step] = field(default_factory=list)
+    path_mm: float = 0.0
+    tips: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def total(self) -> float:
+        return sum(step.duration for step in self.steps)
+
+    def by_kind(self) -> dict[str, float]:
+        seconds: dict[str, float] = {}
+        for step in self.steps:
+            seconds[step.kind] = seconds.get(step.kind, 0.0) + step.duration
+        return seconds
+
+    def counts(self) -> dict[str, int]:
+        counts: dict[str, int] = {}
+        for step in self.steps:
+            counts[step.kind] = counts.get(step.kind, 0) + 1
+        return counts
+
+    def summary(self) -> dict:
+        counts = self.counts()
+        return {
+            "protocol": self.name,
+            "seconds": round(self.total, 1),
+            "tips": sum(self.tips.values()),
+            "path_mm": round(self.path_mm, 1),
+            "module_actions": counts.get("module", 0),
+            "gripper_moves": counts.get("gripper", 0),
+            "pauses": counts.get("pause", 0),
+        }
+
+    def format(self, steps: bool = False) -> str:
+        lines = []
+        if steps:
+            for step in self.steps:
+                lines.append(f"{_clock(step.start):>9}  {step.duration:8.1f} s  "
+                             f"{step.kind:<11} {step.detail}")
+            lines.append("")
+        lines.append(f"{self.name}: {_clock(self.total)} modeled")
+        for kind, seconds in sorted(self.by_kind().items(), key=lambda kv: -kv[1]):
+            lines.append(f"    {kind:<11} {_clock(seconds):>9}  ({self.counts()[kind]} steps)")
+        lines.append(f"    tips used   {sum(self.tips.values())}  {self.tips}")
+        lines.append(f"    gantry path {self.path_mm / 1000:.1f} m")
+        return "\n".join(lines)
+
+
+def _clock(seconds: float) -> str:
+    minutes, secs = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}"
+
+
+# ---------------------------------------------------------------------------
+# Labware
+# ---------------------------------------------------------------------------
+
+def stock_definition(load_name: str) -> dict:
+    """Build a definition-shaped dict for stock labware from its load name."""
+    is_adapter = "adapter" in load_name
+    count = 0 if is_adapter else int((re.findall(r"_(\d+)_", f"_{load_name}_") or ["1"])[0])
+    rows, cols, x0, y0, pitch = GRIDS.get(count, GRIDS[1])
+    volumes = re.findall(r"(\d+(?:\.\d+)?)(ul|ml)", load_name)
+    volume = 0.0
+    if volumes:
+        number, unit = volumes[-1]
+        volume = float(number) * (1000 if unit == "ml" else 1)
+
+    if is_adapter:
+        height = 10.0
+    elif "tiprack" in load_name:
+        height = 95.0 if volume >= 1000 else 64.0
+    elif "reservoir" in load_name:
+        height = 31.4
+    elif "tuberack" in load_name:
+        height = 79.0
+    elif "aluminumblock" in load_name:
+        height = 40.0
+    elif "deep" in load_name or volume >= 1000:
+        height = 41.0
+    elif count == 384:
+        height = 14.2
+    else:
+        height = 16.0
+
+    ordering, wells = [], {}
+    if not is_adapter:
+        for col in range(cols):
+            column = []
+            for row in range(rows):
+                name = f"{_row_name(row)}{col + 1}"
+                column.append(name)
+                wells[name] = {"depth": height - 2.0, "totalLiquidVolume": volume,
+                               "x": x0 + col * pitch, "y": y0 - row * pitch, "z": 2.0}
+            ordering.append(column)
+    return {"ordering": ordering, "wells": wells,
+            "dimensions": {"xDimension": 127.76, "yDimension": 85.48, "zDimension": height},
+            "parameters": {"loadName": load_name, "isTiprack": "tiprack" in load_name}}
+
+
+def _row_name(row: int) -> str:
+    return "ABCDEFGHIJKLMNOPQRSTUVWXYZ"[row]
+
+
+class Well:
+    def __init__(self, parent: "Labware", name: str, spec: dict) -> None:
+        self.parent = parent
+        self.well_name = name
+        self.offset = Point(spec["x"], spec["y"], spec["z"])
+        self.depth = spec.get("depth", 0.0)
+        self.max_volume = spec.get("totalLiquidVolume", 0.0)
+        self.diameter = spec.get("diameter")
+        self.length = spec.get("xDimension")
+        self.width = spec.get("yDimension")
+        self.volume = 0.0
+
+    @property
+    def display_name(self) -> str:
+        return f"{self.well_name} of {self.parent}"
+
+    def _point(self, dz: float) -> Point:
+        return self.parent.position + self.offset + Point(0, 0, dz)
+
+    def top(self, z: float = 0.0) -> Location:
+        return Location(self._point(self.depth + z), self)
+
+    def bottom(self, z: float = 0.0) -> Location:
+        return Location(self._point(z), self)
+
+    def center(self) -> Location:
+        return Location(self._point(self.depth / 2), self)
+
+    def meniscus(self, z: float = 0.0, target: str | None = None) -> Location:
+        filled = min(self.volume / self.max_volume, 1.0) if self.max_volume else 0.0
+        return Location(self._point(self.depth * filled + z), self)
+
+    def load_liquid(self, liquid=None, volume: float = 0.0) -> None:
+        self.volume = volume
+
+    def __repr__(self) -> str:
+        return self.display_name
+
+
+class Labware:
+    def __init__(self, ctx: "ProtocolContext", load_name: str, parent, position: Point | None,
+                 label: str | None = None) -> None:
+        self.ctx = ctx
+        self.load_name = load_name
+        # custom definitions come from the lib.geometry cache, parsed once per content
+        self.index = labware_index(load_name, CUSTOM_LABWARE)
+        self.parent = parent
+        self.position = position
+        self.label = label
+        self.height = self.index.meta["dimensions"]["zDimension"]
+        self.is_tiprack = self.index.meta["parameters"].get("isTiprack", False)
+        self._wells = [Well(self, name, spec) for name, spec in zip(self.index.names.tolist(), self.index.specs)]
+        self._by_name = {well.well_name: well for well in self._wells}
+        # callers get a new outer list each time
+        self._rows = [[self._wells[i] for i in row] for row in self.index.rows()]
+        self._columns = [[self._wells[i] for i in column] for column in self.index.columns()]
+        self.used_tips: set[str] = set()
+
+    def __repr__(self) -> str:
+        return f"{self.label or self.load_name} on {self.parent}"
+
+    def __getitem__(self, name: str) -> Well:
+        return self._by_name[name]
+
+    def wells(self, *names) -> list[Well]:
+        if names:
+            return [self._by_name[name] for name in names]
+        return list(self._wells)
+
+    def wells_by_name(self) -> dict[str, Well]:
+        return dict(self._by_name)
+
+    def rows(self) -> list[list[Well]]:
+        return list(self._rows)
+
+    def columns(self) -> list[list[Well]]:
+        return list(self._columns)
+
+    def rows_by_name(self) -> dict[str, list[Well]]:
+        return {_split_name(row[0].well_name)[0]: row for row in self.rows()}
+
+    def columns_by_name(self) -> dict[str, list[Well]]:
+        return {str(_split_name(col[0].well_name)[1]): col for col in self.columns()}
+
+    def top(self, z: float = 0.0) -> Location:
+        return Location(self.position + Point(63.88, 42.74, self.height + z), self)
+
+    def load_labware(self, load_name: str, label: str | None = None, **kwargs) -> "Labware":
+        return self.ctx._place(load_name, self, label)
+
+    def set_offset(self, x: float = 0, y: float = 0, z: float = 0) -> None:
+        pass
+
+    def reset(self) -> None:
+        self.used_tips.clear()
+
+    def next_tip(self, num_tips: int = 1, starting_tip: Well | None = None) -> Well | None:
+        return self._next_tip(ALL if num_tips == 8 else PARTIAL_COLUMN, num_tips)
+
+    def _next_tip(self, layout: str, count: int, start: str = "H1") -> Well | None:
+        """First well the primary nozzle can use for ``count`` fresh tips."""
+        columns = self._columns
+        if layout == ALL and count > 8:
+            return columns[0][0] if not self.used_tips else None
+        if layout == ROW:
+            for row in self._rows:
+                if not any(well.well_name in self.used_tips for well in row):
+                    return row[0]
+            return None
+        for column in columns:
+            free = [well for well in column if well.well_name not in self.used_tips]
+            if len(free) >= count:
+                if count == len(column):
+                    return column[0]
+                return free[count - 1] if start[0] == "H" else free[len(free) - count]
+        return None
+
+    def use_tips(self, well: Well, layout: str, count: int) -> None:
+        if layout == ALL and count > 8:
+            self.used_tips.update(w.well_name for w in self._wells)
+            return
+        if layout == ROW:
+            row = _split_name(well.well_name)[0]
+            self.used_tips.update(w.well_name for w in self._wells
+                                  if _split_name(w.well_name)[0] == row)
+            return
+        for column in self._columns:
+            if well in column:
+                index = column.index(well)
+                lo = max(index - count + 1, 0) if count < len(column) else 0
+                self.used_tips.update(w.well_name for w in column[lo:lo + count])
+                return
+
+
+class TrashBin:
+    def __init__(self, slot: str, position: Point) -> None:
+        self.slot = slot
+        self.position = position
+
+    def top(self, z: float = 0.0) -> Location:
+        return Location(self.position + Point(0, 0, 40 + z), self)
+
+    def __repr__(self) -> str:
+        return f"trash bin in {self.slot}"
+
+
+# ---------------------------------------------------------------------------
+# Modules
+# ---------------------------------------------------------------------------
+
+class Module:
+    """Stand-in for magnetic, temperature, heater-shaker and thermocycler modules."""
+
+    def __init__(self, ctx: "ProtocolContext", name: str, slot: str) -> None:
+        self.ctx = ctx
+        self.name = name
+        self.slot = slot
+        key = name.lower().replace(" ", "").replace("-", "")
+        self.kind = next((kind for kind in MODULE_HEIGHTS if kind in key), "temperature")
+        x, y = ctx.slots[slot]
+        self.position = Point(x, y, MODULE_HEIGHTS[self.kind])
+        self.labware = None
+        self.temperature = 25.0
+        self.target = None
+        self.target_set_at = 0.0
+
+    def __repr__(self) -> str:
+        return f"{self.name} in {self.slot}"
+
+    def load_labware(self, load_name: str, label: str | None = None, **kwargs) -> Labware:
+        self.labware = self.ctx._place(load_name, self, label)
+        return self.labware
+
+    load_adapter = load_labware
+
+    def _act(self, seconds: float, detail: str) -> None:
+        self.ctx._record("module", seconds, f"{self.kind}: {detail}")
+
+    # magnetic module
+    def engage(self, height: float | None = None, height_from_base: float | None = None,
+               offset: float | None = None) -> None:
+        self._act(MAGNET_MOVE, "engage")
+
+    def disengage(self) -> None:
+        self._act(MAGNET_MOVE, "disengage")
+
+    # temperature
+    def _ramp(self, celsius: float) -> float:
+        elapsed = self.ctx.clock - self.target_set_at
+        return max(abs(celsius - self.temperature) / TEMP_RATE - elapsed, 0.0)
+
+    def start_set_temperature(self, celsius: float) -> None:
+        self.target, self.target_set_at = celsius, self.ctx.clock
+        self._act(0.0, f"start heating/cooling to {celsius} °C")
+
+    def set_temperature(self, celsius: float) -> None:
+        self.start_set_temperature(celsius)
+        self.await_temperature(celsius)
+
+    def await_temperature(self, celsius: float | None = None) -> None:
+        celsius = self.target if celsius is None else celsius
+        if celsius is None:
+            return
+        self._act(self._ramp(celsius), f"wait for {celsius} °C")
+        self.temperature = celsius
+
+    def set_target_temperature(self, celsius: float) -> None:
+        self.start_set_temperature(celsius)
+
+    def wait_for_temperature(self) -> None:
+        self.await_temperature()
+
+    def set_and_wait_for_temperature(self, celsius: float) -> None:
+        self.set_temperature(celsius)
+
+    def set_block_temperature(self, temperature: float, hold_time_seconds: float = 0,
+                              hold_time_minutes: float = 0, **kwargs) -> None:
+        self.set_temperature(temperature)
+        self._act(hold_time_seconds + 60 * hold_time_minutes, f"hold {temperature} °C")
+
+    def deactivate(self) -> None:
+        self.target = None
+        self._act(0.0, "deactivate")
+
+    deactivate_heater = deactivate
+
+    # heater-shaker
+    def open_labware_latch(self) -> None:
+        self._act(LATCH, "open latch")
+
+    def close_labware_latch(self) -> None:
+        self._act(LATCH, "close latch")
+
+    def set_and_wait_for_shake_speed(self, rpm: int) -> None:
+        self._act(SHAKE_RAMP, f"shake {rpm} rpm")
+
+    def deactivate_shaker(self) -> None:
+        self._act(SHAKE_RAMP, "stop shaking")
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self._act(MODULE_ACTION, name)
+
+
+# ---------------------------------------------------------------------------
+# Pipettes
+# ---------------------------------------------------------------------------
+
+@dataclass
+class FlowRates:
+    aspirate: float
+    dispense: float
+    blow_out: float
+
+
+def _as_list(target) -> list:
+    return list(target) if isinstance(target, (list, tuple)) and not isinstance(target, Point) else [target]
+
+
+class Pipette:
+    def __init__(self, ctx: "ProtocolContext", name: str, mount: str | None, tip_racks) -> None:
+        self.ctx = ctx
+        self.name = name
+        self.mount = mount
+        self.tip_racks = list(tip_racks or [])
+        if "96channel" in name:
+            self.channels = 96
+        elif "multi" in name or "8channel" in name:
+            self.channels = 8
+        else:
+            self.channels = 1
+        nominal = int(re.findall(r"\d+", name.replace("96channel", "").replace("8channel", "")
+                                 .replace("1channel", ""))[0])
+        self.max_volume = float(nominal)
+        self.min_volume = {20: 1.0, 50: 1.0, 300: 20.0, 1000: 100.0}.get(nominal, 1.0)
+        rate = FLEX_FLOW_RATE if name.startswith("flex") else FLOW_RATES.get(nominal, 100.0)
+        self.flow_rate = FlowRates(rate, rate, rate)
+        self.layout, self.nozzles, self.start = ALL, self.channels, "A1"
+        self.layout_racks = None
+        self.has_tip = False
+        self.tip_location = None
+        self.current_volume = 0.0
+        self.position = ctx.home
+        self.here = None
+
+    def __repr__(self) -> str:
+        return f"{self.name} on {self.mount} mount" if self.mount else self.name
+
+    # -- layout / tips ------------------------------------------------------
+
+    def configure_nozzle_layout(self, style=ALL, start: str | None = None, end: str | None = None,
+                                front_right: str | None = None, back_left: str | None = None,
+                                tip_racks=None) -> None:
+        style = getattr(style, "name", style)
+        self.layout, self.start = style, start or "A1"
+        if style == ALL:
+            self.nozzles = self.channels
+        elif style == SINGLE:
+            self.nozzles = 1
+        elif style == COLUMN:
+            self.nozzles = 8
+        elif style == ROW:
+            self.nozzles = 12
+        elif style == PARTIAL_COLUMN:
+            self.nozzles = abs(ord(end[0]) - ord(self.start[0])) + 1
+        self.layout_racks = list(tip_racks) if tip_racks else None
+
+    def pick_up_tip(self, location=None, **kwargs) -> "Pipette":
+        if self.has_tip:
+            raise SimulationError(f"{self} already has a tip")
+        racks = self.layout_racks or self.tip_racks
+        if isinstance(location, Labware):
+            racks, location = [location], None
+        if location is None:
+            for rack in racks:
+                well = rack._next_tip(self.layout, self.nozzles, self.start)
+                if well is not None:
+                    location = well
+                    break
+            else:
+                raise SimulationError(f"{self} is out of tips")
+        well = location.well if isinstance(location, Location) else location
+        well.parent.use_tips(well, self.layout, self.nozzles)
+        self._move(well.top(), "pick up tip")
+        seconds = TIP_PICKUP_96 if self.nozzles > 8 else TIP_PICKUP
+        self.ctx._record("pick_up_tip", seconds, f"{self} {self.nozzles} tips at {well}")
+        self.ctx.tips[self.name] = self.ctx.tips.get(self.name, 0) + self.nozzles
+        self.has_tip, self.tip_location = True, well
+        return self
+
+    def drop_tip(self, location=None, home_after=None) -> "Pipette":
+        if location is None:
+            location = self.ctx.trash.top()
+        elif isinstance(location, Well):
+            location = location.top()
+        self._move(location, "drop tip")
+        self.ctx._record("drop_tip", TIP_DROP, f"{self} at {location.labware}")
+        self.has_tip, self.current_volume = False, 0.0
+        return self
+
+    def return_tip(self, home_after=None) -> "Pipette":
+        return self.drop_tip(self.tip_location)
+
+    # -- motion -------------------------------------------------------------
+
+    def _resolve(self, location, default: str = "bottom") -> Location:
+        if location is None:
+            if self.here is None:
+                raise SimulationError(f"{self} has no location to act on")
+            return self.here
+        if isinstance(location, Well):
+            return location.bottom(1) if default == "bottom" else location.top()
+        if isinstance(location, (Labware, TrashBin)):
+            return location.top()
+        return location
+
+    def _move(self, location: Location, why: str = "") -> None:
+        target = location.point
+        start = self.position
+        same = (self.here is not None and location.labware is not None
+                and _owner(self.here.labware) is _owner(location.labware))
+        if same:
+            legs = [(target.z - start.z, Z_SPEED, Z_ACC),
+                    (math.hypot(target.x - start.x, target.y - start.y), XY_SPEED, XY_ACC)]
+        else:
+            travel = max(SAFE_Z, start.z, target.z)
+            legs = [(travel - start.z, Z_SPEED, Z_ACC),
+                    (math.hypot(target.x - start.x, target.y - start.y), XY_SPEED, XY_ACC),
+                    (travel - target.z, Z_SPEED, Z_ACC)]
+        distance = sum(abs(leg[0]) for leg in legs)
+        self.position, self.here = target, location
+        if distance > 0:
+            self.ctx.path_mm += distance
+            seconds = sum(move_time(*leg) for leg in legs)
+            self.ctx._record("move", seconds, f"{self} to {location.labware} {why}".rstrip())
+
+    def move_to(self, location, **kwargs) -> "Pipette":
+        self._move(self._resolve(location, "top"))
+        return self
+
+    def home(self) -> "Pipette":
+        self._move(Location(self.ctx.home), "home")
+        self.here = None
+        return self
+
+    # -- liquid handling ----------------------------------------------------
+
+    def _plunger(self, kind: str, volume: float, rate: float, flow: float, where) -> None:
+        seconds = volume / (flow * rate) + PLUNGER_SETTLE
+        self.ctx._record(kind, seconds, f"{self} {volume:g} µL {where}")
+
+    def aspirate(self, volume: float | None = None, location=None, rate: float = 1.0,
+                 **kwargs) -> "Pipette":
+        target = self._resolve(location)
+        volume = self.max_volume - self.current_volume if volume is None else volume
+        self._move(target)
+        self._plunger("aspirate", volume, rate, self.flow_rate.aspirate, f"from {target.labware}")
+        self.current_volume += volume
+        self.ctx._transfer_liquid(target.well, -volume * self.nozzles)
+        return self
+
+    def dispense(self, volume: float | None = None, location=None, rate: float = 1.0,
+                 **kwargs) -> "Pipette":
+        target = self._resolve(location)
+        volume = self.current_volume if volume is None else volume
+        self._move(target)
+        self._plunger("dispense", volume, rate, self.flow_rate.dispense, f"into {target.labware}")
+        self.current_volume = max(self.current_volume - volume, 0.0)
+        self.ctx._transfer_liquid(target.well, volume * self.nozzles)
+        return self
+
+    def mix(self, repetitions: int = 1, volume: float | None = None, location=None,
+            rate: float = 1.0, **kwargs) -> "Pipette":
+        target = self._resolve(location)
+        volume = self.max_volume if volume is None else volume
+        self._move(target)
+        cycle = (volume / (self.flow_rate.aspirate * rate) + volume / (self.flow_rate.dispense * rate)
+                 + 2 * PLUNGER_SETTLE)
+        self.ctx._record("mix", repetitions * cycle,
+                         f"{self} {repetitions} x {volume:g} µL in {target.labware}")
+        return self
+
+    def blow_out(self, location=None) -> "Pipette":
+        if location is not None:
+            self._move(self._resolve(location, "top"))
+        self.ctx._record("blow_out", BLOW_OUT, f"{self}")
+        self.current_volume = 0.0
+        return self
+
+    def touch_tip(self, location=None, radius: float = 1.0, v_offset: float = -1.0,
+                  speed: float = 60.0, **kwargs) -> "Pipette":
+        if location is not None:
+            self._move(self._resolve(location, "top"))
+        self.ctx._record("touch_tip", TOUCH_TIP, f"{self}")
+        return self
+
+    def air_gap(self, volume: float | None = None, height: float | None = None) -> "Pipette":
+        if volume:
+            self._plunger("aspirate", volume, 1.0, self.flow_rate.aspirate, "air gap")
+            self.current_volume += volume
+        return self
+
+    # -- complex commands ---------------------------------------------------
+
+    def transfer(self, volume, source, dest, **kwargs) -> "Pipette":
+        return self._complex("transfer", volume, source, dest, **kwargs)
+
+    def distribute(self, volume, source, dest, **kwargs) -> "Pipette":
+        return self._complex("distribute", volume, source, dest, **kwargs)
+
+    def consolidate(self, volume, source, dest, **kwargs) -> "Pipette":
+        return self._complex("consolidate", volume, source, dest, **kwargs)
+
+    def distribute_with_liquid_class(self, liquid_class, volume, source, dest, **kwargs) -> "Pipette":
+        return self._complex("distribute", volume, source, dest, **kwargs)
+
+    def transfer_with_liquid_class(self, liquid_class, volume, source, dest, **kwargs) -> "Pipette":
+        return self._complex("transfer", volume, source, dest, **kwargs)
+
+    def _complex(self, mode: str, volume, source, dest, new_tip: str = "once", trash: bool = True,
+                 mix_before=None, mix_after=None, touch_tip: bool = False, blow_out: bool = False,
+                 air_gap: float = 0, disposal_volume: float | None = None, **kwargs) -> "Pipette":
+        sources, dests = _as_list(source), _as_list(dest)
+        if len(sources) == 1:
+            sources = sources * len(dests)
+        elif len(dests) == 1:
+            dests = dests * len(sources)
+        volumes = _as_list(volume)
+        if len(volumes) == 1:
+            volumes = volumes * len(sources)
+        pairs = list(zip(volumes, sources, dests))
+        capacity = self.max_volume - air_gap
+
+        def fresh_tip():
+            if self.has_tip:
+                self.drop_tip() if trash else self.return_tip()
+            self.pick_up_tip()
+
+        if new_tip != "never":
+            fresh_tip()
+
+        if mode == "transfer":
+            first = True
+            for vol, src, dst in pairs:
+                chunks = max(math.ceil(vol / capacity - 1e-9), 1)
+                for _ in range(chunks):
+                    if new_tip == "always" and not first:
+                        fresh_tip()
+                    first = False
+                    if mix_before:
+                        self.mix(*mix_before, src)
+                    self.aspirate(vol / chunks, src)
+                    if air_gap:
+                        self.air_gap(air_gap)
+                    if touch_tip:
+                        self.touch_tip()
+                    self.dispense(vol / chunks + air_gap, dst)
+                    if mix_after:
+                        self.mix(*mix_after, dst)
+                    if touch_tip:
+                        self.touch_tip()
+                    if blow_out:
+                        self.blow_out()
+        elif mode == "distribute":
+            disposal = self.min_volume if disposal_volume is None else disposal_volume
+            groups = _group(pairs, capacity - disposal, by=lambda pair: id(pair[1]))
+            for index, group in enumerate(groups):
+                if new_tip == "always" and index:
+                    fresh_tip()
+                if mix_before:
+                    self.mix(*mix_before, group[0][1])
+                self.aspirate(sum(vol for vol, _, _ in group) + disposal, group[0][1])
+                if touch_tip:
+                    self.touch_tip()
+                for vol, _, dst in group:
+                    self.dispense(vol, dst)
+                if disposal:
+                    self.blow_out(self.ctx.trash)
+        else:
+            groups = _group(pairs, capacity, by=lambda pair: id(pair[2]))
+            for index, group in enumerate(groups):
+                if new_tip == "always" and index:
+                    fresh_tip()
+                for vol, src, _ in group:
+                    self.aspirate(vol, src)
+                    if touch_tip:
+                        self.touch_tip()
+                self.dispense(sum(vol for vol, _, _ in group), group[0][2])
+                if mix_after:
+                    self.mix(*mix_after, group[0][2])
+
+        if new_tip != "never":
+            self.drop_tip() if trash else self.return_tip()
+        return self
+
+
+def _owner(labware):
+    return labware.parent if isinstance(labware, Well) else labware
+
+
+def _group(pairs, capacity: float, by) -> list[list]:
+    """Greedy runs of consecutive pairs sharing ``by`` that fit in one tip."""
+    groups: list[list] = []
+    for pair in pairs:
+        vol = pair[0]
+        if vol > capacity:
+            chunks = math.ceil(vol / capacity)
+            groups.extend([[(vol / chunks,) + tuple(pair[1:])] for _ in range(chunks)])
+            continue
+        if (groups and by(groups[-1][-1]) == by(pair)
+                and sum(p[0] for p in groups[-1]) + vol <= capacity):
+            groups[-1].append(pair)
+        else:
+            groups.append([pair])
+    return groups
+
+
+# ---------------------------------------------------------------------------
+# Protocol context and parameters
+# ---------------------------------------------------------------------------
+
+class Parameters:
+    """Collects ``add_parameters`` definitions and their defaults."""
+
+    def __init__(self) -> None:
+        self.definitions: dict[str, dict] = {}
+
+    def _add(self, kind: str, variable_name: str, default=None, **kwargs) -> None:
+        self.definitions[variable_name] = dict(kwargs, kind=kind, default=default)
+
+    def add_int(self, variable_name: str, default: int = 0, **kwargs) -> None:
+        self._add("int", variable_name, default, **kwargs)
+
+    def add_float(self, variable_name: str, default: float = 0.0, **kwargs) -> None:
+        self._add("float", variable_name, default, **kwargs)
+
+    def add_str(self, variable_name: str, default: str = "", **kwargs) -> None:
+        self._add("str", variable_name, default, **kwargs)
+
+    def add_bool(self, variable_name: str, default: bool = False, **kwargs) -> None:
+        self._add("bool", variable_name, default, **kwargs)
+
+    def add_csv_file(self, variable_name: str, **kwargs) -> None:
+        self._add("csv", variable_name, None, **kwargs)
+
+    def values(self, overrides: dict | None = None) -> types.SimpleNamespace:
+        values = {name: spec["default"] for name, spec in self.definitions.items()}
+        for name, raw in (overrides or {}).items():
+            kind = self.definitions.get(name, {}).get("kind", "str")
+            values[name] = _coerce(kind, raw)
+        return types.SimpleNamespace(**values)
+
+
+def _coerce(kind: str, raw):
+    if not isinstance(raw, str):
+        return raw
+    if kind == "int":
+        return int(raw)
+    if kind == "float":
+        return float(raw)
+    if kind == "bool":
+        return raw.lower() in ("1", "true", "yes")
+    return raw
+
+
+class ProtocolContext:
+    """Stand-in ProtocolContext that records modeled time instead of moving."""
+
+    def __init__(self, robot: str = "OT-2", params=None, name: str = "") -> None:
+        self.robot = robot
+        self.flex = robot.lower() == "flex"
+        self.slots = FLEX_SLOTS if self.flex else OT2_SLOTS
+        self.home = Point(*(FLEX_HOME if self.flex else OT2_HOME))
+        self.params = params or types.SimpleNamespace()
+        self.timeline = Timeline(name=name)
+        self.tips = self.timeline.tips
+        self.clock = 0.0
+        self.path_mm = 0.0
+        self.labware: list[Labware] = []
+        self.trash = TrashBin("A3" if self.flex else "12", self._slot_point("A3" if self.flex else "12"))
+
+    # -- bookkeeping --------------------------------------------------------
+
+    def _record(self, kind: str, seconds: float, detail: str) -> None:
+        self.timeline.steps.append(Step(self.clock, seconds, kind, detail))
+        self.clock += seconds
+        self.timeline.path_mm = self.path_mm
+
+    def _transfer_liquid(self, well, volume: float) -> None:
+        if well is not None:
+            well.volume += volume
+
+    def _slot_point(self, slot) -> Point:
+        x, y = self.slots[str(slot)]
+        return Point(x, y, 0)
+
+    def _place(self, load_name: str, parent, label: str | None = None) -> Labware:
+        if isinstance(parent, Module):
+            position = parent.position
+        elif isinstance(parent, Labware):
+            position = parent.position + Point(0, 0, parent.height)
+        else:
+            parent = str(parent)
+            position = self._slot_point(parent)
+        labware = Labware(self, load_name, parent, position, label)
+        self.labware.append(labware)
+        return labware
+
+    # -- loading ------------------------------------------------------------
+
+    def load_labware(self, load_name: str, location=None, label: str | None = None,
+                     namespace=None, version=None, adapter: str | None = None, **kwargs) -> Labware:
+        if adapter:
+            location = self._place(adapter, location)
+        return self._place(load_name, location, label)
+
+    def load_adapter(self, load_name: str, location=None, **kwargs) -> Labware:
+        return self._place(load_name, location)
+
+    def load_module(self, module_name: str, location=None, **kwargs) -> Module:
+        if location is None:
+            location = "7"
+        return Module(self, module_name, str(location))
+
+    def load_instrument(self, instrument_name: str, mount: str | None = None, tip_racks=None,
+                        **kwargs) -> Pipette:
+        return Pipette(self, instrument_name, mount, tip_racks)
+
+    def load_trash_bin(self, location) -> TrashBin:
+        self.trash = TrashBin(str(location), self._slot_point(location))
+        return self.trash
+
+    def load_waste_chute(self) -> TrashBin:
+        self.trash = TrashBin("D3", self._slot_point("D3"))
+        return self.trash
+
+    @property
+    def fixed_trash(self) -> TrashBin:
+        return self.trash
+
+    def define_liquid(self, name: str, description: str = "", display_color: str = "") -> dict:
+        return {"name": name, "description": description}
+
+    def get_liquid_class(self, name: str) -> str:
+        return name
+
+    # -- actions ------------------------------------------------------------
+
+    def move_labware(self, labware: Labware, new_location, use_gripper: bool = False,
+                     pick_up_offset=None, drop_offset=None) -> None:
+        if new_location == OFF_DECK:
+            labware.parent, labware.position = OFF_DECK, None
+        elif isinstance(new_location, Module):
+            labware.parent, labware.position = new_location, new_location.position
+            new_location.labware = labware
+        elif isinstance(new_location, Labware):
+            labware.parent = new_location
+            labware.position = new_location.position + Point(0, 0, new_location.height)
+        else:
+            labware.parent, labware.position = str(new_location), self._slot_point(new_location)
+        if use_gripper:
+            self._record("gripper", GRIPPER_MOVE, f"{labware.load_name} -> {new_location}")
+        else:
+            self._record("pause", 0.0, f"manually move {labware.load_name} -> {new_location}")
+
+    def delay(self, seconds: float = 0, minutes: float = 0, msg: str | None = None) -> None:
+        self._record("delay", seconds + 60 * minutes, msg or "")
+
+    def pause(self, msg: str | None = None) -> None:
+        self._record("pause", 0.0, " ".join((msg or "").split()))
+
+    def comment(self, msg: str) -> None:
+        self._record("comment", 0.0, msg)
+
+    def set_rail_lights(self, on: bool) -> None:
+        pass
+
+    def home(self) -> None:
+        pass
+
+    def is_simulating(self) -> bool:
+        return True
+
+
+# ---------------------------------------------------------------------------
+# Loading and running protocols
+# ---------------------------------------------------------------------------
+
+def _stand_in_modules() -> dict[str, types.ModuleType]:
+    opentrons = types.ModuleType("opentrons")
+    protocol_api = types.ModuleType("opentrons.protocol_api")
+    types_module = types.ModuleType("opentrons.types")
+    for name, value in {"ProtocolContext": ProtocolContext, "Parameters": Parameters,
+                        "Labware": Labware, "InstrumentContext": Pipette, "Well": Well,
+                        "ALL": ALL, "COLUMN": COLUMN, "ROW": ROW, "SINGLE": SINGLE,
+                        "PARTIAL_COLUMN": PARTIAL_COLUMN, "OFF_DECK": OFF_DECK}.items():
+        setattr(protocol_api, name, value)
+    types_module.Point = Point
+    types_module.Location = Location
+    opentrons.protocol_api = protocol_api
+    opentrons.types = types_module
+    return {"opentrons": opentrons, "opentrons.protocol_api": protocol_api,
+            "opentrons.types": types_module}
+
+
+@contextmanager
+def stand_in_opentrons():
+    """Swap the stand-in opentrons modules into sys.modules for the block."""
+    stand_ins = _stand_in_modules()
+    saved = {name: sys.modules.get(name) for name in stand_ins}
+    sys.modules.update(stand_ins)
+    added_path = str(REPO_ROOT) not in sys.path
+    if added_path:
+        sys.path.insert(0, str(REPO_ROOT))
+    try:
+        yield
+    finally:
+        for name, module in saved.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+        if added_path:
+            sys.path.remove(str(REPO_ROOT))
+
+
+def load_protocol(path) -> types.ModuleType:
+    """Execute a protocol file into a fresh module (inside stand_in_opentrons)."""
+    path = Path(path)
+    module = types.ModuleType(path.stem)
+    module.__file__ = str(path)
+    exec(compile(path.read_text(), str(path), "exec"), module.__dict__)
+    return module
+
+
+def robot_type(module: types.ModuleType) -> str:
+    for table in (getattr(module, "requirements", {}), getattr(module, "metadata", {})):
+        if "robotType" in table:
+            return table["robotType"]
+    return "OT-2"
+
+
+def parameter_definitions(module: types.ModuleType) -> dict[str, dict]:
+    parameters = Parameters()
+    if hasattr(module, "add_parameters"):
+        module.add_parameters(parameters)
+    return parameters.definitions
+
+
+def simulate(path, params: dict | None = None) -> Timeline:
+    """Run a protocol file offline and return its modeled timeline."""
+    path = Path(path)
+    with stand_in_opentrons():
+        module = load_protocol(path)
+        parameters = Parameters()
+        if hasattr(module, "add_parameters"):
+            module.add_parameters(parameters)
+        try:
+            name = str(path.resolve().relative_to(REPO_ROOT))
+        except ValueError:
+            name = str(path)
+        ctx = ProtocolContext(robot_type(module), parameters.values(params), name)
+        module.run(ctx)
+    return ctx.timeline
+
+
+def parse_params(pairs: list[str]) -> dict[str, str]:
+    params = {}
+    for pair in pairs or []:
+        name, _, value = pair.partition("=")
+        params[name] = value
+    return params
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Model the run time of a protocol offline.")
+    parser.add_argument("protocol", nargs="+", help="protocol file(s) to simulate")
+    parser.add_argument("--param", action="append", metavar="NAME=VALUE",
+                        help="override an add_parameters value (repeatable)")
+    parser.add_argument("--steps", action="store_true", help="print every step")
+    parser.add_argument("--json", action="store_true", help="print summaries as JSON")
+    args = parser.parse_args(argv)
+
+    params = parse_params(args.param)
+    results = []
+    for path in args.protocol:
+        timeline = simulate(path, params)
+        if args.json:
+            results.append(timeline.summary())
+        else:
+            print(timeline.format(steps=args.steps))
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Spot planning for slides and blots
+==================================
+
+Spotting protocols used to aspirate 1 µL, dispense one spot and wash the
+tips after every spot, with the slide position worked out inline
+(``well+(6-3*((well-3)%3))``).
+
+``interleaved_wells`` does that mapping for whole arrays of samples. The
+192 well slideholder has 3 mm between rows. A partial column of ``tips``
+nozzles (9 mm apart) therefore spots every third row, and three
+consecutive pickups of one column fill one slide column of 12.
+
+``plan_spots`` makes the steps for a list of (source, spot) pairs. The
+spots of one source, in a row, come from one aspirate, with a small
+disposal volume that goes back to the source. The tips are only washed
+before a different source is aspirated, never after the last spot. The
+steps are ``lib.dispense`` steps, so they can be counted before anything
+moves and run with ``run_plan``::
+
+    samples = np.arange(3, 96, 4)                   # primary wells of 4-tip pickups
+    spots = interleaved_wells(samples, tips=4)
+    steps = plan_spots([(pcr.wells()[s], slide.wells()[d]) for s, d in zip(samples, spots)],
+                       volume=1, max_volume=20)
+    run_plan(p20m, steps, wash=lambda: clean_tips(p20m, protocol))
+
+Blot and slide layouts are compiled from a spot map instead of index
+arithmetic. A spot map says which source well goes to which spot, as a
+dict or as CSV with the columns ``source, well, spot, volume``.
+``compile_spots`` reads the spot labware from custom_labware/ (copy it
+next to ``lib`` on the robot). It groups spots that line up with the
+nozzles into multi-channel pickups, and orders the groups nearest first
+across the deck. ``run_spots`` keeps one set of tips for as long as the
+nozzle count stays the same, and washes it between groups::
+
+    spots = spot_map({"deepwell": {well: well for well in deepwell_names}}, volume=2)
+    groups = compile_spots(spots, {"deepwell": (plate_definition(96), 6)},
+                           (load_definition("shawn_104_well_blot_holder_2ul"), 5))
+    run_spots(p20m, groups, {"deepwell": deepwell}, blot, tips, wash)
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+import math
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+from lib.dispense import DISPOSAL_UL, Step, run_plan
+from lib.geometry import LabwareIndex
+from lib.reformat import Group, plan_reformat, primary
+
+
+CUSTOM_LABWARE = Path(__file__).resolve().parent.parent / "custom_labware"
+DEST = "spots"          # label of the spot labware in a compiled plan
+
+
+def interleaved_wells(samples, tips: int = 4, stride: int = 3, rows: int = 12):
+    """Slide well index for each 96 well sample index (both column-major).
+
+    Samples are taken ``tips`` at a time down a source column. Pickup ``g``
+    spots rows ``g % stride``, ``g % stride + stride``, ... of slide column
+    ``g // stride``.
+    """
+    samples = np.asarray(samples)
+    if tips * stride != rows:
+        raise ValueError(f"{tips} tips every {stride} rows don't cover a column of {rows}.")
+    group, position = np.divmod(samples, tips)
+    column, offset = np.divmod(group, stride)
+    return rows * column + stride * position + offset
+
+
+def plan_spots(spots: list[tuple], volume: float, max_volume: float,
+               disposal: float = DISPOSAL_UL) -> list[Step]:
+    """Steps that put ``volume`` on every spot, aspirating once per run of one source."""
+    if volume + disposal > max_volume:
+        raise ValueError(f"Can't spot {volume} µL plus {disposal} µL disposal with a "
+                         f"{max_volume} µL tip.")
+    per_aspirate = int((max_volume - disposal) // volume)
+    steps = []
+    previous = None
+    start = 0
+    while start < len(spots):
+        source = spots[start][0]
+        end = start
+        while (end < len(spots) and spots[end][0] is source
+               and end - start < per_aspirate):
+            end += 1
+        if previous is not None and previous is not source:
+            steps.append(Step("wash"))
+        chunk = [dest for _, dest in spots[start:end]]
+        extra = disposal if len(chunk) > 1 else 0
+        steps.append(Step("aspirate", volume * len(chunk) + extra, source))
+        for dest in chunk:
+            steps.append(Step("dispense", volume, dest))
+        if extra:
+            steps.append(Step("blow_out", location=source.top()))
+        previous = source
+        start = end
+    return steps
+
+
+@dataclass(frozen=True)
+class Spot:
+    source: str         # label of the source labware, e.g. "deepwell"
+    well: str
+    spot: str
+    volume: float
+
+
+def spot_map(mapping: dict[str, dict[str, str]], volume: float) -> list[Spot]:
+    """Spots from ``{source: {well: spot}}``, all of one volume."""
+    return [Spot(source, well, spot, volume)
+            for source, wells in mapping.items() for well, spot in wells.items()]
+
+
+def read_spot_map(path) -> list[Spot]:
+    with open(path, newline="") as handle:
+        return [Spot(row["source"], row["well"], row["spot"], float(row["volume"]))
+                for row in csv.DictReader(handle)]
+
+
+def load_definition(load_name: str, directory: Path = CUSTOM_LABWARE) -> dict:
+    return json.loads((Path(directory) / f"{load_name}.json").read_text())
+
+
+def plate_definition(count: int = 96) -> dict:
+    """Well positions of a stock SBS plate (96 or 384), enough for grouping."""
+    rows, cols, pitch = {96: (8, 12, 9.0), 384: (16, 24, 4.5)}[count]
+    ordering = [[f"{'ABCDEFGHIJKLMNOP'[row]}{col + 1}" for row in range(rows)] for col in range(cols)]
+    wells = {name: {"x": 14.38 + col * pitch, "y": 74.24 - row * pitch, "z": 0.0}
+             for col, column in enumerate(ordering) for row, name in enumerate(column)}
+    return {"ordering": ordering, "wells": wells}
+
+
+def slot_origin(slot) -> tuple[float, float]:
+    """Front-left corner of an OT-2 deck slot."""
+    n = int(slot)
+    return ((n - 1) % 3 * 132.5, (n - 1) // 3 * 90.5)
+
+
+def compile_spots(spots: list[Spot], sources: dict[str, tuple[dict, object]],
+                  dest: tuple[dict, object], channels: int = 8) -> list[Group]:
+    """Pickups for ``spots``, grouped for ``channels`` nozzles and ordered nearest first.
+
+    ``sources`` maps each source label to (definition, deck slot), ``dest``
+    is the (definition, deck slot) of the spot labware. Group sources are
+    (label, well, volume) and destinations (DEST, spot, volume).
+    """
+    # deck x, y of every well, per labware
+    layout = {}
+    for label, (definition, slot) in {**sources, DEST: dest}.items():
+        index = LabwareIndex.from_definition(definition)
+        layout[label] = (index, (index.xyz[:, :2] + slot_origin(slot)).tolist())
+    for spot in spots:
+        for label, well in ((spot.source, spot.well), (DEST, spot.spot)):
+            if label not in layout:
+                raise ValueError(f"No labware for source {label!r}.")
+            if well not in layout[label][0].by_name:
+                raise ValueError(f"{label} has no well {well}.")
+
+    def key(ref):
+        label, well, volume = ref
+        index, xy = layout[label]
+        x, y = xy[index.at(well)]
+        return ((label, volume), round(x, 1), round(y, 1))
+
+    pairs = [((spot.source, spot.well, spot.volume), (DEST, spot.spot, spot.volume)) for spot in spots]
+    groups = plan_reformat(pairs, channels=channels, key=key)
+
+    # nearest neighbour: from the last spot of a group to the closest next source
+    ordered = []
+    here = None
+    while groups:
+        if here is None:
+            group = groups[0]
+        else:
+            group = min(groups, key=lambda g: math.dist(here, key(g.sources[0])[1:]))
+        groups.remove(group)
+        ordered.append(group)
+        here = key(group.dests[-1][-1])[1:]
+    return ordered
+
+
+def run_spots(pipette, groups: list[Group], labware: dict, dest, tips,
+              wash: Callable[[], None]) -> None:
+    """Spot a compiled plan. ``labware`` maps source labels to loaded labware."""
+    current = None
+    for group in groups:
+        if group.tips != current:
+            if current is not None:
+                tips.return_tips(pipette)
+            tips.pickup_tips(group.tips, pipette)
+            current = group.tips
+        else:
+            wash()
+        index = primary(group, pipette, tips)
+        label, well, volume = group.sources[index]
+        source = labware[label][well]
+        pairs = [(source, dest[dests[index][1]]) for dests in group.dests]
+        run_plan(pipette, plan_spots(pairs, volume, pipette.max_volume), wash)
+    if current is not None:
+        tips.return_tips(pipette)
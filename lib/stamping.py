@@ -0,0 +1,144 @@
+"""
+Row stamping through a staging column
+=====================================
+
+A plate where every row gets its own reagent (one metal per row) used to be
+filled one row at a time with a single nozzle: a tip per reagent and one
+trip per well. When the rows sit on top of each other in the same columns
+and get the same volume per column, the reagents can be staged instead.
+Each one is aliquoted into one well of an empty column, and a partial
+column of nozzles then fills every row at once, one trip per column.
+
+Staging costs a trip or two per reagent and one more tip pickup.
+``plan_rows`` recognises the pattern and compares rough step costs for both
+ways. It only stages when that saves time, and ``run`` does whichever was
+picked. Extra wells a reagent goes to outside its row (controls) are filled
+from the source tube in both cases::
+
+    fills = [RowFill(metals.wells()[m], rxn_plate.rows()[m][0:12], volumes,
+                     mix=(3, 100), extras=[(rxn_plate.rows()[6][2*m], 30)]) for m in range(6)]
+    plan = plan_rows(fills, staging.columns()[0], p300m)
+    plan.run(p300m, pickup=lambda n: pickup_tips(n, p300m, protocol), drop=p300m.drop_tip)
+    protocol.comment(plan.report())
+
+Partial pickups are assumed to start on H1, so the primary nozzle is on
+the front row of the stamp.
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field
+from typing import Callable
+
+
+PICKUP_S = 8.0          # tip pickup and drop (rough; lib.sim models the run)
+TRIP_S = 10.0           # aspirate, move, dispense, move back
+MIX_CYCLE_S = 2.5
+STAGING_DEAD_UL = 20.0  # left in each staging well
+
+
+@dataclass
+class RowFill:
+    """``volumes[i]`` of ``source`` into ``wells[i]`` (one plate row), plus ``extras``."""
+    source: object
+    wells: list
+    volumes: list[float]
+    mix: tuple[int, float] | None = None          # mix the source before the first aspirate
+    extras: list[tuple[object, float]] = field(default_factory=list)
+
+    def __post_init__(self) -> None:
+        self.volumes = [float(volume) for volume in self.volumes]     # titration plans are arrays
+        if len(self.volumes) != len(self.wells):
+            raise ValueError(f"{len(self.volumes)} volumes for {len(self.wells)} wells.")
+
+    @property
+    def total(self) -> float:
+        return sum(self.volumes)
+
+
+@dataclass
+class RowPlan:
+    fills: list[RowFill]
+    staging: list
+    stamp: bool
+    row_seconds: float
+    stamp_seconds: float | None
+    reason: str = ""
+
+    def run(self, pipette, pickup: Callable[[int], None], drop: Callable[[], None]) -> None:
+        for fill in self.fills:
+            pickup(1)
+            if fill.mix:
+                pipette.mix(*fill.mix, fill.source)
+            if self.stamp:
+                staged = self.staging[self.fills.index(fill)]
+                pipette.transfer(fill.total + STAGING_DEAD_UL, fill.source, staged, new_tip='never')
+            else:
+                pipette.transfer(fill.volumes, fill.source, fill.wells, new_tip='never')
+            for well, volume in fill.extras:
+                pipette.transfer(volume, fill.source, well, new_tip='never')
+            drop()
+        if self.stamp:
+            # the primary nozzle sits on the front row
+            front = self.fills[-1]
+            pickup(len(self.fills))
+            pipette.transfer(front.volumes, self.staging[len(self.fills) - 1], front.wells, new_tip='never')
+            drop()
+
+    def report(self) -> str:
+        if not self.stamp:
+            return f"Row fills one row at a time ({self.reason}), ~{self.row_seconds / 60:.1f} min."
+        return (f"Row fills staged and stamped with {len(self.fills)} nozzles: "
+                f"~{self.stamp_seconds / 60:.1f} min instead of ~{self.row_seconds / 60:.1f} min.")
+
+
+def _trips(volume: float, max_volume: float) -> int:
+    return math.ceil(volume / max_volume)
+
+
+def _stampable(fills: list[RowFill], staging: list, pipette) -> str:
+    """Why ``fills`` can't be stamped, or an empty string if they can."""
+    if len(fills) < 2:
+        return "only one row"
+    if len(fills) > min(pipette.channels, 8):
+        return f"more rows than the {pipette.channels} nozzles"
+    if len(staging) < len(fills):
+        return "not enough staging wells"
+    columns = [[well.well_name[1:] for well in fill.wells] for fill in fills]
+    rows = [{well.well_name[0] for well in fill.wells} for fill in fills]
+    if any(len(row) != 1 for row in rows):
+        return "a fill goes to more than one row"
+    letters = [ord(row.pop()) for row in rows]
+    if letters != list(range(letters[0], letters[0] + len(fills))):
+        return "rows aren't consecutive"
+    if any(fill.wells[0].parent is not fills[0].wells[0].parent for fill in fills):
+        return "rows are on different plates"
+    if any(c != columns[0] for c in columns) or any(f.volumes != fills[0].volumes for f in fills):
+        return "rows differ in columns or volumes"
+    for fill, well in zip(fills, staging):
+        if fill.total + STAGING_DEAD_UL > well.max_volume:
+            return f"{fill.total:.0f} µL doesn't fit a staging well"
+    return ""
+
+
+def plan_rows(fills: list[RowFill], staging: list, pipette) -> RowPlan:
+    """Stage and stamp ``fills`` if they allow it and it is quicker."""
+    max_volume = pipette.max_volume
+    shared = 0.0
+    rows = 0.0
+    for fill in fills:
+        shared += PICKUP_S + (fill.mix[0] * MIX_CYCLE_S if fill.mix else 0)
+        shared += sum(TRIP_S * _trips(volume, max_volume) for _, volume in fill.extras)
+        rows += sum(TRIP_S * _trips(volume, max_volume) for volume in fill.volumes)
+    row_seconds = shared + rows
+
+    reason = _stampable(fills, staging, pipette)
+    if reason:
+        return RowPlan(fills, staging, False, row_seconds, None, reason)
+    staging_trips = sum(_trips(fill.total + STAGING_DEAD_UL, max_volume) for fill in fills)
+    stamp_trips = sum(_trips(volume, max_volume) for volume in fills[0].volumes)
+    stamp_seconds = shared + TRIP_S * (staging_trips + stamp_trips) + PICKUP_S
+    if stamp_seconds >= row_seconds:
+        return RowPlan(fills, staging, False, row_seconds, stamp_seconds, "staging wouldn't save time")
+    return RowPlan(fills, staging, True, row_seconds, stamp_seconds)
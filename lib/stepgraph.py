@@ -0,0 +1,167 @@
+"""
+Step graphs for overlapping gantry work with waits
+==================================================
+
+A protocol written as a straight list of calls waits out every settle time
+(beads on a magnet, a plate cooling down) with the gantry parked, even when
+the next few gripper moves or pipetting steps don't depend on it. On the Flex
+the gripper and the pipette share one gantry, so two moves never run at the
+same time. What can overlap is gantry work and waits.
+
+Steps are added with the steps they depend on and a rough duration estimate.
+Settle times are steps of their own (``add_wait``) that hold up their
+dependents but not the gantry. ``schedule`` orders everything like a
+single-machine list scheduler: the step that can start earliest goes first,
+and ties go to the step with the longest path to the end of the run. A wait is
+run as a ``lib.timers.Deadline``, so whatever gets scheduled into it is free::
+
+    steps = StepGraph(protocol, "purification")
+    steps.add("beads to magnet", lambda: protocol.move_labware(...), 20)
+    steps.add_wait("beads settle", 60, after=["beads to magnet"])
+    steps.add("plate to cold", lambda: protocol.move_labware(...), 20, after=["beads to magnet"])
+    steps.add("remove lysate", remove_lysate, 90, after=["beads settle"])
+    steps.run()
+    protocol.comment(steps.report())
+
+Every step has to list *all* the steps it depends on, including ones that
+only share a deck slot or the tips on the pipette. Anything left out is
+treated as independent and may be reordered.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Callable
+
+from lib.timers import Deadline, now
+
+
+@dataclass
+class Task:
+    name: str
+    action: Callable[[], None] | None   # None for a wait
+    estimate: float                     # seconds; only used for ordering, except for waits
+    after: list[str] = field(default_factory=list)
+    started: float | None = None
+    finished: float | None = None
+
+
+class StepGraph:
+    """Steps of a protocol with their dependencies and settle times."""
+
+    def __init__(self, protocol, name: str = "") -> None:
+        self.protocol = protocol
+        self.name = name
+        self.tasks: dict[str, Task] = {}
+        self.run_start: float | None = None
+        self.run_end: float | None = None
+
+    def add(self, name: str, action: Callable[[], None] | None, estimate: float,
+            after: list[str] = ()) -> str:
+        if name in self.tasks:
+            raise ValueError(f"Step {name!r} was added twice.")
+        for dep in after:
+            if dep not in self.tasks:
+                raise ValueError(f"Step {name!r} depends on unknown step {dep!r}.")
+        self.tasks[name] = Task(name, action, estimate, list(after))
+        return name
+
+    def add_wait(self, name: str, seconds: float, after: list[str]) -> str:
+        """A settle time that starts when ``after`` is done and keeps the gantry free."""
+        return self.add(name, None, seconds, after)
+
+    def tail(self) -> dict[str, float]:
+        """Estimated time from the start of each step to the end of the run."""
+        tails: dict[str, float] = {}
+        for task in reversed(list(self.tasks.values())):
+            dependents = [tails[other.name] for other in self.tasks.values()
+                          if task.name in other.after]
+            tails[task.name] = task.estimate + max(dependents, default=0.0)
+        return tails
+
+    def schedule(self) -> list[Task]:
+        """Execution order that keeps the gantry busy during settle times."""
+        tails = self.tail()
+        index = {name: i for i, name in enumerate(self.tasks)}
+        released: dict[str, float] = {}
+        clock = 0.0
+        order = []
+        pending = list(self.tasks.values())
+        while pending:
+            ready = [task for task in pending if all(dep in released for dep in task.after)]
+            start = {task.name: max([0.0 if task.action is None else clock]
+                                    + [released[dep] for dep in task.after])
+                     for task in ready}
+            # on a tie a wait goes first, so nothing holds up its start
+            task = min(ready, key=lambda t: (start[t.name], t.action is not None,
+                                             -tails[t.name], index[t.name]))
+            released[task.name] = start[task.name] + task.estimate
+            if task.action is not None:
+                clock = released[task.name]
+            order.append(task)
+            pending.remove(task)
+        return order
+
+    def serial_estimate(self) -> float:
+        return sum(task.estimate for task in self.tasks.values())
+
+    def scheduled_estimate(self) -> float:
+        clock = 0.0
+        released: dict[str, float] = {}
+        for task in self.schedule():
+            start = max([0.0 if task.action is None else clock]
+                        + [released[dep] for dep in task.after])
+            released[task.name] = start + task.estimate
+            if task.action is not None:
+                clock = released[task.name]
+        return max(released.values(), default=0.0)
+
+    def run(self) -> None:
+        """Execute every step in scheduled order, waiting only where needed."""
+        deadlines: dict[str, Deadline] = {}
+        released: dict[str, float] = {}
+        self.run_start = now(self.protocol)
+
+        def start_waits():
+            # a wait counts from when its last dependency finished, not from when it is reached
+            started = True
+            while started:
+                started = False
+                for task in self.tasks.values():
+                    if (task.action is None and task.name not in deadlines
+                            and all(dep in released for dep in task.after)):
+                        start = max([self.run_start] + [released[dep] for dep in task.after])
+                        deadlines[task.name] = Deadline(self.protocol, seconds=task.estimate,
+                                                        label=task.name, start=start)
+                        released[task.name] = deadlines[task.name].end
+                        started = True
+
+        start_waits()
+        for task in self.schedule():
+            if task.action is None:
+                continue
+            for dep in task.after:
+                if dep in deadlines:
+                    deadlines[dep].wait()
+            task.started = now(self.protocol)
+            task.action()
+            task.finished = now(self.protocol)
+            released[task.name] = task.finished
+            start_waits()
+        for deadline in deadlines.values():
+            deadline.wait()
+        self.run_end = now(self.protocol)
+
+    def report(self) -> str:
+        """Serial vs overlapped duration, measured if the run had a clock."""
+        measured = self.run_end is not None and self.run_end > self.run_start
+        if measured:
+            serial = sum(task.estimate if task.action is None else task.finished - task.started
+                         for task in self.tasks.values())
+            overlapped = self.run_end - self.run_start
+        else:
+            serial, overlapped = self.serial_estimate(), self.scheduled_estimate()
+        name = f"{self.name}: " if self.name else ""
+        return (f"{name}{serial / 60:.1f} min serially, {overlapped / 60:.1f} min with "
+                f"settle times overlapped ({(serial - overlapped) / 60:.1f} min saved"
+                f"{'' if measured else ', estimated'}).")
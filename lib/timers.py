@@ -0,0 +1,70 @@
+"""
+Deadlines for incubations that other work can overlap
+=====================================================
+
+Instead of ``protocol.delay(minutes=10)`` right after starting an
+incubation, start a ``Deadline`` and keep pipetting; ``wait()`` then only
+delays for whatever is left.
+
+The clock is ``time.monotonic()`` on the robot. While simulating there is no
+wall clock worth reading, so the modeled clock of lib.sim is used when the
+context has one; otherwise nothing has elapsed and ``wait()`` delays for the
+full time, exactly like the plain ``protocol.delay`` it replaces.
+
+After ``wait()`` the deadline knows how much of the incubation other steps
+covered; ``summary()`` gives a line for ``protocol.comment``::
+
+    incubation = Deadline(protocol, minutes=15, label="metal binding")
+    prep_desalt(protocol)
+    incubation.wait()
+    protocol.comment(incubation.summary())
+"""
+
+from __future__ import annotations
+
+import time
+
+
+def now(protocol) -> float:
+    """Seconds on the run clock (modeled clock when simulating)."""
+    if protocol.is_simulating():
+        return getattr(protocol, "clock", 0.0)
+    return time.monotonic()
+
+
+class Deadline:
+    """Point in time that an incubation is done."""
+
+    def __init__(self, protocol, seconds: float = 0, minutes: float = 0, label: str = "",
+                 start: float | None = None) -> None:
+        self.protocol = protocol
+        self.label = label
+        self.duration = seconds + 60 * minutes
+        self.start = now(protocol) if start is None else start     # earlier if it began already
+        self.end = self.start + self.duration
+        self.waited: float | None = None    # seconds actually delayed, set by wait()
+
+    def remaining(self) -> float:
+        return max(self.end - now(self.protocol), 0.0)
+
+    def expired(self) -> bool:
+        return self.remaining() == 0
+
+    def wait(self) -> None:
+        """Block for the rest of the incubation, if any is left."""
+        remaining = self.remaining()
+        self.waited = remaining
+        if remaining > 0:
+            self.protocol.delay(seconds=remaining, msg=self.label or None)
+
+    @property
+    def overlapped(self) -> float:
+        """Seconds of the incubation spent on other steps instead of waiting."""
+        if self.waited is None:
+            return min(now(self.protocol) - self.start, self.duration)
+        return self.duration - self.waited
+
+    def summary(self) -> str:
+        name = self.label or "Incubation"
+        return (f"{name[0].upper()}{name[1:]}: {self.overlapped / 60:.1f} of "
+                f"{self.duration / 60:.1f} min overlapped with other steps.")
@@ -0,0 +1,128 @@
+"""
+24-tip layouts for the 96-channel
+=================================
+
+A 24 well plate has twice the pitch of a tip rack, so the 96-channel works it
+with a rack that only holds tips at A1, A3, ... G11 (rows A/C/E/G, odd
+columns). Such a rack is built from full racks in two moves:
+
+1. ROW pickups drop full rows of 12 into rows A, C, E and G of a staging
+   rack. One fill covers two layouts (columns 1-6 and 7-12).
+2. COLUMN pickups take 4 tips at a time from the staging rack into every
+   other column of the 24-tip rack.
+
+Partial pickups only work on racks that are off the adapter, and full
+pickups only on racks that are on it, so every use also needs gripper moves.
+
+``TipLayout24`` plans every use of a run up front. Each use gets one of the
+24-tip racks; ``stage()`` builds all of them in one phase, with one nozzle
+configuration per kind of pickup. After that a use is just a rack swap on the
+adapter. With more uses than racks, a rack is built again once its previous
+use is over (at the next ``pick_up``).
+
+Racks that were built ahead of time, by hand or by an earlier run, are passed
+with ``preracked=True`` and skip staging entirely::
+
+    layout = TipLayout24(protocol, pipette, tips24_adapter,
+                         [tips1000_24well, tips1000_24well_2],
+                         source=tips1000, staging=empty_tiprack, uses=3)
+    layout.stage()
+    layout.pick_up(0)
+    ...
+    layout.pick_up(1)
+"""
+
+from __future__ import annotations
+
+from opentrons.protocol_api import ALL, COLUMN, ROW
+
+
+HALVES = (0, 6)     # first staging-rack column of each 24-tip set
+
+
+class TipLayout24:
+    """Plans, stages and loads 24-tip racks for every use in a run."""
+
+    def __init__(self, protocol, pipette, adapter, racks: list, source, staging,
+                 uses: int, preracked: bool = False) -> None:
+        if uses < 1 or not racks:
+            raise ValueError("Need at least one 24-tip rack and one use.")
+        self.protocol = protocol
+        self.pipette = pipette
+        self.adapter = adapter
+        self.racks = list(racks)
+        self.homes = [rack.parent for rack in self.racks]
+        self.source = source
+        self.staging = staging
+        self.uses = uses
+        self.plan = [use % len(self.racks) for use in range(uses)]   # rack for each use
+        self.staged = [preracked and use < len(self.racks) for use in range(uses)]
+        self.finished = [False] * uses
+        self.halves: list[int] = []         # staging-rack sets ready to move
+        self.style = None                   # nozzle layout set by the last staging pickup
+        self.on_adapter: int | None = None  # rack index
+
+    def rack(self, use: int):
+        """The 24-tip rack that serves ``use``."""
+        return self.racks[self.plan[use]]
+
+    def buildable(self, use: int) -> bool:
+        if self.staged[use] or self.on_adapter == self.plan[use]:
+            return False
+        earlier = [other for other in range(use) if self.plan[other] == self.plan[use]]
+        return not earlier or self.finished[earlier[-1]] and self.staged[earlier[-1]]
+
+    def stage(self) -> int:
+        """Build every layout whose rack is free; return how many were built."""
+        built = 0
+        self.style = None
+        for use in range(self.uses):
+            if not self.buildable(use):
+                continue
+            if not self.halves:
+                self._configure(ROW, start="H1", tip_racks=[self.source])
+                for row in range(4):
+                    self.pipette.pick_up_tip()
+                    self.pipette.drop_tip(self.staging.rows()[row * 2][0])
+                self.halves = list(HALVES)
+            half = self.halves.pop(0)
+            self._configure(COLUMN, start="A12")
+            for col in range(6):
+                self.pipette.pick_up_tip(self.staging.rows()[0][col + half])
+                self.pipette.drop_tip(self.rack(use).rows()[0][col * 2])
+            self.staged[use] = True
+            built += 1
+        return built
+
+    def load(self, use: int):
+        """Put the rack for ``use`` on the adapter, building it first if needed."""
+        for other in range(use):
+            self.finished[other] = True
+        rack = self.plan[use]
+        if not self.staged[use]:
+            self._park()
+            self.stage()
+        if self.on_adapter != rack:
+            self._park()
+            self.protocol.move_labware(self.racks[rack], self.adapter, use_gripper=True)
+            self.on_adapter = rack
+        return self.racks[rack]
+
+    def pick_up(self, use: int):
+        """Load the rack for ``use`` and pick up its 24 tips."""
+        rack = self.load(use)
+        self.style = None
+        self.pipette.configure_nozzle_layout(style=ALL)
+        self.pipette.pick_up_tip(rack.rows()[0][0])
+        return rack
+
+    def _park(self) -> None:
+        if self.on_adapter is not None:
+            self.protocol.move_labware(self.racks[self.on_adapter], self.homes[self.on_adapter],
+                                       use_gripper=True)
+            self.on_adapter = None
+
+    def _configure(self, style, **kwargs) -> None:
+        if self.style != style:
+            self.pipette.configure_nozzle_layout(style=style, **kwargs)
+            self.style = style
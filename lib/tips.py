@@ -0,0 +1,190 @@
+"""
+Tip allocation for multi-channel partial pickups
+================================================
+
+Replaces the ``pickup_tips``/``return_tips`` copies (and their ``tip_20``,
+``tip_300`` and ``last_tip20`` globals) that every protocol used to carry.
+
+Every rack is a 96-bit bitmap of free tips, bit ``col * 8 + row`` (the same
+order as ``rack.wells()``). A multi-channel that starts on H1 always takes
+tips from the back of a column (row A) forwards, and one that starts on A1
+takes them from the front (row H) backwards, so the free tips in a column are
+always one contiguous run and a column is fully described by how many tips it
+has left. Columns are bucketed by that count in one bitmap per count, so the
+best-fit column for any nozzle count is a few bit operations instead of a scan
+over the racks.
+
+Best fit means partial pickups finish off columns that are already partly
+used before they break into a full one, so full columns stay available for
+8-channel pickups and tips are not stranded in half-empty columns.
+
+Dirty tips are dropped into the matching well of the pipette's dirty rack,
+i.e. the exact position they were picked from, so partial and single returns
+never collide with each other.
+
+Typical use inside a protocol::
+
+    tips = TipAllocator(protocol)
+    tips.add_pipette(p20m, [tips20], dirty_racks=[dirty_tips20])
+    tips.pickup_tips(3, p20m)
+    ...
+    tips.return_tips(p20m)
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+
+from opentrons.protocol_api import ALL, PARTIAL_COLUMN, SINGLE
+
+
+ROWS = 8
+COLS = 12
+FULL_COLUMN = (1 << ROWS) - 1
+
+# Last nozzle of a partial column, keyed by the number of tips.
+END_NOZZLE = {
+    "H1": {2: "G1", 3: "F1", 4: "E1", 5: "D1", 6: "C1", 7: "B1"},
+    "A1": {2: "B1", 3: "C1", 4: "D1", 5: "E1", 6: "F1", 7: "G1"},
+}
+
+
+def _lowest_bit(mask: int) -> int:
+    return (mask & -mask).bit_length() - 1
+
+
+@dataclass
+class TipPool:
+    """The tip racks (and matching dirty racks) that feed one pipette."""
+    pipette: object
+    tip_racks: list
+    dirty_racks: list
+    start: str = "H1"
+    free: list[int] = field(default_factory=list)       # one bitmap per rack
+    buckets: list[int] = field(default_factory=list)    # column bitmap per count
+    last: tuple[int, int] | None = None                 # (rack, well) of last pickup
+    picked: int = 0
+    refills: int = 0
+
+    def __post_init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        all_tips = (1 << (ROWS * COLS)) - 1
+        self.free = [all_tips for _ in self.tip_racks]
+        self.buckets = [0] * (ROWS + 1)
+        self.buckets[ROWS] = (1 << (COLS * len(self.tip_racks))) - 1
+
+    def remaining(self, rack: int, col: int) -> int:
+        return bin((self.free[rack] >> (col * ROWS)) & FULL_COLUMN).count("1")
+
+    def best_column(self, number: int) -> int | None:
+        """Global column index (rack * 12 + col) with the fewest tips >= number."""
+        for count in range(number, ROWS + 1):
+            if self.buckets[count]:
+                return _lowest_bit(self.buckets[count])
+        return None
+
+    def take(self, number: int) -> tuple[int, int, int] | None:
+        """Claim ``number`` tips; return (rack, column, first row) or None."""
+        column = self.best_column(number)
+        if column is None:
+            return None
+        rack, col = divmod(column, COLS)
+        left = self.remaining(rack, col)
+        if self.start == "H1":
+            first_row = ROWS - left                 # back of the column first
+        else:
+            first_row = left - number               # front of the column first
+        taken = ((1 << number) - 1) << (col * ROWS + first_row)
+        self.free[rack] &= ~taken
+        self.buckets[left] &= ~(1 << column)
+        self.buckets[left - number] |= 1 << column
+        self.picked += number
+        return rack, col, first_row
+
+    def tips_left(self) -> int:
+        return sum(bin(rack).count("1") for rack in self.free)
+
+
+class TipAllocator:
+    """Hands out tips for every pipette in a protocol."""
+
+    def __init__(self, protocol, refill: bool = True) -> None:
+        self.protocol = protocol
+        self.refill = refill
+        self.pools: dict[int, TipPool] = {}
+
+    def add_pipette(self, pipette, tip_racks, dirty_racks=None, start: str = "H1") -> TipPool:
+        """Register a pipette with its clean racks and (optional) dirty racks."""
+        if start not in END_NOZZLE:
+            raise ValueError(f"Unsupported primary nozzle {start!r}, use 'H1' or 'A1'.")
+        if dirty_racks is not None and len(dirty_racks) != len(tip_racks):
+            raise ValueError("Need one dirty rack per tip rack.")
+        pool = TipPool(pipette, list(tip_racks), list(dirty_racks or []), start)
+        self.pools[id(pipette)] = pool
+        return pool
+
+    def pool(self, pipette) -> TipPool:
+        try:
+            return self.pools[id(pipette)]
+        except KeyError:
+            raise ValueError(f"{pipette} was never registered with add_pipette.") from None
+
+    def pickup_tips(self, number: int, pipette):
+        """Configure the nozzles for ``number`` tips and pick them up."""
+        pool = self.pool(pipette)
+        channels = getattr(pipette, "channels", 8)
+        if number < 1 or number > min(channels, ROWS):
+            raise ValueError(f"Can't pick up {number} tips with {pipette}.")
+
+        slot = pool.take(number)
+        if slot is None:
+            self._refill(pool)
+            slot = pool.take(number)
+        rack, col, first_row = slot
+
+        if channels == 1:
+            row = first_row
+        elif number == ROWS:
+            pipette.configure_nozzle_layout(style=ALL)
+            row = 0
+        else:
+            if number == 1:
+                pipette.configure_nozzle_layout(style=SINGLE, start=pool.start)
+            else:
+                pipette.configure_nozzle_layout(style=PARTIAL_COLUMN, start=pool.start,
+                                                end=END_NOZZLE[pool.start][number])
+            # the primary nozzle sits on the tip nearest the front (H1) or back (A1)
+            row = first_row + number - 1 if pool.start == "H1" else first_row
+
+        well = col * ROWS + row
+        pool.last = (rack, well)
+        pipette.pick_up_tip(pool.tip_racks[rack].wells()[well])
+        return pool.tip_racks[rack].wells()[well]
+
+    def return_tips(self, pipette) -> None:
+        """Drop the current tips where they came from in the dirty rack."""
+        pool = self.pool(pipette)
+        if pool.last is None:
+            raise ValueError(f"{pipette} has no tips to return.")
+        rack, well = pool.last
+        if pool.dirty_racks:
+            pipette.drop_tip(pool.dirty_racks[rack].wells()[well])
+        else:
+            pipette.return_tip()
+        pool.last = None
+
+    def tips_left(self, pipette) -> int:
+        return self.pool(pipette).tips_left()
+
+    def _refill(self, pool: TipPool) -> None:
+        if not self.refill:
+            raise ValueError(f"Out of tips for {pool.pipette}.")
+        slots = ", ".join(str(rack.parent) for rack in pool.tip_racks)
+        self.protocol.pause(f"Out of tips for {pool.pipette}. Replace the tip racks "
+                            f"in {slots} and empty the matching dirty racks.")
+        for rack in pool.tip_racks + pool.dirty_racks:
+            rack.reset()
+        pool.reset()
+        pool.refills += 1
@@ -0,0 +1,148 @@
+"""
+Dilution-series planning
+========================
+
+Works out every volume of a titration from concentrations instead of
+per-protocol hand math like ``start_vol*(3/5)``. All series of a plate are
+planned at once as NumPy arrays of shape ``(series, points)``. The stocks and
+top concentrations can differ per series.
+
+A titration row looks like this:
+
+* the first ``len(direct)`` wells get titrant straight from the stock. The
+  last of them also gets the extra volume that is carried down the row.
+* the remaining wells are a serial dilution. ``carry`` µL is moved from
+  each well to the next, and the same amount is removed from the last well.
+* every well gets the fixed ``components`` (e.g. a 5x protein stock), and the
+  rest is diluent (buffer, or a premix that already holds the components).
+
+``rxn_vol`` is the volume in each well during the titration. ``final_vol``
+is the volume once later additions (sypro, EDTA, ...) are in, and it is
+what concentrations and component folds refer to. ``dilution_factor``
+follows the protocols' convention: 1 is a 1:1 series (two-fold) and 2 is
+a 1:2 series (three-fold). ``fold`` gives the fold change directly.
+
+Example::
+
+    series = plan_titration(stock=50, top=10, points=12, rxn_vol=20,
+                            dilution_factor=2, components={"dna": 5})
+    series.validate(p20m, plate.wells()[0])
+    p20m.transfer(series.diluent[0].tolist(), buff, plate.rows()[0][0:12])
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+
+import numpy as np
+
+
+@dataclass
+class TitrationPlan:
+    """Per-well volumes (µL) and final concentrations, shape (series, points)."""
+    concentrations: np.ndarray
+    titrant: np.ndarray
+    diluent: np.ndarray
+    carry_in: np.ndarray
+    carry_out: np.ndarray               # last well: excess to discard
+    components: dict[str, np.ndarray] = field(default_factory=dict)
+    carry: float = 0.0
+
+    @property
+    def fill(self) -> np.ndarray:
+        """Volume in each well before anything is carried out."""
+        return self.titrant + self.diluent + self.carry_in + sum(self.components.values())
+
+    def totals(self) -> dict[str, float]:
+        """µL of each reagent needed over all series (without dead volume)."""
+        totals = {"titrant": float(self.titrant.sum()), "diluent": float(self.diluent.sum())}
+        totals.update({name: float(volumes.sum()) for name, volumes in self.components.items()})
+        return totals
+
+    def problems(self, min_volume: float, max_volume: float | None = None,
+                 capacity: float | None = None) -> list[str]:
+        """Volumes a pipette can't move (or a well can't hold)."""
+        problems = []
+        if self.carry and not min_volume - 1e-9 <= self.carry <= (max_volume or self.carry):
+            problems.append(f"carry {self.carry:.2f} µL is outside the {min_volume:g}-"
+                            f"{max_volume:g} µL range")
+        pipetted = {"titrant": self.titrant, "diluent": self.diluent, **self.components}
+        for name, volumes in pipetted.items():
+            low = (volumes > 0) & (volumes < min_volume - 1e-9)
+            for series, point in zip(*np.nonzero(low)):
+                problems.append(f"{name} {volumes[series, point]:.2f} µL in series {series}, "
+                                f"well {point} is below the {min_volume:g} µL minimum")
+        negative = self.diluent < -1e-9
+        for series, point in zip(*np.nonzero(negative)):
+            problems.append(f"series {series}, well {point} is over-full by "
+                            f"{-self.diluent[series, point]:.2f} µL before any diluent")
+        if capacity:
+            over = self.fill > capacity + 1e-9
+            for series, point in zip(*np.nonzero(over)):
+                problems.append(f"series {series}, well {point} holds {self.fill[series, point]:.1f} µL, "
+                                f"over the {capacity:g} µL well")
+        return problems
+
+    def validate(self, pipette, well=None) -> None:
+        """Raise ValueError if ``pipette`` or ``well`` can't handle the plan."""
+        capacity = getattr(well, "max_volume", None) if well is not None else None
+        problems = self.problems(pipette.min_volume, pipette.max_volume, capacity)
+        if problems:
+            raise ValueError("Titration can't be pipetted:\n  " + "\n  ".join(problems))
+
+
+def series_fold(dilution_factor: float | None = None, fold: float | None = None) -> float:
+    if fold is None:
+        if dilution_factor is None:
+            raise ValueError("Give either dilution_factor or fold.")
+        fold = dilution_factor + 1
+    if fold <= 1:
+        raise ValueError(f"A dilution series needs a fold above 1, not {fold}.")
+    return float(fold)
+
+
+def plan_titration(stock, points: int, rxn_vol: float, top=None, direct=None,
+                   dilution_factor: float | None = None, fold: float | None = None,
+                   final_vol: float | None = None, components: dict[str, float] | None = None,
+                   series: int | None = None) -> TitrationPlan:
+    """Plan a dilution series for every series at once.
+
+    ``stock`` and ``top`` are concentrations (any unit, the same for both);
+    give either ``top`` (one direct well) or ``direct`` (leading wells made
+    straight from stock). Either may be per series. ``components`` maps name
+    to stock fold, e.g. ``{"protein": 5}`` for a 5x stock.
+    """
+    f = series_fold(dilution_factor, fold)
+    final_vol = rxn_vol if final_vol is None else final_vol
+    if direct is None:
+        if top is None:
+            raise ValueError("Give the top concentration or the direct wells.")
+        direct = np.asarray(top, dtype=float)[..., np.newaxis]
+    direct = np.atleast_2d(np.asarray(direct, dtype=float))
+    stock = np.asarray(stock, dtype=float).reshape(-1, 1)
+    count = series or max(len(direct), len(stock))
+    direct = np.broadcast_to(direct, (count, direct.shape[1]))
+    stock = np.broadcast_to(stock, (count, 1))
+    leading = direct.shape[1]
+    if not 1 <= leading <= points:
+        raise ValueError(f"Need between 1 and {points} direct wells, got {leading}.")
+
+    carry = rxn_vol / (f - 1)
+    steps = np.arange(points - leading + 1)
+    concentrations = np.concatenate(
+        [direct[:, :-1], direct[:, -1:] / f ** steps], axis=1)
+
+    # volume added from reagents; the well the series starts from also holds the carry
+    own = np.full((count, points), float(rxn_vol))
+    own[:, leading - 1] += carry
+    carry_in = np.zeros((count, points))
+    carry_in[:, leading:] = carry
+    carry_out = np.zeros((count, points))
+    carry_out[:, -1] = carry
+
+    titrant = np.zeros((count, points))
+    titrant[:, :leading] = (direct * final_vol / rxn_vol) * own[:, :leading] / stock
+    parts = {name: own * final_vol / rxn_vol / stock_fold
+             for name, stock_fold in (components or {}).items()}
+    diluent = own - titrant - sum(parts.values())
+    return TitrationPlan(concentrations, titrant, diluent, carry_in, carry_out, parts, carry)
@@ -7,6 +7,12 @@ import math
 import random
 import subprocess
 
+sys.path.append('/data/user_storage')
+from lib.titration import plan_titration
+from lib.tips import TipAllocator
+from lib.dispense import Reagent, plan_dispense, run_plan
+from lib.manual import ManualSteps
+
 
 metadata = {
     'protocolName': 'DSF - 3 x 384 well, 30 metals',
@@ -26,14 +32,31 @@ metadata = {
     Buff should be ~100mM buff, 150mM NaCl (10mL in trough)''',
     'apiLevel': '2.26'}
 
+def add_parameters(parameters: protocol_api.Parameters):
+    parameters.add_bool(
+        variable_name="pipeline",
+        display_name="Pipeline plates",
+        description="Go on to the next plate while one is read in the qPCR, with one set of fill tips and multi-dispensed protein.",
+        default=False)
+
 def run(protocol):
     protocol.set_rail_lights(True)
     setup(protocol)
     dilute_metals(protocol)
-    for iteration in range(3):
-        add_protein_and_sypro(protocol, iteration) 
-        add_metal_and_titrate(protocol, iteration)
-        message(protocol, iteration)
+    if protocol.params.pipeline:
+        # the plates have their own slots, so the robot doesn't wait for each read
+        for iteration in range(3):
+            add_protein_and_sypro(protocol, iteration)
+            add_metal_and_titrate(protocol, iteration)
+            manual.request(f"Read plate {iteration+1} (slot {iteration+1}) in qPCR.")
+        manual.wait()
+        protocol.comment(manual.report())
+    else:
+        for iteration in range(3):
+            add_protein_and_sypro(protocol, iteration) 
+            add_metal_and_titrate(protocol, iteration)
+            message(protocol, iteration)
+    protocol.comment(tip_report())
     protocol.set_rail_lights(False)
 
 def setup(protocol):
@@ -65,63 +88,106 @@ def setup(protocol):
         protein = metals.rows()[0][i]
         proteins.append(protein)
 
-    # rows
-    global rxn_vol, start_vol, dilution_factor
+    # rows: metal 5x -> 1x in 1:1 steps, protein/sypro/rox 5x in every well
+    global rxn_vol, series
     rxn_vol = 20   
-    dilution_factor = 1 # i.e. 1:2, not 1 in 2
-    start_vol = rxn_vol + (rxn_vol/dilution_factor)
+    series = plan_titration(stock=5, top=1, points=12, rxn_vol=rxn_vol, dilution_factor=1, components={"protein": 5})
+    series.validate(p20m, plates[0].wells()[0])
+
+    # tips, tracked for both pipettes
+    global tips, fill_tips
+    tips = TipAllocator(protocol)
+    tips.add_pipette(p20m, [tips20, tips20_2])
+    tips.add_pipette(p300s, [tips300])
+    fill_tips = None
+
+    global manual
+    manual = ManualSteps(protocol, metadata['protocolName'])
 
 def dilute_metals(protocol):
     # add buff to wells
-    p300s.pick_up_tip()
+    tips.pickup_tips(1, p300s)
     p300s.transfer(190, buff, metals.wells()[0:31], new_tip='never')
     p300s.transfer(200, buff, metals.wells()[31], new_tip='never')
-    p300s.return_tip()
+    tips.return_tips(p300s)
 
     # add metal to buffs
     well = 0
     for rack in [tubes1, tubes2]:
         for tube in range(15):
-            p300s.pick_up_tip()
+            tips.pickup_tips(1, p300s)
             p300s.transfer(10, rack.wells()[tube], metals.wells()[well], new_tip='never', mix_after=(3,50))         
-            p300s.return_tip()   
+            tips.return_tips(p300s)   
             well += 1
             
     # add extra EDTA well
-    p300s.pick_up_tip()
+    tips.pickup_tips(1, p300s)
     p300s.transfer(10, tubes2.wells()[14], metals.wells()[30], new_tip='never', mix_after=(3,50))         
-    p300s.return_tip()   
+    tips.return_tips(p300s)   
 
 def add_protein_and_sypro(protocol, iteration):
     rows = [0,1,0,1]
     cols = [0,0,12,12]
     
-    p20m.pick_up_tip()
+    if not protocol.params.pipeline:
+        tips.pickup_tips(8, p20m)
+        for row, col in zip(rows, cols):
+            p20m.transfer(series.diluent[0][0], buffs[iteration], plates[iteration].rows()[row][col], new_tip='never')
+            p20m.transfer(series.diluent[0][1], buffs[iteration], plates[iteration].rows()[row][col+1:col+12], new_tip='never')
+        for row, col in zip(rows, cols):
+            p20m.transfer(series.components["protein"][0][0], proteins[iteration], plates[iteration].rows()[row][col], new_tip='never')
+            p20m.transfer(series.components["protein"][0][1], proteins[iteration], plates[iteration].rows()[row][col+1:col+12], new_tip='never')
+        tips.return_tips(p20m)
+        return
+
+    # pipelined: every plate gets the same buffer and protein mix, so one set of
+    # fill tips does all three, and the 4µL protein goes out several wells per aspirate
+    global fill_tips
+    if fill_tips is None:
+        fill_tips = tips.pickup_tips(8, p20m)
+    else:
+        p20m.pick_up_tip(fill_tips)
     for row, col in zip(rows, cols):
-        p20m.transfer(start_vol*(3/5), buffs[iteration], plates[iteration].rows()[row][col], new_tip='never')
-        p20m.transfer(rxn_vol*(4/5), buffs[iteration], plates[iteration].rows()[row][col+1:col+12], new_tip='never')
+        p20m.transfer(series.diluent[0][0], buffs[iteration], plates[iteration].rows()[row][col], new_tip='never')
+        p20m.transfer(series.diluent[0][1], buffs[iteration], plates[iteration].rows()[row][col+1:col+12], new_tip='never')
+    protein = Reagent("protein", proteins[iteration])
     for row, col in zip(rows, cols):
-        p20m.transfer(start_vol*(1/5), proteins[iteration], plates[iteration].rows()[row][col], new_tip='never')
-        p20m.transfer(rxn_vol*(1/5), proteins[iteration], plates[iteration].rows()[row][col+1:col+12], new_tip='never')
+        p20m.transfer(series.components["protein"][0][0], proteins[iteration], plates[iteration].rows()[row][col], new_tip='never')
+        # the wells only hold buffer until the metals go in, so the tips can go on (and back) unwashed
+        steps = plan_dispense(protein, series.components["protein"][0][1], plates[iteration].rows()[row][col+1:col+12],
+                              max_volume=20, dest_volume=rxn_vol, concentrations=[{} for _ in range(11)])
+        run_plan(p20m, steps, wash=swap_fill_tips)
     p20m.return_tip()
 
+def swap_fill_tips():
+    global fill_tips
+    p20m.return_tip()
+    fill_tips = tips.pickup_tips(8, p20m)
+
 def add_metal_and_titrate(protocol, iteration):
     rows = [0,1,0,1]
     cols = [0,0,12,12]
     metal_col = [0,1,2,3]
 
     for row, col, metal in zip(rows, cols, metal_col):
-        p20m.pick_up_tip()
-        p20m.transfer(start_vol*(1/5), metals.rows()[0][metal], plates[iteration].rows()[row][col], new_tip='never', 
+        tips.pickup_tips(8, p20m)
+        p20m.transfer(series.titrant[0][0], metals.rows()[0][metal], plates[iteration].rows()[row][col], new_tip='never', 
                 mix_before=(3,rxn_vol))
-        p20m.transfer(rxn_vol/dilution_factor, plates[iteration].rows()[row][col+0:col+11], plates[iteration].rows()[row][col+1:col+12], 
+        p20m.transfer(series.carry, plates[iteration].rows()[row][col+0:col+11], plates[iteration].rows()[row][col+1:col+12], 
                     mix_before=(3,rxn_vol), new_tip='never')    
         p20m.mix(3,rxn_vol, plates[iteration].rows()[row][col+11])
-        p20m.aspirate(rxn_vol/dilution_factor, plates[iteration].rows()[row][col+11])
-        p20m.return_tip()
+        p20m.aspirate(series.carry, plates[iteration].rows()[row][col+11])
+        tips.return_tips(p20m)
 
 def message(protocol, iteration):
     if iteration != 2:
         protocol.pause("Read plate in qPCR. Next plate will start after this pause.")
     else:
-        protocol.pause("Read plate in qPCR.")
\ No newline at end of file
+        protocol.pause("Read plate in qPCR.")
+
+def tip_report():
+    used = []
+    for pipette, racks in [(p20m, [tips20, tips20_2]), (p300s, [tips300])]:
+        left = tips.tips_left(pipette)
+        used.append(f"{pipette.name} {96*len(racks) - left} used, {left} left")
+    return "Tips: " + "; ".join(used)
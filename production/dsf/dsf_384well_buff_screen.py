@@ -7,6 +7,11 @@ import math
 import random
 import subprocess
 
+sys.path.append('/data/user_storage')
+from lib.tips import TipAllocator
+from lib.dispense import Reagent, plan_dispense, run_plan, washes
+from lib.titration import plan_titration
+
 
 metadata = {
     'protocolName': 'DSF - 384 well buff screen',
@@ -46,6 +51,13 @@ def setup(protocol):
     water = trough.wells()[2]
     edta = metals.wells()[-1]
 
+    # rows: metal 200mM diluted in protein to 2.66mM, then 1mM, 800µM, 600µM and 6.7x steps;
+    # 17.5µL during the titration, 20µL once sypro is in
+    global series
+    series = plan_titration(stock=200000*2.66/200, direct=[1000,800,600], points=12, rxn_vol=17.5,
+                            final_vol=20, fold=6.7)
+    series.validate(p20m, plate.wells()[0])
+
     # cleaning
     global water1, waste1, water2, waste2, water3, waste3
     water1 = trough.wells()[3]
@@ -56,45 +68,10 @@ def setup(protocol):
     waste3 = trough.wells()[8]
 
     # tips
-    global tip_20, tip_300
-    tip_20 = 0
-    tip_300 = 0
-
-def pickup_tips(number, pipette, protocol):
-    global last_tip20, last_tip300, tip_20, tip_300
-    nozzle_dict = {2: "G1", 3: "F1", 4: "E1", 5: "D1", 6: "C1", 7: "B1"}
-   
-    if pipette == p20m: 
-        last_tip20 = tip_20
-        if number == 1:
-            p20m.configure_nozzle_layout(style=SINGLE,start="H1")
-        elif number > 1 and number < 8:
-            p20m.configure_nozzle_layout(style=PARTIAL_COLUMN, start="H1", end=nozzle_dict[number])
-        else:
-            p20m.configure_nozzle_layout(style=ALL)
-        p20m.pick_up_tip(tips20)
-        if number == 8: # remove if ever figure out single return
-            tip_20 += number
-
-    elif pipette == p300m:
-        last_tip300 = tip_300
-        if number == 1:
-            p300m.configure_nozzle_layout(style=SINGLE,start="H1")
-        elif number > 1 and number < 8:
-            p300m.configure_nozzle_layout(style=PARTIAL_COLUMN,start="H1", end=nozzle_dict[number])
-        else:
-            p300m.configure_nozzle_layout(style=ALL)
-        p300m.pick_up_tip(tips300)
-        if number == 8: # remove if ever figure out single return
-            tip_300 += number
-
-def return_tips(pipette):
-    if pipette == p20m:
-        # p20m.configure_nozzle_layout(style=ALL)
-        p20m.drop_tip(dirty_tips20.wells()[last_tip20])
-    elif pipette == p300m:
-        # p300m.configure_nozzle_layout(style=ALL)
-        p300m.drop_tip(dirty_tips300.wells()[last_tip300])
+    global tips
+    tips = TipAllocator(protocol)
+    tips.add_pipette(p20m, [tips20], dirty_racks=[dirty_tips20])
+    tips.add_pipette(p300m, [tips300], dirty_racks=[dirty_tips300])
 
 def clean_tips(pipette, clean_vol, protocol):
     if pipette == p20m:
@@ -109,41 +86,51 @@ def clean_tips(pipette, clean_vol, protocol):
         p20m.move_to(waste3.top().move(Point(3,0,0)))
 
 def add_protein(protocol):
-    pickup_tips(8, p300m, protocol)
+    tips.pickup_tips(8, p300m)
     p300m.distribute(197.34, protein, dilution_plate.rows()[0][0:4], new_tip='never') # add protein to metal dilution wells
 
     rows = [0,1,0,1]
     cols = [0,0,12,12]
     for row, col in zip(rows, cols):
-        p300m.distribute([10,11.48,15.27,17.5,17.5,17.5,17.5,17.5,17.5,17.5,17.5,17.5], protein, plate.rows()[row][col:col+12], new_tip='never')# add protein to pcr plate
-    return_tips(p300m)
+        p300m.distribute(series.diluent[0].tolist(), protein, plate.rows()[row][col:col+12], new_tip='never')# add protein to pcr plate
+    tips.return_tips(p300m)
 
 def add_metal_and_titrate(protocol):
     rows = [0,1,0,1]
     cols = [0,0,12,12]
     i = 0
     for row, col in zip(rows, cols):
-        pickup_tips(8, p20m, protocol)
+        tips.pickup_tips(8, p20m)
         p20m.transfer(2.66, metals.rows()[0][i], dilution_plate.rows()[0][i], mix_after=(10,20), new_tip='never') # dilute 200mM to 2.6562mM (2.66)
-        p20m.transfer(7.5, dilution_plate.rows()[0][i], plate.rows()[0+row][0+col], mix_after=(5,10), new_tip='never') # dliute to 1mM in plate
-        p20m.transfer(6.02, dilution_plate.rows()[0][i], plate.rows()[0+row][1+col], mix_after=(5,10), new_tip='never') # dliute to 800µM in plate
-        p20m.transfer(5.3, dilution_plate.rows()[0][i], plate.rows()[0+row][2+col], mix_after=(5,10), new_tip='never') # dliute to 600µM in plate
-        p20m.transfer(3.07, plate.rows()[0+row][2+col:11+col], plate.rows()[0+row][3+col:12+col], mix_after=(3,10), new_tip='never') # titrate 6.7x dilution series
-        p20m.aspirate(3.07, plate.rows()[0+row][11+col]) # remove excess
+        for point in range(3):
+            p20m.transfer(series.titrant[0][point], dilution_plate.rows()[0][i], plate.rows()[0+row][point+col], mix_after=(5,10), new_tip='never') # dilute to 1mM, 800µM, 600µM in plate
+        p20m.transfer(series.carry, plate.rows()[0+row][2+col:11+col], plate.rows()[0+row][3+col:12+col], mix_after=(3,10), new_tip='never') # titrate 6.7x dilution series
+        p20m.aspirate(series.carry, plate.rows()[0+row][11+col]) # remove excess
         i += 1 
-        return_tips(p20m)
+        tips.return_tips(p20m)
 
 def add_edta(protocol):
     for col in range(12,18):
-        pickup_tips(1, p20m, protocol)
+        tips.pickup_tips(1, p20m)
         p20m.transfer(2, edta, plate.rows()[15][col], new_tip='never')
         p20m.drop_tip()    
     
 def add_sypro(protocol):
-    pickup_tips(8, p20m, protocol)
+    # sypro goes into the liquid, then every well is mixed; a tip only goes on unwashed
+    # into a well of the same metal series at a higher concentration
+    sypro_reagent = Reagent("sypro", sypro, tolerance=0.005)
+    destinations = []
+    contents = []
     for row in range(0,2):
         for col in range(0,24):
-            p20m.transfer(2.5, sypro, plate.rows()[row][col], new_tip='never', mix_after=(3,10)) # add spyro to all
-            clean_tips(p20m, 20, protocol)
-    return_tips(p20m)
-
+            destinations.append(plate.rows()[row][col])
+            wells = {f"metals {row + 2*(col//12)}": series.concentrations[0][col%12]}
+            if row == 1 and 12 <= col < 18:
+                wells["edta"] = 1 # row P, see add_edta
+            contents.append(wells)
+    steps = plan_dispense(sypro_reagent, 2.5, destinations, max_volume=20, dest_volume=20,
+                          mix=(3,10), concentrations=contents)
+    protocol.comment(f"Adding sypro with {washes(steps)} tip washes.")
+    tips.pickup_tips(8, p20m)
+    run_plan(p20m, steps, wash=lambda: clean_tips(p20m, 20, protocol)) # add spyro to all
+    tips.return_tips(p20m)
@@ -7,6 +7,8 @@ import math
 import random
 import subprocess
 
+sys.path.append('/data/user_storage')
+from lib.platewash import PlateWash
 
 metadata = {
     'protocolName': 'Clean 384 well DSF plate(s)',
@@ -23,12 +25,28 @@ def add_parameters(parameters: protocol_api.Parameters):
         default=1,
         minimum=1,
         maximum=8,)
+    parameters.add_int(
+        variable_name="wash_cycles",
+        display_name="Wash cycles",
+        description="Water fill/empty cycles per plate.",
+        default=3,
+        minimum=1,
+        maximum=5,)
+    parameters.add_int(
+        variable_name="soak_time",
+        display_name="Soak time",
+        description="Time water sits in a plate before it is taken out (filling the other plates counts).",
+        default=60,
+        minimum=0,
+        maximum=600,
+        unit="s")
 
 def run(protocol):
     protocol.set_rail_lights(True)
     setup(protocol)
     take_out_rxn(protocol)
     water_wash(protocol)
+    protocol.comment(wash.report())
     protocol.set_rail_lights(False)
 
 def setup(protocol):
@@ -41,28 +59,21 @@ def setup(protocol):
         plate = protocol.load_labware('appliedbiosystemsmicroamp_384_wellplate_40ul', i+1)
         plates.append(plate)
     res1 = protocol.load_labware('nest_1_reservoir_195ml', 10)
-    waste = res1.wells()[0].top()
+    waste = res1.wells()[0]
+    # one trough per cycle in slots 7-9, fewer when plates take those slots
     troughs = []
     for j in range(7,10):
-        trough = protocol.load_labware('nest_12_reservoir_15ml', j)
-        troughs.append(trough)
+        if j > len(plates):
+            trough = protocol.load_labware('nest_12_reservoir_15ml', j)
+            troughs.append(trough)
+
+    # water for plate i is in well i of each trough; the run pauses for a refill when they are used up
+    global wash
+    water = [trough.wells()[i] for trough in troughs for i in range(len(plates))]
+    wash = PlateWash(protocol, p300m, plates, water, waste, rows=(0,1), volume=30, soak=protocol.params.soak_time)
 
 def take_out_rxn(protocol):
-    p300m.pick_up_tip()
-    for plate in plates:
-        for row in [0,1]:
-            p300m.consolidate(20, plate.rows()[row][0:24], waste, new_tip='never')
-    p300m.return_tip()
+    wash.empty(20)
 
 def water_wash(protocol):
-    for trough in troughs:
-        p300m.pick_up_tip()
-        for plate in plates:
-            for row in [0,1]:
-                p300m.distribute(30, trough.wells()[plates.index(plate)], plate.rows()[row][0:24], new_tip='never')
-        for plate in plates:
-            for row in [0,1]:
-                for well in range(24):
-                    p300m.mix(3, 30, plate.rows()[row][well])
-                p300m.consolidate(30, plate.rows()[row][0:24], waste, new_tip='never')            
-        p300m.return_tip()
+    wash.run(protocol.params.wash_cycles)
@@ -7,6 +7,9 @@ import math
 import random
 import subprocess
 
+sys.path.append('/data/user_storage')
+from lib.manual import ManualSteps
+
 
 metadata = {
     'protocolName': 'ICP-MS - desalt',
@@ -27,7 +30,6 @@ def run(protocol):
     protocol.set_rail_lights(True)
     setup(protocol)
     prep_desalt(protocol)
-    add_acid(protocol)
     desalt(protocol)
     protocol.set_rail_lights(False)
 
@@ -47,6 +49,9 @@ def setup(protocol):
     buff = res1.wells()[0]
     acid = res2.wells()[0]
 
+    global manual
+    manual = ManualSteps(protocol, metadata['protocolName'])
+
 def pickup_tips(number, pipette, protocol):
     nozzle_dict = {2: "G1", 3: "F1", 4: "E1", 5: "D1", 6: "C1", 7: "B1"}
     if number == 1:
@@ -58,18 +63,19 @@ def pickup_tips(number, pipette, protocol):
     p300m.pick_up_tip()
 
 def prep_desalt(protocol):
-    protocol.pause("Start prepping desalt plate by removing bottom foil, \
-        placing on wash plate, removing top seal. Centrifuge 2 min at 1000rcf.")
-    protocol.pause("Place desalt plate back in slot 1.")
+    # the acid goes in while the desalt plate is prepped off deck
+    manual.request("Prep desalt plate: remove bottom foil, place on wash plate, remove top seal. \
+        Centrifuge 2 min at 1000rcf and place desalt plate back in slot 1.", minutes=6)
+    add_acid(protocol)
+    manual.wait()
 
     pickup_tips(8, p300m, protocol)
     destinations = [well.top() for well in desalt_plate.rows()[0]]
     for wash in range(4):
         p300m.transfer(250, buff, destinations, new_tip='never')
         p300m.move_to(buff.top())
-        protocol.pause("Centrifuge desalt plate 2 min at 1000rcf, set on wash plate again, and return to slot 1.")
+        manual.pause("Centrifuge desalt plate 2 min at 1000rcf, set on wash plate again, and return to slot 1.", minutes=4)
     p300m.return_tip()
-    protocol.pause("Ready to resume protocol.")
 
 def add_acid(protocol):
     pickup_tips(8, p300m, protocol)
@@ -79,4 +85,5 @@ def add_acid(protocol):
 def desalt(protocol):
     destinations = [well.top() for well in desalt_plate.rows()[0]]
     p300m.transfer(100, rxn_plate.rows()[0][0:12], destinations, new_tip='always', trash=False, touch_tip=True)
-    protocol.pause("Put desalt plate on acid 96 well, centrifuge desalt plate 2 min at 1000rcf.")
+    manual.pause("Put desalt plate on acid 96 well, centrifuge desalt plate 2 min at 1000rcf.", minutes=4)
+    protocol.comment(manual.report())
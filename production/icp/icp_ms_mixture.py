@@ -7,6 +7,10 @@ import math
 import random
 import subprocess
 
+sys.path.append('/data/user_storage')
+from lib.timers import Deadline
+from lib.manual import ManualSteps
+
 
 metadata = {
     'protocolName': 'ICP-MS mixture',
@@ -38,7 +42,6 @@ def run(protocol):
     add_protein(protocol)
     incubate(protocol) 
     prep_desalt(protocol)
-    add_acid(protocol)
     desalt(protocol)
     protocol.set_rail_lights(False)
 
@@ -60,6 +63,9 @@ def setup(protocol):
     global buff, acid, metal_mix, rxn_vol
     buff = res1.wells()[0]
     acid = res2.wells()[0]
+
+    global manual
+    manual = ManualSteps(protocol, metadata['protocolName'])
     metal_mix = trough.wells()[0]
     rxn_vol = 150 # needs to be 100 for desalting plus extra to pick up effectively
 
@@ -93,22 +99,24 @@ def add_protein(protocol):
                        new_tip='always', trash=False, mix_before=(3,50), mix_after=(3,100))
 
 def incubate(protocol):
-    global start_time
-    start_time = time.time()
+    # prep_desalt and add_acid run while this counts down
+    global incubation
+    incubation = Deadline(protocol, minutes=15, label="incubation")
 
 def prep_desalt(protocol):
-    protocol.pause("Start prepping desalt plate by removing bottom foil, \
-        placing on wash plate, removing top seal. Centrifuge 2 min at 1000rcf.")
-    protocol.pause("Place desalt plate back in slot 1.")
+    # the acid goes in while the desalt plate is prepped off deck
+    manual.request("Prep desalt plate: remove bottom foil, place on wash plate, remove top seal. \
+        Centrifuge 2 min at 1000rcf and place desalt plate back in slot 1.", minutes=6)
+    add_acid(protocol)
+    manual.wait()
 
     pickup_tips(8, p300m, protocol)
     destinations = [well.top() for well in desalt_plate.rows()[0]]
     for wash in range(4):
         p300m.transfer(250, buff, destinations, new_tip='never')
         p300m.move_to(buff.top())
-        protocol.pause("Centrifuge desalt plate 2 min at 1000rcf, set on wash plate again, and return to slot 1.")
+        manual.pause("Centrifuge desalt plate 2 min at 1000rcf, set on wash plate again, and return to slot 1.", minutes=4)
     p300m.return_tip()
-    protocol.pause("Ready to resume protocol.")
 
 def add_acid(protocol):
     pickup_tips(8, p300m, protocol)
@@ -116,9 +124,9 @@ def add_acid(protocol):
     p300m.return_tip()
 
 def desalt(protocol):
-    if not protocol.is_simulating():
-        while time.time() - start_time < 900:
-            protocol.delay(1)
+    incubation.wait()
+    protocol.comment(incubation.summary())
     destinations = [well.top() for well in desalt_plate.rows()[0]]
     p300m.transfer(100, rxn_plate.rows()[0][0:12], destinations, new_tip='always', trash=False, touch_tip=True)
-    protocol.pause("Put desalt plate on acid 96 well, centrifuge desalt plate 2 min at 1000rcf.")
+    manual.pause("Put desalt plate on acid 96 well, centrifuge desalt plate 2 min at 1000rcf.", minutes=4)
+    protocol.comment(manual.report())
@@ -7,6 +7,12 @@ import math
 import random
 import subprocess
 
+sys.path.append('/data/user_storage')
+from lib.timers import Deadline
+from lib.titration import plan_titration
+from lib.manual import ManualSteps
+from lib.stamping import RowFill, plan_rows
+
 
 metadata = {
     'protocolName': 'ICP-MS - 6 x 12 point 1:1 protein dilution, 96 well plate',
@@ -20,6 +26,7 @@ metadata = {
     Protein should be at 200µM in proper pH buffer (1500µL).
     3.89% ppt nitric acid (125mL).
     Buff (200mL).
+    Empty 96 well deep plate in slot 6 for staging the metals.
     Rxn vol is 150µL.
     Steps:
     -   Add metal
@@ -40,13 +47,12 @@ def run(protocol):
     titrate_protein(protocol)
     incubate(protocol) 
     prep_desalt(protocol)
-    add_acid(protocol)
     desalt(protocol)
     protocol.set_rail_lights(False)
 
 def setup(protocol):
     # equiptment
-    global p20, p300m, tips20, tips300, tips300_1, desalt_plate, res1, rxn_plate, icp_plate, metals, res2
+    global p20, p300m, tips20, tips300, tips300_1, desalt_plate, res1, rxn_plate, icp_plate, metals, res2, staging
     tips20 = protocol.load_labware('opentrons_96_tiprack_20ul', 7)
     tips300 = protocol.load_labware('opentrons_96_tiprack_300ul', 3)
     tips300_1 = protocol.load_labware('opentrons_96_tiprack_300ul', 9)
@@ -58,16 +64,21 @@ def setup(protocol):
     icp_plate = protocol.load_labware('nest_96_wellplate_2ml_deep', 11)
     metals = protocol.load_labware('opentrons_24_tuberack_nest_1.5ml_screwcap', 4)
     res2 = protocol.load_labware('nest_1_reservoir_195ml', 8)
+    staging = protocol.load_labware('nest_96_wellplate_2ml_deep', 6)
 
     global protein, buff, acid
     protein = metals.wells()[8]
     buff = res1.wells()[0]
     acid = res2.wells()[0]
 
-    global rxn_vol, dilution_factor, start_vol
+    global manual
+    manual = ManualSteps(protocol, metadata['protocolName'])
+
+    # rows: protein 2x (200µM) -> 100µM in 1:1 steps, metal 5x in every well
+    global rxn_vol, series
     rxn_vol = 150
-    dilution_factor = 1 # i.e. 1:2, not 1 in 2
-    start_vol = rxn_vol + (rxn_vol/dilution_factor)
+    series = plan_titration(stock=200, top=100, points=12, rxn_vol=rxn_vol, dilution_factor=1, components={"metal": 5})
+    series.validate(p300m, rxn_plate.wells()[0])
     
 
 def pickup_tips(number, pipette, protocol):
@@ -81,14 +92,13 @@ def pickup_tips(number, pipette, protocol):
     p300m.pick_up_tip()
 
 def add_metal(protocol):
-    # add 5µM metal to top 6 rows
-    for metal in range(6): 
-        pickup_tips(1, p300m, protocol)
-        p300m.transfer(start_vol*(1/5), metals.wells()[metal], rxn_plate.rows()[metal][0], new_tip='never', 
-                        mix_before=(3,100))
-        p300m.transfer(rxn_vol*(1/5), metals.wells()[metal], rxn_plate.rows()[metal][1:12], new_tip='never')
-        p300m.transfer(rxn_vol*(1/5), metals.wells()[metal], rxn_plate.rows()[6][metal*2:(metal*2)+2], new_tip='never')
-        p300m.drop_tip()
+    # add 5µM metal to top 6 rows, staged into one column and stamped if that's quicker
+    fills = [RowFill(metals.wells()[metal], rxn_plate.rows()[metal][0:12], series.components["metal"][0],
+                     mix=(3, 100), extras=[(well, rxn_vol*(1/5)) for well in rxn_plate.rows()[6][metal*2:(metal*2)+2]])
+             for metal in range(6)]
+    plan = plan_rows(fills, staging.columns()[0], p300m)
+    plan.run(p300m, pickup=lambda number: pickup_tips(number, p300m, protocol), drop=p300m.drop_tip)
+    protocol.comment(plan.report())
     
     # add mix to control wells
     pickup_tips(1, p300m, protocol)
@@ -105,9 +115,9 @@ def add_metal(protocol):
 def add_buff(protocol):
     # add buff to top 6 rows
     pickup_tips(6, p300m, protocol)
-    p300m.transfer(start_vol*(3/10), buff, rxn_plate.rows()[5][0].bottom(10), new_tip='never') # protien stock is 2x, not 5x
+    p300m.transfer(series.diluent[0][0], buff, rxn_plate.rows()[5][0].bottom(10), new_tip='never')
     for col in range(1,12):
-        p300m.transfer(rxn_vol*(4/5), buff, rxn_plate.rows()[5][col].bottom(10), new_tip='never')
+        p300m.transfer(series.diluent[0][col], buff, rxn_plate.rows()[5][col].bottom(10), new_tip='never')
     p300m.drop_tip()
    
     # add buff to controls
@@ -130,14 +140,14 @@ def titrate_protein(protocol):
     # put protein in top 6 rows
     for metal in range(6): 
         pickup_tips(1, p300m, protocol)
-        p300m.transfer(start_vol*(1/2), protein, rxn_plate.rows()[metal][0], new_tip='never', mix_after=(3,100)) # protein stock is 2x, not 5x
+        p300m.transfer(series.titrant[0][0], protein, rxn_plate.rows()[metal][0], new_tip='never', mix_after=(3,100))
         p300m.drop_tip()
 
     # titrate protein
     pickup_tips(6, p300m, protocol)
-    p300m.transfer(rxn_vol/dilution_factor, rxn_plate.rows()[5][0:11], rxn_plate.rows()[5][1:12], 
-                mix_before=(5,rxn_vol/dilution_factor), new_tip='never')    
-    p300m.mix(5,rxn_vol/dilution_factor, rxn_plate.rows()[5][11])
+    p300m.transfer(series.carry, rxn_plate.rows()[5][0:11], rxn_plate.rows()[5][1:12], 
+                mix_before=(5,series.carry), new_tip='never')    
+    p300m.mix(5,series.carry, rxn_plate.rows()[5][11])
     p300m.drop_tip()
 
     # add protein to bottom row
@@ -145,22 +155,24 @@ def titrate_protein(protocol):
     p20.transfer(rxn_vol/40, protein, rxn_plate.rows()[7][10:12], new_tip='always', mix_after=(3,20))
 
 def incubate(protocol):
-    global start_time
-    start_time = time.time()
+    # prep_desalt and add_acid run while this counts down
+    global incubation
+    incubation = Deadline(protocol, minutes=15, label="incubation")
 
 def prep_desalt(protocol):
-    protocol.pause("Start prepping desalt plate by removing bottom foil, \
-        placing on wash plate, removing top seal. Centrifuge 2 min at 1000rcf.")
-    protocol.pause("Place desalt plate back in slot 1.")
+    # the acid goes in while the desalt plate is prepped off deck
+    manual.request("Prep desalt plate: remove bottom foil, place on wash plate, remove top seal. \
+        Centrifuge 2 min at 1000rcf and place desalt plate back in slot 1.", minutes=6)
+    add_acid(protocol)
+    manual.wait()
 
     pickup_tips(8, p300m, protocol)
     destinations = [well.top() for well in desalt_plate.rows()[0]]
     for wash in range(4):
         p300m.transfer(250, buff, destinations, new_tip='never')
         p300m.move_to(buff.top())
-        protocol.pause("Centrifuge desalt plate 2 min at 1000rcf, set on wash plate again, and return to slot 1.")
+        manual.pause("Centrifuge desalt plate 2 min at 1000rcf, set on wash plate again, and return to slot 1.", minutes=4)
     p300m.return_tip()
-    protocol.pause("Ready to resume protocol.")
 
 def add_acid(protocol):
     pickup_tips(8, p300m, protocol)
@@ -168,9 +180,9 @@ def add_acid(protocol):
     p300m.return_tip()
 
 def desalt(protocol):
-    if not protocol.is_simulating():
-        while time.time() - start_time < 900:
-            protocol.delay(1)
+    incubation.wait()
+    protocol.comment(incubation.summary())
     destinations = [well.top() for well in desalt_plate.rows()[0]]
     p300m.transfer(100, rxn_plate.rows()[0][0:12], destinations, new_tip='always', trash=False, touch_tip=True)
-    protocol.pause("Put desalt plate on acid 96 well, centrifuge desalt plate 2 min at 1000rcf.")
+    manual.pause("Put desalt plate on acid 96 well, centrifuge desalt plate 2 min at 1000rcf.", minutes=4)
+    protocol.comment(manual.report())
@@ -7,6 +7,10 @@ import math
 import random
 import subprocess
 
+sys.path.append('/data/user_storage')
+from lib.tips import TipAllocator
+from lib.spotting import compile_spots, load_definition, plate_definition, run_spots, spot_map
+
 
 metadata = {
     'protocolName': 'Dot blot prep',
@@ -17,8 +21,8 @@ metadata = {
 def run(protocol):
     protocol.set_rail_lights(True)
     setup(protocol)
-    make_slide(protocol)
     add_standard(protocol)
+    make_slide(protocol)
     protocol.set_rail_lights(False)
 
 def setup(protocol):
@@ -42,47 +46,29 @@ def setup(protocol):
     waste3 = trough.wells()[5]
 
     # tips
-    global tip_20
-    tip_20 = 0
-
-def pickup_tips(number, pipette, protocol):
-    global last_tip20, last_tip300, tip_20, tip_300
-    nozzle_dict = {2: "G1", 3: "F1", 4: "E1", 5: "D1", 6: "C1", 7: "B1"}
-   
-    if pipette == p20m: 
-        last_tip20 = tip_20
-        if number == 1:
-            p20m.configure_nozzle_layout(style=SINGLE,start="H1")
-        elif number > 1 and number < 8:
-            p20m.configure_nozzle_layout(style=PARTIAL_COLUMN, start="H1", end=nozzle_dict[number])
-        else:
-            p20m.configure_nozzle_layout(style=ALL)
-        p20m.pick_up_tip(tips20)
-        if number == 8: # remove if ever figure out single return
-            tip_20 += number
-
-def return_tips(pipette):
-    if pipette == p20m:
-        # p20m.configure_nozzle_layout(style=ALL)
-        p20m.drop_tip(dirty_tips20.wells()[last_tip20])
+    global tips
+    tips = TipAllocator(protocol)
+    tips.add_pipette(p20m, [tips20], dirty_racks=[dirty_tips20])
 
 def make_slide(protocol):
-    pickup_tips(8, p20m, protocol)
-    for col in range(12):
-        p20m.transfer(2, deepwell.columns()[col][0], blot.columns()[col][0], new_tip='never')
-        clean_tips(p20m, protocol)
-    return_tips(p20m)
+    # lysates into the same well of the blot, standards down column 13
+    spots = spot_map({"deepwell": {well.well_name: well.well_name for well in deepwell.wells()},
+                      "standards": {well.well_name: well.well_name[0] + "13" for well in standards.columns()[0]}},
+                     volume=2)
+    groups = compile_spots(spots, {"deepwell": (plate_definition(96), deepwell.parent),
+                                   "standards": (plate_definition(96), standards.parent)},
+                           (load_definition('shawn_104_well_blot_holder_2ul'), blot.parent))
+    run_spots(p20m, groups, {"deepwell": deepwell, "standards": standards}, blot, tips,
+              wash=lambda: clean_tips(p20m, protocol))
 
 def add_standard(protocol):
-    pickup_tips(7, p20m, protocol)
+    tips.pickup_tips(7, p20m)
     p20m.transfer(20, water3, standards.columns()[0][7], new_tip='never')
     p20m.drop_tip()
 
-    pickup_tips(1, p20m, protocol)
+    tips.pickup_tips(1, p20m)
     for well in range(7):
-        p20m.transfer(2, standards.wells()[well], blot.wells()[well+96], new_tip='never')
         p20m.transfer(20, standards.wells()[well], standards.wells()[well+1], mix_after=(3,20), new_tip='never')
-    p20m.transfer(2, standards.wells()[7], blot.wells()[7+96], new_tip='never')    
     p20m.drop_tip()
 
 def clean_tips(pipette, protocol):
@@ -7,6 +7,9 @@ import math
 import random
 import subprocess
 
+sys.path.append('/data/user_storage')
+from lib.tips import TipAllocator
+
 
 metadata = {
     'protocolName': 'Pull 96 sups',
@@ -40,33 +43,13 @@ def setup(protocol):
     new_plate96 = protocol.load_labware('nest_96_wellplate_2ml_deep', 5)  
 
     # tips
-    global tip_300
-    tip_300 = 0
-
-def pickup_tips(number, pipette, protocol):
-    global last_tip300, tip_300
-    nozzle_dict = {2: "G1", 3: "F1", 4: "E1", 5: "D1", 6: "C1", 7: "B1"}
-
-    if pipette == p300m:
-        last_tip300 = tip_300
-        if number == 1:
-            p300m.configure_nozzle_layout(style=SINGLE,start="H1")
-        elif number > 1 and number < 8:
-            p300m.configure_nozzle_layout(style=PARTIAL_COLUMN,start="H1", end=nozzle_dict[number])
-        else:
-            p300m.configure_nozzle_layout(style=ALL)
-        p300m.pick_up_tip(tips300)
-        if number == 8: # remove if ever figure out single return
-            tip_300 += number
-
-def return_tips(pipette):
-    if pipette == p300m:
-        # p300m.configure_nozzle_layout(style=ALL)
-        p300m.drop_tip(dirty_tips300.wells()[last_tip300])
+    global tips
+    tips = TipAllocator(protocol)
+    tips.add_pipette(p300m, [tips300], dirty_racks=[dirty_tips300])
 
 def pull_sup(protocol):
     volume = protocol.params.volume
     for col in range(12):
-        pickup_tips(8, p300m, protocol)
+        tips.pickup_tips(8, p300m)
         p300m.transfer(volume, old_plate96.wells()[col*8].bottom(5).move(Point(0,-2,0)), new_plate96.columns()[col], new_tip='never')
-        return_tips(p300m)
+        tips.return_tips(p300m)
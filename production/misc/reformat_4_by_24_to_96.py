@@ -7,6 +7,9 @@ import math
 import random
 import subprocess
 
+sys.path.append('/data/user_storage')
+from lib.tips import TipAllocator
+from lib.reformat import map_wells, plan_reformat, report, run_reformat
 
 metadata = {
     'protocolName': 'Reformat 4 x 24 wells into 96 well.',
@@ -42,8 +45,16 @@ def setup(protocol):
     well24_4 = protocol.load_labware('thomsoninstrument_24_wellplate_10400ul', 1)
     wells24 = [well24_1, well24_2, well24_3, well24_4]
 
+    # tips
+    global tips
+    tips = TipAllocator(protocol)
+    tips.add_pipette(p1000, [tips1000])
+
 def reformat(protocol):
+    # well i of 24 well plate j goes to well i*4 + j of the 96 well plate
     volume = protocol.params.volume
-    for i in range(24):
-        for j in range(4):
-            p1000.transfer(volume, wells24[j].wells()[i], plate96.wells()[i*4 + j], new_tip='once')
+    pairs = map_wells(wells24, plate96, lambda plate, well: well*4 + plate)
+    groups = plan_reformat(pairs, channels=p1000.channels)
+    protocol.comment(report(groups, volume, p1000.max_volume))
+    run_reformat(p1000, groups, volume, tips)
+
@@ -6,7 +6,11 @@ import sys
 import math
 import random
 import subprocess
+import numpy as np
 
+sys.path.append('/data/user_storage')
+from lib.dispense import run_plan, washes
+from lib.spotting import interleaved_wells, plan_spots
 
 metadata = {
     'protocolName': 'X-ray slide prep',
@@ -17,6 +21,15 @@ metadata = {
     ''',
     'apiLevel': '2.20'}
 
+def add_parameters(parameters: protocol_api.Parameters):
+    parameters.add_int(
+        variable_name="replicates",
+        display_name="Spots per sample",
+        description="1: one spot per sample from both plates. 2: every sample of plate 1 (slot 2) twice, from one aspirate.",
+        default=1,
+        minimum=1,
+        maximum=2)
+
 def run(protocol):
     protocol.set_rail_lights(True)
     setup(protocol)
@@ -63,15 +76,23 @@ def pickup_tips(number, pipette, protocol):
         p300m.pick_up_tip(tips300)
 
 def make_slide(protocol):
+    # 4 tips take half a column (primary well D or H) and spot every third
+    # slide row; each plate fills half of the 192 spots
+    wells = np.arange(3, 96, 4)
+    spots = interleaved_wells(wells, tips=4)
+    pairs = []
+    if protocol.params.replicates == 1:
+        for plate, half in [(pcr1, 0), (pcr2, 96)]:
+            pairs += [(plate.wells()[well], slide.wells()[half+spot]) for well, spot in zip(wells, spots)]
+    else:
+        for well, spot in zip(wells, spots):
+            pairs += [(pcr1.wells()[well], slide.wells()[spot]), (pcr1.wells()[well], slide.wells()[96+spot])]
+    steps = plan_spots(pairs, volume=1, max_volume=20)
+    aspirates = sum(step.action == "aspirate" for step in steps)
+    protocol.comment(f"{len(pairs)} spots from {aspirates} aspirates, {washes(steps)} washes")
+
     pickup_tips(4, p20m, protocol)
-    for well in range(3, 96, 4):
-        p20m.aspirate(1, pcr1.wells()[well])
-        p20m.dispense(1, slide.wells()[well+(6-3*((well-3)%3))])
-        clean_tips(p20m, protocol)
-    for well in range(3, 96, 4):
-        p20m.aspirate(1, pcr2.wells()[well])
-        p20m.dispense(1, slide.wells()[96+well+(6-3*((well-3)%3))])
-        clean_tips(p20m, protocol)
+    run_plan(p20m, steps, wash=lambda: clean_tips(p20m, protocol))
     p20m.drop_tip()
 
 def clean_tips(pipette, protocol):
@@ -7,6 +7,9 @@ import math
 import random
 import subprocess
 
+sys.path.append('/data/user_storage')
+from lib.tiplayout import TipLayout24
+
 
 metadata = {
     'protocolName': 'Clean beads - 24well',
@@ -15,19 +18,28 @@ metadata = {
 
 requirements = {'robotType': 'Flex','apiLevel': '2.28'}
 
+def add_parameters(parameters: protocol_api.Parameters):
+    parameters.add_bool(
+        variable_name="preracked",
+        display_name="24-tip racks prepared",
+        description="Racks in A1 and A3 already hold tips at A1, A3 ... G11.",
+        default=False)
+
 def run(protocol):
     protocol.set_rail_lights(True)
     setup(protocol)
     define_liquids(protocol)
+    tip_layout.stage()
     add_naoh(protocol)
     wash_beads(protocol)
     protocol.set_rail_lights(False)
 
 def setup(protocol):
     # equipment
-    global trash, pipette, tips1000, empty_tiprack, tips1000_24well, tips24_adapter, wash_buff, naoh, mag_24well, bead_plate, liquid_waste, temp_mod
+    global trash, pipette, tips1000, empty_tiprack, tips1000_24well, tips1000_24well_2, tips24_adapter, wash_buff, naoh, mag_24well, bead_plate, liquid_waste, temp_mod
     tips1000_24well = protocol.load_labware('opentrons_flex_96_tiprack_1000ul', 'A1')
     tips24_adapter = protocol.load_adapter('opentrons_flex_96_tiprack_adapter', 'A2')
+    tips1000_24well_2 = protocol.load_labware('opentrons_flex_96_tiprack_1000ul', 'A3')
 
     empty_tiprack = protocol.load_labware('opentrons_flex_96_tiprack_1000ul', 'B1')
     naoh = protocol.load_labware('nest_1_reservoir_195ml', 'B2')
@@ -43,8 +55,10 @@ def setup(protocol):
     
     pipette = protocol.load_instrument('flex_96channel_1000')
 
-    global half_filled
-    half_filled = False
+    # 24-tip racks for the NaOH and the washes
+    global tip_layout
+    tip_layout = TipLayout24(protocol, pipette, tips24_adapter, [tips1000_24well, tips1000_24well_2],
+                             source=tips1000, staging=empty_tiprack, uses=2, preracked=protocol.params.preracked)
 
 def define_liquids(protocol):
     wash_liquid = protocol.define_liquid(
@@ -60,47 +74,20 @@ def define_liquids(protocol):
     for well in naoh.wells():
         well.load_liquid(liquid=naoh_liquid, volume=290000)
 
-def pickup_24(protocol):
-    global half_filled
-    try:
-        protocol.move_labware(tips1000_24well, "A1", use_gripper=True)
-    except:
-        None
-
-    if half_filled is False:
-        pipette.configure_nozzle_layout(style=protocol_api.ROW,start="H1",tip_racks=[tips1000])
-        for row in range(4):
-            pipette.pick_up_tip()
-            pipette.drop_tip(empty_tiprack.rows()[row*2][0])
-        half_filled = True
-        half = 0
-    else:    
-        half_filled = False
-        half = 6
-
-    pipette.configure_nozzle_layout(style=protocol_api.COLUMN,start="A12")
-    for col in range(6):
-        pipette.pick_up_tip(empty_tiprack.rows()[0][col+half])
-        pipette.drop_tip(tips1000_24well.rows()[0][col*2])
-
-    protocol.move_labware(tips1000_24well, tips24_adapter, use_gripper=True)
-    pipette.configure_nozzle_layout(style=protocol_api.ALL)
-    pipette.pick_up_tip(tips1000_24well.rows()[0][0])
-
 def add_naoh(protocol):
-    pickup_24(protocol)
+    tip_layout.pick_up(0)
     pipette.transfer(2000, naoh.wells()[0].top(), bead_plate.wells()[0].bottom(1).move(Point(x=2.25)), new_tip='never')
     pipette.mix(5,500, naoh.wells()[0])
-    pipette.drop_tip(tips1000_24well.rows()[0][0])
+    pipette.drop_tip(tip_layout.rack(0).rows()[0][0])
     protocol.move_labware(labware=bead_plate,new_location=mag_24well,use_gripper=True)
     protocol.delay(minutes=2)    
-    pipette.pick_up_tip(tips1000_24well.rows()[0][0])
+    pipette.pick_up_tip(tip_layout.rack(0).rows()[0][0])
     pipette.aspirate(2000, bead_plate.wells()[0].meniscus(z=-1).move(Point(x=2.25)), meniscus_tracking='dynamic_meniscus')
     pipette.dispense(2000, liquid_waste.wells()[0].top())
     pipette.drop_tip()
 
 def wash_beads(protocol):
-    pickup_24(protocol)
+    tip_layout.pick_up(1)
     for rep in range(2):
         pipette.transfer(2000, wash_buff.wells()[0], bead_plate.wells()[0].bottom(1).move(Point(x=2.25)), new_tip='never', mix_after=(5, 500))
         protocol.delay(minutes=0.5)
@@ -7,6 +7,9 @@ import math
 import random
 import subprocess
 
+sys.path.append('/data/user_storage')
+from lib.tiplayout import TipLayout24
+
 
 metadata = {
     'protocolName': 'Innoculation - 24well',
@@ -86,17 +89,10 @@ def define_liquids(protocol):
     media.wells()[0].load_liquid(liquid=auto_tb, volume=600000)
 
 def rack_24well(protocol):
-    pipette.configure_nozzle_layout(style=protocol_api.ROW,start="H1",tip_racks=[tips1000])
-    for row in range(4):
-        pipette.pick_up_tip()
-        pipette.drop_tip(empty_tiprack.rows()[row*2][0])
-
-    pipette.configure_nozzle_layout(style=protocol_api.COLUMN,start="A12")
-    for col in range(6):
-        pipette.pick_up_tip(empty_tiprack.rows()[0][col])
-        pipette.drop_tip(tips1000_24well.rows()[0][col*2])
-
-    protocol.move_labware(tips1000_24well, tips24_adapter, use_gripper=True)
+    # always staged: add_cells uses the tips left in empty_tiprack
+    tip_layout = TipLayout24(protocol, pipette, tips24_adapter, [tips1000_24well],
+                             source=tips1000, staging=empty_tiprack, uses=1)
+    tip_layout.load(0)
     protocol.move_labware(labware=tips1000,new_location='A1',use_gripper=True)
 
 def add_cells(plate, twist_start_well, twist_end_well, protocol):
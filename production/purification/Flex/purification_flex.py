@@ -7,6 +7,11 @@ import math
 import random
 import subprocess
 
+sys.path.append('/data/user_storage')
+from lib.ledger import VolumeLedger
+from lib.stepgraph import StepGraph
+from lib.tiplayout import TipLayout24
+
 
 metadata = {
     'protocolName': 'Magnetic purification - 24well',
@@ -24,23 +29,34 @@ def add_parameters(parameters: protocol_api.Parameters):
         minimum=1,
         maximum=24,
         unit="samples")
+    parameters.add_bool(
+        variable_name="preracked",
+        display_name="24-tip racks prepared",
+        description="Racks in A1 and A3 already hold tips at A1, A3 ... G11.",
+        default=False)
 
 def run(protocol):
     protocol.set_rail_lights(True)
     setup(protocol)
     temp_mod.start_set_temperature(4)
     define_liquids(protocol)
+    global steps
+    steps = StepGraph(protocol, "Purification")
     bind(protocol)
     wash(protocol)
     elute(protocol)
     collect(protocol)
+    steps.run()
+    protocol.comment(steps.report())
+    protocol.comment(ledger.report())
     protocol.set_rail_lights(False)
 
 def setup(protocol):
     # equipment
-    global trash, pipette, tips1000, empty_tiprack, tips1000_24well, tips24_adapter, wash_buff, elution_buff, lysis_plate, mag_24well, bead_plate, collection_plate, liquid_waste, temp_mod
+    global ledger, trash, pipette, tips1000, empty_tiprack, tips1000_24well, tips1000_24well_2, tips24_adapter, wash_buff, elution_buff, lysis_plate, mag_24well, bead_plate, collection_plate, liquid_waste, temp_mod
     tips1000_24well = protocol.load_labware('opentrons_flex_96_tiprack_1000ul', 'A1')
     tips24_adapter = protocol.load_adapter('opentrons_flex_96_tiprack_adapter', 'A2')
+    tips1000_24well_2 = protocol.load_labware('opentrons_flex_96_tiprack_1000ul', 'A3')
     bead_plate = protocol.load_labware('thomsoninstrument_24_wellplate_10400ul', 'A4')
 
     empty_tiprack = protocol.load_labware('opentrons_flex_96_tiprack_1000ul', 'B1')
@@ -57,10 +73,23 @@ def setup(protocol):
     lysis_plate = protocol.load_labware('thomsoninstrument_24_wellplate_10400ul', 'D2')
     tips1000 = protocol.load_labware('opentrons_flex_96_tiprack_1000ul', 'D3')
     
-    pipette = protocol.load_instrument('flex_96channel_1000')
-
-    global half_filled
-    half_filled = False
+    # volumes of every well, so sources can be loaded with what the run needs
+    # (Thomson 24 well: U-bottom about as deep as half the 17.7mm well is wide)
+    ledger = VolumeLedger(protocol)
+    for plate in [wash_buff, elution_buff]:
+        ledger.shape(plate, bottom=8.85, dead_volume=500)
+    for plate in [lysis_plate, bead_plate]:
+        ledger.shape(plate, bottom=8.85)
+    pipette = ledger.track(protocol.load_instrument('flex_96channel_1000'), spacing=2)
+
+    # 24-tip racks for bind, wash and elute
+    global tip_layout
+    tip_layout = TipLayout24(protocol, pipette, tips24_adapter, [tips1000_24well, tips1000_24well_2],
+                             source=tips1000, staging=empty_tiprack, uses=3, preracked=protocol.params.preracked)
+
+    # rough step durations (s), only used to order the step graph
+    global GRIP
+    GRIP = 20
 
 def define_liquids(protocol):
     wash_liquid = protocol.define_liquid(
@@ -68,104 +97,105 @@ def define_liquids(protocol):
         description="Wash buff",
         display_color="#405DBC")
     for well in wash_buff.wells():
-        well.load_liquid(liquid=wash_liquid,volume=10000)
+        ledger.load_liquid(well, wash_liquid, 10000)
 
     lysate_liquid = protocol.define_liquid(
         name="Lysate",
         description="Lysed cells",
         display_color="#FFB347")
     for well in lysis_plate.wells():
-        well.load_liquid(liquid=lysate_liquid, volume=2000)
+        ledger.load_liquid(well, lysate_liquid, 2000)
 
     elution_liquid = protocol.define_liquid(
         name="Elution buff",
         description="Buff for elution (biotin)",
         display_color="#38B55D")
     for well in elution_buff.wells():
-        well.load_liquid(liquid=elution_liquid, volume=200000)
+        ledger.load_liquid(well, elution_liquid, 1500)
 
     bead_liquid = protocol.define_liquid(
         name="Bead suspension",
         description="StrepXT mag bead suspension",
         display_color="#B57EDC")
     for well in bead_plate.wells():
-        well.load_liquid(liquid=bead_liquid, volume=1000)
-
-def pickup_24(protocol):
-    global half_filled
-    try:
-        protocol.move_labware(tips1000_24well, "A1", use_gripper=True)
-    except:
-        None
-
-    if half_filled is False:
-        pipette.configure_nozzle_layout(style=protocol_api.ROW,start="H1",tip_racks=[tips1000])
-        for row in range(4):
-            pipette.pick_up_tip()
-            pipette.drop_tip(empty_tiprack.rows()[row*2][0])
-        half_filled = True
-        half = 0
-    else:    
-        half_filled = False
-        half = 6
-    pipette.configure_nozzle_layout(style=protocol_api.COLUMN,start="A12")
-    for col in range(6):
-        pipette.pick_up_tip(empty_tiprack.rows()[0][col+half])
-        pipette.drop_tip(tips1000_24well.rows()[0][col*2])
-
-    protocol.move_labware(tips1000_24well, tips24_adapter, use_gripper=True)
-    pipette.configure_nozzle_layout(style=protocol_api.ALL)
-    pipette.pick_up_tip(tips1000_24well.rows()[0][0])
+        ledger.load_liquid(well, bead_liquid, 1000)
 
 def bind(protocol):
-    protocol.move_labware(labware=bead_plate,new_location=mag_24well,use_gripper=True)
-    pickup_24(protocol)
-    pipette.mix(3, 250, bead_plate.wells()[0].bottom(1).move(Point(x=2.25)))
-    protocol.delay(minutes=0.33)
+    steps.add("beads to magnet", lambda: protocol.move_labware(labware=bead_plate,new_location=mag_24well,use_gripper=True), GRIP)
+    steps.add("stage tips", lambda: tip_layout.stage(), 240)
+    steps.add("tips for bind", lambda: tip_layout.pick_up(0), GRIP, after=["stage tips"])
+    steps.add("equilibrate beads", lambda: pipette.mix(3, 250, bead_plate.wells()[0].bottom(1).move(Point(x=2.25))), 30,
+              after=["beads to magnet", "tips for bind"])
+    steps.add_wait("beads settle", 20, after=["equilibrate beads"])
+    steps.add("add lysate", lambda: add_lysate(protocol), 60, after=["beads settle"])
+    steps.add("lysate plate away", lambda: protocol.move_labware(labware=lysis_plate,new_location='A4',use_gripper=True), GRIP,
+              after=["add lysate"])
+    steps.add("beads to temp", lambda: protocol.move_labware(labware=bead_plate,new_location=temp_mod,use_gripper=True,drop_offset={'x':0.5,'y':0,'z':0}), GRIP,
+              after=["add lysate"])
+    steps.add("bind", lambda: mix_bind(protocol), 660, after=["beads to temp"])
+
+def add_lysate(protocol):
     pipette.transfer(1000, bead_plate.wells()[0].bottom().move(Point(x=2.25)), liquid_waste.wells()[0].top(), new_tip='never')
     pipette.transfer(2000, lysis_plate.wells()[0].bottom(1), bead_plate.wells()[0].bottom(1).move(Point(x=2.25)), new_tip='never')
-    pipette.drop_tip(tips1000_24well.rows()[0][0])
-    protocol.move_labware(labware=lysis_plate,new_location='A4',use_gripper=True)
-    protocol.move_labware(labware=bead_plate,new_location=temp_mod,use_gripper=True,drop_offset={'x':0.5,'y':0,'z':0})
-    pipette.pick_up_tip(tips1000_24well.rows()[0][0])
+    pipette.drop_tip(tip_layout.rack(0).rows()[0][0])
+
+def mix_bind(protocol):
+    pipette.pick_up_tip(tip_layout.rack(0).rows()[0][0])
     pipette.touch_tip(bead_plate.wells()[0])
     for bind in range(10):
         pipette.mix(3,500, bead_plate.wells()[0].bottom(1).move(Point(x=2.25)))
         protocol.delay(minutes=0.75)
-    pipette.drop_tip(tips1000_24well.rows()[0][0])
+    pipette.drop_tip(tip_layout.rack(0).rows()[0][0])
 
 def wash(protocol):
-    protocol.move_labware(labware=bead_plate,new_location=mag_24well,use_gripper=True)
-    protocol.delay(minutes=1)
-    pipette.pick_up_tip(tips1000_24well.rows()[0][0])
+    steps.add("beads to magnet for wash", lambda: protocol.move_labware(labware=bead_plate,new_location=mag_24well,use_gripper=True), GRIP,
+              after=["bind"])
+    steps.add_wait("bound beads settle", 60, after=["beads to magnet for wash"])
+    steps.add("remove lysate", lambda: remove_lysate(protocol), 60, after=["bound beads settle"])
+    steps.add("tips for wash", lambda: tip_layout.pick_up(1), 2*GRIP, after=["remove lysate"])
+    steps.add("wash", lambda: wash_beads(protocol), 300, after=["tips for wash"])
+
+def remove_lysate(protocol):
+    pipette.pick_up_tip(tip_layout.rack(0).rows()[0][0])
     pipette.transfer(2000, bead_plate.wells()[0].bottom().move(Point(x=2.25)), liquid_waste.wells()[0].top(), new_tip='never')
     pipette.drop_tip()
 
-    pickup_24(protocol)
+def wash_beads(protocol):
     for rep in range(3):
-        pipette.transfer(1000, wash_buff.wells()[0], bead_plate.wells()[0].bottom(1).move(Point(x=2.25)), new_tip='never', mix_after=(5, 500))
+        pipette.transfer(1000, ledger.meniscus(wash_buff.wells()[0], 1000), bead_plate.wells()[0].bottom(1).move(Point(x=2.25)), new_tip='never', mix_after=(5, 500))
         protocol.delay(minutes=0.5)
         pipette.transfer(1000, bead_plate.wells()[0].bottom().move(Point(x=2.25)), liquid_waste.wells()[0].top(), new_tip='never')
     pipette.drop_tip()
 
 def elute(protocol):
-    protocol.move_labware(labware=bead_plate,new_location='D2',use_gripper=True)
-    pickup_24(protocol)
-    pipette.transfer(200, elution_buff.wells()[0].bottom().move(Point(x=2.25)), bead_plate.wells()[0].bottom().move(Point(x=2.25)), new_tip='never')
+    steps.add("beads to D2", lambda: protocol.move_labware(labware=bead_plate,new_location='D2',use_gripper=True), GRIP,
+              after=["wash", "lysate plate away"])
+    steps.add("tips for elution", lambda: tip_layout.pick_up(2), 150, after=["wash", "tips for wash"])
+    steps.add("elute", lambda: mix_elution(protocol), 560, after=["beads to D2", "tips for elution"])
+
+def mix_elution(protocol):
+    pipette.transfer(200, ledger.meniscus(elution_buff.wells()[0], 200).move(Point(x=2.25)), bead_plate.wells()[0].bottom().move(Point(x=2.25)), new_tip='never')
     for elution in range(10):
         pipette.mix(3,100, bead_plate.wells()[0].bottom().move(Point(x=2.25)))
         protocol.delay(minutes=0.75)
     pipette.drop_tip()
 
 def collect(protocol):
-    protocol.move_labware(labware=bead_plate,new_location=mag_24well,use_gripper=True)
-    protocol.move_labware(labware=collection_plate,new_location=temp_mod,use_gripper=True,drop_offset={'x':0.5,'y':0,'z':0})
-    protocol.move_labware(labware=tips1000,new_location='D4',use_gripper=True)
-    protocol.delay(minutes=0.5)
+    steps.add("beads to magnet for collection", lambda: protocol.move_labware(labware=bead_plate,new_location=mag_24well,use_gripper=True), GRIP,
+              after=["elute"])
+    steps.add_wait("eluted beads settle", 30, after=["beads to magnet for collection"])
+    # the temp module is free as soon as the beads leave it for the wash
+    steps.add("collection plate to temp", lambda: protocol.move_labware(labware=collection_plate,new_location=temp_mod,use_gripper=True,drop_offset={'x':0.5,'y':0,'z':0}), GRIP,
+              after=["beads to magnet for wash"])
+    steps.add("tip rack away", lambda: protocol.move_labware(labware=tips1000,new_location='D4',use_gripper=True), GRIP,
+              after=["tips for elution"])
+    steps.add("collect", lambda: collect_eluate(protocol), 20*protocol.params.samples,
+              after=["eluted beads settle", "collection plate to temp", "tip rack away"])
+
+def collect_eluate(protocol):
     pipette.configure_nozzle_layout(style=protocol_api.SINGLE,start="A1")
     for well in range(protocol.params.samples):
         pipette.pick_up_tip(empty_tiprack.rows()[6 - 2 * (well // 6)][11 - (well % 6)])
         pipette.aspirate(200, bead_plate.wells()[well].bottom())
         pipette.dispense(200, collection_plate.wells()[well])
         pipette.drop_tip()
-
@@ -7,6 +7,9 @@ import math
 import random
 import subprocess
 
+sys.path.append('/data/user_storage')
+from lib.timers import Deadline
+
 
 metadata = {
     'protocolName': 'Magnetic purification',
@@ -14,21 +17,49 @@ metadata = {
     'description': '''Purify protein from 24 well plate using StrepXT mag beads.''',
     'apiLevel': '2.26'}
 
+def add_parameters(parameters: protocol_api.Parameters):
+    parameters.add_int(
+        variable_name="batch_size",
+        display_name="Samples per batch",
+        description="Samples taken through each step together (1 = one at a time).",
+        default=1,
+        minimum=1,
+        maximum=23,
+        unit="samples")
+    parameters.add_bool(
+        variable_name="interleave",
+        display_name="Interleave batches",
+        description="Recharge the beads of the previous batch while the next one incubates on the shaker.",
+        default=False)
 
 def run(protocol):
     protocol.set_rail_lights(True)
     setup(protocol)
     # lyse(protocol)
-    global sample_well
     # temp_mod.set_temperature(celsius=4)
-    for sample_well in range(1,24):
-        find_offset(protocol)
-        wash_beads(protocol)
-        add_sample(protocol)
-        wash(protocol)
-        elute(protocol)
-        recharge(protocol)
-        collect(protocol)
+    samples = list(range(1,24))
+    batch_size = protocol.params.batch_size
+    batches = [samples[i:i+batch_size] for i in range(0, len(samples), batch_size)]
+
+    previous = None
+    for batch in batches:
+        wash_beads(protocol, batch)
+        add_sample(protocol, batch)
+        if protocol.params.interleave and previous:
+            # nothing here uses slot 11, the one beside the shaker (slot 10)
+            recharge(protocol, previous)
+            collect(protocol, previous)
+        finish_incubation(protocol)
+        wash(protocol, batch)
+        elute(protocol, batch) # straight after the last wash, so the beads don't sit drained
+        if protocol.params.interleave:
+            previous = batch
+        else:
+            recharge(protocol, batch)
+            collect(protocol, batch)
+    if previous:
+        recharge(protocol, previous)
+        collect(protocol, previous)
     hs_mod.open_labware_latch()
     protocol.set_rail_lights(False)
 
@@ -53,7 +84,7 @@ def setup(protocol):
     conicals = protocol.load_labware('opentrons_6_tuberack_nest_50ml_conical', 2)
     reservoir1 = protocol.load_labware('nest_1_reservoir_195ml', 5)
     reservoir2 = protocol.load_labware('nest_1_reservoir_195ml', 8)
-    reservoir3 = protocol.load_labware('nest_1_reservoir_195ml', 11)
+    reservoir3 = protocol.load_labware('nest_1_reservoir_195ml', 9) # not beside the shaker, so waste can be used while it runs
 
     # reagents
     global beads, buff, elution, naoh, water, waste, lysis
@@ -74,19 +105,37 @@ def setup(protocol):
     z = 1.5 
     x_offset = 1.5 
     y_offset = 1.5
+    # tips reserved per sample, so a batch can share settle/incubation times
+    global tip_spots, held
+    tip_spots = {}
+    held = {p1000: None, p300: None}
 
-def find_offset(protocol):
-        global x, y, pickup_pos
-        if sample_well in [8,9,10,11,12,13,14,15]:
-            x = abs(x_offset) #if odd move to the right    
-        else:
-            x = -abs(x_offset) #if even move to the left 
-        
-        if sample_well % 2 == 0:
-            y = abs(y_offset)
-        else:
-            y = -abs(y_offset)
-        pickup_pos = deep_well.wells()[sample_well].bottom().move(Point(x,y,z))
+def use_tip(pipette, rack, key):
+    # put back whatever tip is held and pick up the one reserved for key
+    if held[pipette] == key:
+        return
+    if held[pipette] is not None:
+        pipette.return_tip()
+    if key not in tip_spots:
+        tip_spots[key] = rack.next_tip()
+    pipette.pick_up_tip(tip_spots[key])
+    held[pipette] = key
+
+def discard_tip(pipette):
+    pipette.drop_tip()
+    held[pipette] = None
+
+def pickup_pos(sample_well):
+    if sample_well in [8,9,10,11,12,13,14,15]:
+        x = abs(x_offset) #if odd move to the right    
+    else:
+        x = -abs(x_offset) #if even move to the left 
+    
+    if sample_well % 2 == 0:
+        y = abs(y_offset)
+    else:
+        y = -abs(y_offset)
+    return deep_well.wells()[sample_well].bottom().move(Point(x,y,z))
 
 def lyse(protocol):
     p1000.pick_up_tip()
@@ -97,91 +146,112 @@ def lyse(protocol):
     protocol.delay(minutes=120)
     hs_mod.deactivate_shaker()
 
-def wash_beads(protocol):
-    p1000.pick_up_tip()
-    p1000.transfer(1000, beads, deep_well.wells()[sample_well], new_tip="never", mix_before=(3,1000))
+def wash_beads(protocol, batch):
+    # beads only, so one tip (the first sample's) serves the whole batch
+    use_tip(p1000, tips1000, (batch[0], 'sample'))
+    for sample_well in batch:
+        p1000.transfer(1000, beads, deep_well.wells()[sample_well], new_tip="never", mix_before=(3,1000))
     mag_mod.engage(height_from_base=mag_height)
-    p1000.move_to(deep_well.wells()[sample_well].top(10))
+    p1000.move_to(deep_well.wells()[batch[-1]].top(10))
     protocol.delay(seconds=mag_time)
-    p1000.transfer(1000, pickup_pos, waste.top(), new_tip="never")
+    for sample_well in batch:
+        p1000.transfer(1000, pickup_pos(sample_well), waste.top(), new_tip="never")
     clean_tips(p1000, 1000, protocol)
     
     for i in range(0,3):
-        p1000.transfer(1000, buff, deep_well.wells()[sample_well].top(), new_tip="never")
-        p1000.move_to(deep_well.wells()[sample_well].top(10))
+        for sample_well in batch:
+            p1000.transfer(1000, buff, deep_well.wells()[sample_well].top(), new_tip="never")
+        p1000.move_to(deep_well.wells()[batch[-1]].top(10))
         protocol.delay(seconds=mag_time)
-        p1000.transfer(1000, pickup_pos, waste.top(), new_tip="never")
+        for sample_well in batch:
+            p1000.transfer(1000, pickup_pos(sample_well), waste.top(), new_tip="never")
         if i != 2:
             clean_tips(p1000, 1000, protocol)
     mag_mod.disengage()
 
-def add_sample(protocol):
-    p1000.transfer(1500, well24.wells()[sample_well].bottom(4), deep_well.wells()[sample_well], new_tip="never", mix_after=(3,500))
-    p1000.transfer(1500, deep_well.wells()[sample_well], well24.wells()[sample_well].bottom(4), new_tip="never")
+def add_sample(protocol, batch):
+    global incubation
+    for sample_well in batch:
+        use_tip(p1000, tips1000, (sample_well, 'sample'))
+        p1000.transfer(1500, well24.wells()[sample_well].bottom(4), deep_well.wells()[sample_well], new_tip="never", mix_after=(3,500))
+        p1000.transfer(1500, deep_well.wells()[sample_well], well24.wells()[sample_well].bottom(4), new_tip="never")
     hs_mod.set_and_wait_for_shake_speed(400)
-    protocol.delay(minutes=incubation_time)
+    incubation = Deadline(protocol, minutes=incubation_time, label="bead binding")
+
+def finish_incubation(protocol):
+    incubation.wait()
     hs_mod.deactivate_shaker()
 
-def wash(protocol):
-    # remove supernatant 
-    p1000.transfer(1500, well24.wells()[sample_well].bottom(4), deep_well.wells()[sample_well], new_tip="never", mix_before=(3,500))
-    p1000.move_to(deep_well.wells()[sample_well].top(10))
+def wash(protocol, batch):
+    # put the binding reactions on the magnet
+    for sample_well in batch:
+        use_tip(p1000, tips1000, (sample_well, 'sample'))
+        p1000.transfer(1500, well24.wells()[sample_well].bottom(4), deep_well.wells()[sample_well], new_tip="never", mix_before=(3,500))
+    p1000.move_to(deep_well.wells()[batch[-1]].top(10))
     mag_mod.engage(height_from_base=mag_height)
     protocol.delay(seconds=mag_time)
-    p1000.transfer(1500, pickup_pos, well24.wells()[sample_well].bottom(4), new_tip="never")
-    p1000.drop_tip()
 
-    # wash beads
-    p1000.pick_up_tip()
-    for i in range(0,3):
-        p1000.transfer(1500, buff, deep_well.wells()[sample_well].top(), new_tip="never")
-        p1000.transfer(1550, pickup_pos, waste.top(), new_tip="never")
-        if i != 2:
-            clean_tips(p1000, 1000, protocol)
-    p1000.drop_tip()
+    # remove supernatant and wash beads, a sample at a time so its wash tip stays on
+    for sample_well in batch:
+        use_tip(p1000, tips1000, (sample_well, 'sample'))
+        p1000.transfer(1500, pickup_pos(sample_well), well24.wells()[sample_well].bottom(4), new_tip="never")
+        discard_tip(p1000)
+        use_tip(p1000, tips1000, (sample_well, 'wash'))
+        for i in range(0,3):
+            p1000.transfer(1500, buff, deep_well.wells()[sample_well].top(), new_tip="never")
+            p1000.transfer(1550, pickup_pos(sample_well), waste.top(), new_tip="never")
+            if i != 2:
+                clean_tips(p1000, 1000, protocol)
+        discard_tip(p1000)
     mag_mod.disengage()
     
-def elute(protocol):
+def elute(protocol, batch):
     for i in [0,1]:
-        p300.pick_up_tip()
-        p300.transfer(100, elution, deep_well.wells()[sample_well], mix_after=(3,50), new_tip='never')
-        p300.move_to(deep_well.wells()[sample_well].top(10))
+        for sample_well in batch:
+            use_tip(p300, tips300, (sample_well, 'elute', i))
+            p300.transfer(100, elution, deep_well.wells()[sample_well], mix_after=(3,50), new_tip='never')
+        p300.move_to(deep_well.wells()[batch[-1]].top(10))
         protocol.delay(minutes=elute_time)
         mag_mod.engage(height_from_base=mag_height)
         protocol.delay(seconds=mag_time)
-        p300.transfer(110, pickup_pos, tubes.wells()[sample_well], new_tip='never')
-        p300.drop_tip()
+        for sample_well in batch:
+            use_tip(p300, tips300, (sample_well, 'elute', i))
+            p300.transfer(110, pickup_pos(sample_well), tubes.wells()[sample_well], new_tip='never')
+            discard_tip(p300)
         mag_mod.disengage()
 
-def recharge(protocol):
+def recharge(protocol, batch):
     # add NaOH to used beads
-    p1000.pick_up_tip()
-    p1000.transfer(1500, naoh, deep_well.wells()[sample_well], mix_after=(3,500), new_tip='never')
-    p1000.move_to(deep_well.wells()[sample_well].top(10))
+    for sample_well in batch:
+        use_tip(p1000, tips1000, (sample_well, 'recharge'))
+        p1000.transfer(1500, naoh, deep_well.wells()[sample_well], mix_after=(3,500), new_tip='never')
+    p1000.move_to(deep_well.wells()[batch[-1]].top(10))
     protocol.delay(minutes=naoh_time)
     mag_mod.engage(height_from_base=mag_height)
     protocol.delay(seconds=mag_time)
     
-    # remove NaOH from beads
-    p1000.transfer(1500, pickup_pos, waste.top(), new_tip='never')
-    clean_tips(p1000, 1000, protocol)
-
-    # equilibrate with buff
-    for i in range(0,3):
-        p1000.transfer(1500, buff, deep_well.wells()[sample_well].top(), new_tip='never')
-        p1000.move_to(deep_well.wells()[sample_well].top(10))
-        protocol.delay(mag_time)
-        p1000.transfer(1550, pickup_pos, waste.top(), new_tip='never')
+    # remove NaOH and equilibrate with buff, a sample at a time so its tip stays on
+    for sample_well in batch:
+        use_tip(p1000, tips1000, (sample_well, 'recharge'))
+        p1000.transfer(1500, pickup_pos(sample_well), waste.top(), new_tip='never')
         clean_tips(p1000, 1000, protocol)
+        for i in range(0,3):
+            p1000.transfer(1500, buff, deep_well.wells()[sample_well].top(), new_tip='never')
+            p1000.move_to(deep_well.wells()[sample_well].top(10))
+            protocol.delay(mag_time)
+            p1000.transfer(1550, pickup_pos(sample_well), waste.top(), new_tip='never')
+            clean_tips(p1000, 1000, protocol)
     mag_mod.disengage()
 
-def collect(protocol):
-    p300.pick_up_tip()
-    for i in [0,1]:
-        p300.transfer(500, buff, deep_well.wells()[sample_well].top(), new_tip='never')
-        p1000.transfer(510, deep_well.wells()[sample_well], beads, new_tip='never', mix_before=(3,500))
-    p300.drop_tip()
-    p1000.drop_tip()
+def collect(protocol, batch):
+    for sample_well in batch:
+        use_tip(p300, tips300, (sample_well, 'collect'))
+        use_tip(p1000, tips1000, (sample_well, 'recharge'))
+        for i in [0,1]:
+            p300.transfer(500, buff, deep_well.wells()[sample_well].top(), new_tip='never')
+            p1000.transfer(510, deep_well.wells()[sample_well], beads, new_tip='never', mix_before=(3,500))
+        discard_tip(p300)
+        discard_tip(p1000)
 
 def clean_tips(pipette, clean_vol, protocol):
     if pipette == p1000:
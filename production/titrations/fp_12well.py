@@ -7,6 +7,10 @@ import math
 import random
 import subprocess
 
+sys.path.append('/data/user_storage')
+from lib.tips import TipAllocator
+from lib.titration import plan_titration
+
 
 metadata = {
     'protocolName': 'FP - 12 well titrations',
@@ -43,48 +47,42 @@ def setup(protocol):
     buff = trough.wells()[0]
     protein= dnas.rows()[0][11]
 
-    # rows
-    global rxn_vol, start_vol, dilution_factor
+    # rows: protein 5x (50µM) -> 10µM in 1:2 steps over 11 wells, DNA 5x in all 12
+    global rxn_vol, series
     rxn_vol = 20   
-    dilution_factor = 2 # i.e. 1:2, not 1 in 2
-    start_vol = rxn_vol + (rxn_vol/dilution_factor)
+    series = plan_titration(stock=50, top=10, points=11, rxn_vol=rxn_vol, dilution_factor=2, components={"dna": 5})
+    series.validate(p20m, plate.wells()[0])
 
-def pickup_tips(number, pipette, protocol):
-    nozzle_dict = {2: "G1", 3: "F1", 4: "E1", 5: "D1", 6: "C1", 7: "B1"}
-    if pipette == p20m: 
-        if number == 1:
-            p20m.configure_nozzle_layout(style=SINGLE,start="H1")
-        elif number > 1 and number < 8:
-            p20m.configure_nozzle_layout(style=PARTIAL_COLUMN, start="H1", end=nozzle_dict[number])
-        else:
-            p20m.configure_nozzle_layout(style=ALL)
-        p20m.pick_up_tip(tips20)
+    # tips
+    global tips
+    tips = TipAllocator(protocol)
+    tips.add_pipette(p20m, [tips20])
 
 def add_buff_and_dna(protocol):
     rows = [0,1,0,1]
     cols = [0,0,12,12]
     dna_col = [0,1,2,3]
     
-    pickup_tips(8, p20m, protocol)
+    tips.pickup_tips(8, p20m)
     for row, col in zip(rows, cols):
-        p20m.transfer(start_vol*(3/5), buff, plate.rows()[row][col], new_tip='never')
-        p20m.transfer(rxn_vol*(4/5), buff, plate.rows()[row][col+1:col+12], new_tip='never')
-    p20m.return_tip()
+        p20m.transfer(series.diluent[0][0], buff, plate.rows()[row][col], new_tip='never')
+        p20m.transfer(series.diluent[0][1], buff, plate.rows()[row][col+1:col+12], new_tip='never')
+    tips.return_tips(p20m)
     for row, col, dna_col in zip(rows, cols, dna_col):
-        pickup_tips(8, p20m, protocol)
-        p20m.transfer(start_vol*(1/5), dnas.rows()[0][dna_col], plate.rows()[row][col], new_tip='never')
-        p20m.transfer(rxn_vol*(1/5), dnas.rows()[0][dna_col], plate.rows()[row][col+1:col+12], new_tip='never')
-        p20m.return_tip()
+        tips.pickup_tips(8, p20m)
+        p20m.transfer(series.components["dna"][0][0], dnas.rows()[0][dna_col], plate.rows()[row][col], new_tip='never')
+        p20m.transfer(series.components["dna"][0][1], dnas.rows()[0][dna_col], plate.rows()[row][col+1:col+12], new_tip='never')
+        tips.return_tips(p20m)
 
 def add_protein_and_titrate(protocol):
     rows = [0,1,0,1]
     cols = [0,0,12,12]
 
     for row, col in zip(rows, cols):
-        pickup_tips(8, p20m, protocol)
-        p20m.transfer(start_vol*(1/5), protein, plate.rows()[row][col], new_tip='never')
-        p20m.transfer(rxn_vol/dilution_factor, plate.rows()[row][col+0:col+10], plate.rows()[row][col+1:col+11], 
+        tips.pickup_tips(8, p20m)
+        p20m.transfer(series.titrant[0][0], protein, plate.rows()[row][col], new_tip='never')
+        p20m.transfer(series.carry, plate.rows()[row][col+0:col+10], plate.rows()[row][col+1:col+11], 
                     mix_before=(3,rxn_vol), new_tip='never')    
         p20m.mix(3,rxn_vol, plate.rows()[row][col+10])
-        p20m.aspirate(rxn_vol/dilution_factor, plate.rows()[row][col+10])
-        p20m.return_tip()
\ No newline at end of file
+        p20m.aspirate(series.carry, plate.rows()[row][col+10])
+        tips.return_tips(p20m)
\ No newline at end of file
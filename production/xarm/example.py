@@ -11,14 +11,20 @@ Capabilities shown:
     * Setting a TCP offset for the plate gripper fingers
     * Coordinating rail motion with arm Cartesian moves
     * Joint moves to a taught "safe" pose
-    * Blended waypoint sequences (arc move) for smooth transport
+    * Blended waypoint sequences (arc move) for smooth transport, with a
+      modeled stop-and-go vs blended timing report
     * Bio-gripper open/close with force + speed control
+    * Offline runs against a simulated controller and reader (--simulate)
+    * Per-primitive latency telemetry (ring buffer + histograms)
     * Talking to the BioTek reader (tray open/close) — stubbed via serial
+    * Running arm, rail, gripper and reader steps concurrently with asyncio,
+      within declared ownership and collision rules
 
 IMPORTANT
-    All numeric positions below are PLACEHOLDERS. You must jog the arm to
-    each key location, read the pose from the controller (or xArm Studio),
-    and paste the values in before running unattended. Run the first pass
+    All station poses in stations.json are PLACEHOLDERS. You must jog the
+    arm to each key location, read the pose from the controller (or xArm
+    Studio), and teach it (``python poses.py import session.csv``) before
+    running unattended. Run the first pass
     with the E-stop in hand at reduced speed (SPEED_SLOW).
 
 Coordinate conventions (xArm SDK defaults):
@@ -29,12 +35,21 @@ Coordinate conventions (xArm SDK defaults):
 
 from __future__ import annotations
 
+import argparse
+import asyncio
 import sys
 import time
 from contextlib import contextmanager
 from dataclasses import dataclass
 
-from xarm.wrapper import XArmAPI
+try:
+    from xarm.wrapper import XArmAPI
+except ImportError:             # no SDK: only SIMULATE runs
+    XArmAPI = None
+
+from motion import distance, profile_time, segment_time
+from poses import STATIONS_FILE, Pose, PoseRegistry
+from telemetry import TELEMETRY, XArmError, traced
 
 
 # ---------------------------------------------------------------------------
@@ -44,6 +59,12 @@ from xarm.wrapper import XArmAPI
 ARM_IP = "192.168.1.213"           # <-- set to your controller's IP
 REPORT_TYPE = "rich"
 
+# True: run against the kinematic stand-ins in simulated.py, no hardware
+# needed. SIM_SPEEDUP runs the simulation that many times faster than real
+# time (reported times stay in hardware seconds). Also --simulate/--speedup.
+SIMULATE    = False
+SIM_SPEEDUP = 1.0
+
 # Motion tuning (mm/s, mm/s^2, deg/s, deg/s^2)
 SPEED_FAST   = 250
 SPEED_SLOW   = 80
@@ -77,28 +98,19 @@ BIOTEK_PORT = "/dev/tty.usbserial-BIOTEK"        # adjust for your machine
 # Taught poses  (fill these in during calibration)
 # ---------------------------------------------------------------------------
 
-@dataclass(frozen=True)
-class Pose:
-    """A single taught station: rail position + arm Cartesian pose."""
-    rail_mm: float
-    xyz_rpy: tuple[float, float, float, float, float, float]
-
+# Stations live in stations.json (see poses.py); add or re-teach them there.
+# Loading precomputes each station's approach/lift/retreat poses.
+STATIONS = PoseRegistry(STATIONS_FILE, Z_APPROACH, Z_LIFT, Z_RETREAT)
 
 # Safe, arms-tucked joint pose used for long rail traverses.
 HOME_JOINTS = [0.0, -45.0, -30.0, 0.0, 75.0, 0.0]
 
 # Grip pose directly on top of the plate in Opentrons Flex deck slot C2.
-FLEX_SLOT_C2 = Pose(
-    rail_mm=  120.0,
-    xyz_rpy=(  350.0,  0.0, 145.0,  180.0, 0.0, 0.0),
-)
+FLEX_SLOT_C2 = STATIONS.slot("C2")
 
 # Grip pose on the BioTek reader tray (tray extended, plate seated in the
 # adapter). Roll = 180 keeps the gripper pointing straight down.
-BIOTEK_TRAY = Pose(
-    rail_mm= 1280.0,
-    xyz_rpy=(  310.0, -25.0, 160.0,  180.0, 0.0, 0.0),
-)
+BIOTEK_TRAY = STATIONS["reader tray"]
 
 
 # ---------------------------------------------------------------------------
@@ -108,7 +120,7 @@ BIOTEK_TRAY = Pose(
 def _check(code: int, action: str) -> None:
     """Abort loudly if the controller returns a non-zero status."""
     if code != 0:
-        raise RuntimeError(f"xArm error {code} during {action!r}")
+        raise XArmError(code, action)
 
 
 def _on_error(item) -> None:
@@ -120,12 +132,21 @@ def _on_warn(item) -> None:
 
 
 @contextmanager
-def open_arm(ip: str = ARM_IP):
+def open_arm(ip: str = ARM_IP, simulate: bool | None = None):
     """Yield a ready-to-move XArmAPI, guaranteeing safe teardown."""
-    arm = XArmAPI(ip, report_type=REPORT_TYPE)
+    if simulate if simulate is not None else SIMULATE:
+        from simulated import SimulatedXArm
+        TELEMETRY.speedup = SIM_SPEEDUP
+        arm = SimulatedXArm(ip, report_type=REPORT_TYPE, speedup=SIM_SPEEDUP, rail_acc=RAIL_ACC)
+    elif XArmAPI is None:
+        raise RuntimeError("xArm SDK (xarm-python-sdk) is not installed; set SIMULATE to run without it")
+    else:
+        arm = XArmAPI(ip, report_type=REPORT_TYPE)
     try:
         arm.register_error_warn_changed_callback(_on_error)
         arm.register_error_warn_changed_callback(_on_warn)
+        arm.register_error_warn_changed_callback(TELEMETRY.on_error_warn)
+        arm.register_report_callback(TELEMETRY.on_report, report_joints=True)
 
         _check(arm.clean_warn(),  "clean_warn")
         _check(arm.clean_error(), "clean_error")
@@ -151,6 +172,7 @@ def open_arm(ip: str = ARM_IP):
             arm.disconnect()
 
 
+@traced("move_rail")
 def move_rail(arm: XArmAPI, position_mm: float) -> None:
     print(f"  rail -> {position_mm:.1f} mm")
     _check(
@@ -159,6 +181,7 @@ def move_rail(arm: XArmAPI, position_mm: float) -> None:
     )
 
 
+@traced("move_joints")
 def move_joints(arm: XArmAPI, joints, speed=JOINT_SPEED, acc=JOINT_ACC) -> None:
     _check(
         arm.set_servo_angle(angle=joints, speed=speed, mvacc=acc, wait=True),
@@ -166,6 +189,7 @@ def move_joints(arm: XArmAPI, joints, speed=JOINT_SPEED, acc=JOINT_ACC) -> None:
     )
 
 
+@traced("move_line")
 def move_line(arm: XArmAPI, xyz_rpy, speed=SPEED_FAST, acc=ACC_FAST) -> None:
     x, y, z, r, p, yaw = xyz_rpy
     _check(
@@ -175,6 +199,7 @@ def move_line(arm: XArmAPI, xyz_rpy, speed=SPEED_FAST, acc=ACC_FAST) -> None:
     )
 
 
+@traced("move_line_relative")
 def move_line_relative(arm: XArmAPI, dz: float, speed=SPEED_SLOW) -> None:
     """Small tool-frame Z nudge (positive dz = up in base frame here)."""
     _check(
@@ -184,51 +209,130 @@ def move_line_relative(arm: XArmAPI, dz: float, speed=SPEED_SLOW) -> None:
     )
 
 
+def _settle(arm: XArmAPI, seconds: float) -> None:
+    """Sleep; a simulated arm scales it like its own moves."""
+    getattr(arm, "settle", time.sleep)(seconds)
+
+
+@traced("gripper_open")
 def gripper_open(arm: XArmAPI) -> None:
     _check(arm.open_bio_gripper(speed=GRIPPER_SPEED, wait=True), "gripper open")
-    time.sleep(0.2)
+    _settle(arm, 0.2)
 
 
+@traced("gripper_close")
 def gripper_close(arm: XArmAPI) -> None:
     _check(arm.close_bio_gripper(speed=GRIPPER_SPEED, wait=True), "gripper close")
-    time.sleep(0.2)
+    _settle(arm, 0.2)
 
 
 # ---------------------------------------------------------------------------
-# Plate transfer primitives
+# Plate transfer paths
 # ---------------------------------------------------------------------------
+# A station visit is one Cartesian path: present above the plate, approach,
+# grip (or release), lift, retreat. Only the grip/release point and the end
+# of the path are exact stops. Every other waypoint is queued with a blend
+# radius (wait=False), so the controller rounds the corner or runs straight
+# through instead of decelerating to zero.
+
+BLEND_RADIUS = 20      # mm; clamped to half the shorter neighbouring segment
+
+
+@dataclass(frozen=True)
+class Waypoint:
+    xyz_rpy: tuple[float, float, float, float, float, float]
+    speed: float = SPEED_FAST
+    acc: float = ACC_FAST
+    stop: bool = False
+    action: str | None = None    # "grip" or "release", done at the stop
+
+
+def station_path(station: Pose, action: str) -> list[Waypoint]:
+    """Present, approach, grip/release, lift and retreat at ``station``."""
+    if station.approach is None:
+        station = station.with_clearances(Z_APPROACH, Z_LIFT, Z_RETREAT)
+    return [
+        Waypoint(station.retreat),
+        Waypoint(station.approach),
+        Waypoint(station.xyz_rpy, speed=SPEED_SLOW, stop=True, action=action),
+        Waypoint(station.lift, speed=SPEED_SLOW),
+        Waypoint(station.retreat, stop=True),
+    ]
+
+
+def blend_radii(path: list[Waypoint], radius: float = BLEND_RADIUS) -> list[float | None]:
+    """Blend radius for the move into each waypoint; None means an exact stop."""
+    radii = []
+    for i, point in enumerate(path):
+        if point.stop or i == len(path) - 1:
+            radii.append(None)
+            continue
+        before = distance(path[i - 1].xyz_rpy, point.xyz_rpy) if i else radius * 2
+        after = distance(point.xyz_rpy, path[i + 1].xyz_rpy)
+        radii.append(min(radius, before / 2, after / 2))
+    return radii
+
+
+@traced("run_path")
+def run_path(arm: XArmAPI, path: list[Waypoint], radius: float = BLEND_RADIUS) -> None:
+    for point, blend in zip(path, blend_radii(path, radius)):
+        x, y, z, r, p, yaw = point.xyz_rpy
+        _check(
+            arm.set_position(x=x, y=y, z=z, roll=r, pitch=p, yaw=yaw, radius=blend,
+                             speed=point.speed, mvacc=point.acc, wait=blend is None),
+            f"path to {point.xyz_rpy}",
+        )
+        if point.action == "grip":
+            gripper_close(arm)
+        elif point.action == "release":
+            gripper_open(arm)
+
 
 def go_to_station(arm: XArmAPI, station: Pose) -> None:
-    """Traverse to a station: tuck arm, drive rail, then present above plate."""
-    x, y, z, r, p, yaw = station.xyz_rpy
+    """Traverse to a station: tuck arm, then drive the rail."""
     print(f"traversing to station at rail={station.rail_mm} mm")
 
     move_joints(arm, HOME_JOINTS)                 # tuck for safe traverse
     move_rail(arm, station.rail_mm)               # drive along the 1500 mm rail
-    move_line(arm, (x, y, z + Z_RETREAT, r, p, yaw))   # approach from above
 
 
 def pick_plate(arm: XArmAPI, station: Pose) -> None:
-    x, y, z, r, p, yaw = station.xyz_rpy
+    x, y, z = station.xyz_rpy[:3]
     print(f"picking plate @ ({x:.1f}, {y:.1f}, {z:.1f})")
 
     gripper_open(arm)
-    move_line(arm, (x, y, z + Z_APPROACH, r, p, yaw), speed=SPEED_FAST)
-    move_line(arm, (x, y, z,              r, p, yaw), speed=SPEED_SLOW)
-    gripper_close(arm)
-    move_line(arm, (x, y, z + Z_LIFT,     r, p, yaw), speed=SPEED_SLOW)
-    move_line(arm, (x, y, z + Z_RETREAT,  r, p, yaw), speed=SPEED_FAST)
+    run_path(arm, station_path(station, "grip"))
 
 
 def place_plate(arm: XArmAPI, station: Pose) -> None:
-    x, y, z, r, p, yaw = station.xyz_rpy
+    x, y, z = station.xyz_rpy[:3]
     print(f"placing plate @ ({x:.1f}, {y:.1f}, {z:.1f})")
 
-    move_line(arm, (x, y, z + Z_APPROACH, r, p, yaw), speed=SPEED_FAST)
-    move_line(arm, (x, y, z,              r, p, yaw), speed=SPEED_SLOW)
-    gripper_open(arm)
-    move_line(arm, (x, y, z + Z_LIFT,     r, p, yaw), speed=SPEED_SLOW)
-    move_line(arm, (x, y, z + Z_RETREAT,  r, p, yaw), speed=SPEED_FAST)
+    run_path(arm, station_path(station, "release"))
+
+
+# ---------------------------------------------------------------------------
+# Cycle-time estimates (model in motion.py)
+# ---------------------------------------------------------------------------
+
+def path_time(path: list[Waypoint], blended: bool = True, radius: float = BLEND_RADIUS) -> float:
+    """Modeled seconds from the first waypoint to the last (gripper time excluded)."""
+    radii = blend_radii(path, radius) if blended else [None] * len(path)
+    return profile_time([point.xyz_rpy for point in path], [point.speed for point in path[1:]],
+                        [point.acc for point in path[1:]], radii)
+
+
+def timing_report(handoffs: list[tuple[Pose, Pose]]) -> str:
+    """Stop-and-go vs blended path time for each pick/place hand-off."""
+    lines = []
+    for source, dest in handoffs:
+        paths = [station_path(source, "grip"), station_path(dest, "release")]
+        stop_and_go = sum(path_time(path, blended=False) for path in paths)
+        blended = sum(path_time(path) for path in paths)
+        lines.append(f"rail {source.rail_mm:g} -> {dest.rail_mm:g} mm: "
+                     f"{stop_and_go:.2f} s stop-and-go, {blended:.2f} s blended "
+                     f"({stop_and_go - blended:.2f} s saved)")
+    return "\n".join(lines)
 
 
 # ---------------------------------------------------------------------------
@@ -255,6 +359,111 @@ class BioTekReader:
         time.sleep(2.0)
 
 
+# ---------------------------------------------------------------------------
+# Async orchestration
+# ---------------------------------------------------------------------------
+# The SDK and reader calls above block until the hardware is done. CellRunner
+# runs each of them in a worker thread so independent steps overlap (the
+# reader tray opens while the rail traverses, the gripper opens on the way
+# down). What may overlap is declared here, not left to call order:
+#
+#   * ownership: one step at a time per resource. The rail carries the arm,
+#     so rail and arm moves share the "arm" resource.
+#   * collisions: steps that wait for a condition before they start.
+
+RESOURCES = ("arm", "gripper", "reader")
+
+REQUIRES = {
+    "pick":            ("gripper open",),
+    "pick at reader":  ("gripper open", "tray open"),
+    "place at reader": ("tray open",),              # never reach over a closed tray
+    "close tray":      ("arm clear of reader",),    # never close the tray on the gripper
+}
+
+# Stations inside the reader's envelope.
+READER_STATIONS = {BIOTEK_TRAY}
+
+
+class CellRunner:
+    """Awaitable arm, rail, gripper and reader steps, with their constraints."""
+
+    def __init__(self, arm: XArmAPI, reader: BioTekReader) -> None:
+        self.arm = arm
+        self.reader = reader
+        self.locks = {name: asyncio.Lock() for name in RESOURCES}
+        self.conditions = {name: asyncio.Event()
+                           for needs in REQUIRES.values() for name in needs}
+        self.conditions["arm clear of reader"].set()
+        self.t0 = TELEMETRY.now()
+
+    async def _step(self, name: str, resources, call, *args, **kwargs) -> None:
+        for condition in REQUIRES.get(name, ()):
+            await self.conditions[condition].wait()
+        resources = (resources,) if isinstance(resources, str) else resources
+        held = []
+        try:
+            for resource in RESOURCES:          # always in the same order, so no deadlocks
+                if resource in resources:
+                    await self.locks[resource].acquire()
+                    held.append(self.locks[resource])
+            start = TELEMETRY.now() - self.t0
+            await asyncio.to_thread(call, *args, **kwargs)
+            print(f"  [{start:6.1f}-{TELEMETRY.now() - self.t0:6.1f} s] {name}")
+        finally:
+            for lock in held:
+                lock.release()
+
+    def _set(self, condition: str, value: bool) -> None:
+        if value:
+            self.conditions[condition].set()
+        else:
+            self.conditions[condition].clear()
+
+    # -- reader ---------------------------------------------------------------
+
+    async def open_tray(self) -> None:
+        await self._step("open tray", "reader", self.reader.open_tray)
+        self._set("tray open", True)
+
+    async def close_tray(self) -> None:
+        self._set("tray open", False)
+        await self._step("close tray", "reader", self.reader.close_tray)
+
+    async def read(self, protocol: str) -> None:
+        await self._step("read", "reader", self.reader.read, protocol)
+
+    # -- arm ------------------------------------------------------------------
+
+    async def tuck(self) -> None:
+        await self._step("tuck", "arm", move_joints, self.arm, HOME_JOINTS)
+        self._set("arm clear of reader", True)
+
+    async def go_to_station(self, station: Pose) -> None:
+        """Tuck, then drive the rail."""
+        await self.tuck()
+        await self._step(f"rail to {station.rail_mm:g} mm", "arm", move_rail, self.arm, station.rail_mm)
+
+    async def open_gripper(self) -> None:
+        await self._step("gripper open", "gripper", gripper_open, self.arm)
+        self._set("gripper open", True)
+
+    async def pick_plate(self, station: Pose) -> None:
+        name = self._enter(station, "pick")
+        await self._step(name, ("arm", "gripper"), run_path, self.arm, station_path(station, "grip"))
+        self._set("gripper open", False)
+
+    async def place_plate(self, station: Pose) -> None:
+        name = self._enter(station, "place")
+        await self._step(name, ("arm", "gripper"), run_path, self.arm, station_path(station, "release"))
+        self._set("gripper open", True)
+
+    def _enter(self, station: Pose, name: str) -> str:
+        if station in READER_STATIONS:
+            self._set("arm clear of reader", False)
+            return f"{name} at reader"
+        return name
+
+
 # ---------------------------------------------------------------------------
 # Opentrons Flex hand-off
 # ---------------------------------------------------------------------------
@@ -266,26 +475,46 @@ class BioTekReader:
 # This script assumes the Flex is idle and it is safe to enter its envelope.
 
 
-def flex_to_reader() -> None:
-    reader = BioTekReader()
+def make_reader(simulate: bool | None = None):
+    if simulate if simulate is not None else SIMULATE:
+        from simulated import SimulatedReader
+        return SimulatedReader(BIOTEK_PORT, speedup=SIM_SPEEDUP)
+    return BioTekReader()
+
+
+async def flex_to_reader() -> None:
+    reader = make_reader()
 
     with open_arm() as arm:
-        # 1. Pull the plate off the Flex deck.
-        go_to_station(arm, FLEX_SLOT_C2)
-        pick_plate(arm, FLEX_SLOT_C2)
+        cell = CellRunner(arm, reader)
 
-        # 2. In parallel-ish: open the reader tray while we traverse.
-        reader.open_tray()
+        # 1. Open the reader tray and the gripper while the rail drives to the Flex.
+        tray = asyncio.create_task(cell.open_tray())
+        gripper = asyncio.create_task(cell.open_gripper())
+        await cell.go_to_station(FLEX_SLOT_C2)
+        await cell.pick_plate(FLEX_SLOT_C2)
+        await gripper
 
-        # 3. Move to the reader and drop the plate onto the tray.
-        go_to_station(arm, BIOTEK_TRAY)
-        place_plate(arm, BIOTEK_TRAY)
+        # 2. Traverse to the reader; reaching over the tray waits for it.
+        await cell.go_to_station(BIOTEK_TRAY)
+        await cell.place_plate(BIOTEK_TRAY)
+        await tray
 
-        # 4. Retreat, close the tray, and read.
-        move_joints(arm, HOME_JOINTS)
-        reader.close_tray()
-        reader.read(protocol="absorbance_600nm.prt")
+        # 3. Retreat, close the tray, and read.
+        await cell.tuck()
+        await cell.close_tray()
+        await cell.read(protocol="absorbance_600nm.prt")
+        print(f"hand-off done in {TELEMETRY.now() - cell.t0:.1f} s")
+    print(TELEMETRY.report())
 
 
 if __name__ == "__main__":
-    flex_to_reader()
+    parser = argparse.ArgumentParser(description="Flex to BioTek plate hand-off.")
+    parser.add_argument("--simulate", action="store_true", help="use the simulated arm and reader")
+    parser.add_argument("--speedup", type=float, default=SIM_SPEEDUP,
+                        help="simulation speed vs real time (default: %(default)s)")
+    args = parser.parse_args()
+    SIMULATE = SIMULATE or args.simulate
+    SIM_SPEEDUP = args.speedup
+    print(timing_report([(FLEX_SLOT_C2, BIOTEK_TRAY)]))
+    asyncio.run(flex_to_reader())
@@ -0,0 +1,63 @@
+"""
+Motion timing model
+===================
+
+Trapezoidal velocity profiles for the xArm and its rail, shared by the
+cycle-time estimates in example.py and the simulated controller in
+simulated.py.
+
+A move is a chain of points. Each point is either an exact stop (radius
+``None``) or blended. Junction speeds are 0 at stops. At a blended point
+they are capped by the speeds of both segments, by what the acceleration
+allows over the neighbouring segments, and (at a real corner) by the
+centripetal limit of the blend arc::
+
+    seconds = profile_time([a, b, c], speeds=[250, 80], accs=[1500, 500],
+                           radii=[None, 20, None])
+"""
+
+from __future__ import annotations
+
+
+def distance(a, b) -> float:
+    """Straight-line distance between the x/y/z parts of two poses (mm)."""
+    return sum((pa - pb) ** 2 for pa, pb in zip(a[:3], b[:3])) ** 0.5
+
+
+def segment_time(length: float, v_in: float, v_out: float, speed: float, acc: float) -> float:
+    peak = min(speed, ((2 * acc * length + v_in ** 2 + v_out ** 2) / 2) ** 0.5)
+    ramp_up = (peak ** 2 - v_in ** 2) / (2 * acc)
+    ramp_down = (peak ** 2 - v_out ** 2) / (2 * acc)
+    cruise = max(length - ramp_up - ramp_down, 0.0)
+    return (peak - v_in) / acc + (peak - v_out) / acc + (cruise / peak if peak else 0.0)
+
+
+def turns(a, b, c) -> bool:
+    """True unless a -> b -> c carries straight on."""
+    u = [pb - pa for pa, pb in zip(a[:3], b[:3])]
+    v = [pc - pb for pb, pc in zip(b[:3], c[:3])]
+    dot = sum(i * j for i, j in zip(u, v))
+    return dot < 0.999 * distance(a, b) * distance(b, c)
+
+
+def profile_time(points: list, speeds: list[float], accs: list[float],
+                 radii: list[float | None]) -> float:
+    """Seconds to run through ``points``; segment ``i`` ends at ``points[i + 1]``."""
+    segments = [(distance(a, b), speed, acc)
+                for a, b, speed, acc in zip(points, points[1:], speeds, accs)]
+    junction = [0.0] * (len(segments) + 1)
+    for i in range(1, len(segments)):
+        if radii[i] is None:
+            continue
+        limit = min(segments[i - 1][1], segments[i][1])
+        if turns(points[i - 1], points[i], points[i + 1]):
+            limit = min(limit, (min(segments[i - 1][2], segments[i][2]) * radii[i]) ** 0.5)
+        junction[i] = limit
+    for i in range(len(segments) - 1, -1, -1):        # room to slow down
+        length, _, acc = segments[i]
+        junction[i] = min(junction[i], (junction[i + 1] ** 2 + 2 * acc * length) ** 0.5)
+    for i in range(len(segments)):                     # room to speed up
+        length, _, acc = segments[i]
+        junction[i + 1] = min(junction[i + 1], (junction[i] ** 2 + 2 * acc * length) ** 0.5)
+    return sum(segment_time(length, junction[i], junction[i + 1], speed, acc)
+               for i, (length, speed, acc) in enumerate(segments) if length)
@@ -0,0 +1,229 @@
+"""
+Taught-pose registry
+====================
+
+Stations used to be ``Pose`` constants in example.py, so adding one meant
+editing code. They now live in stations.json next to this file, keyed by
+station name and, where there is one, deck slot.
+
+Every change to a station is a new version, so a bad teach can be rolled
+back. A teach session (xArm Studio export or ``capture`` at the pendant)
+is imported in bulk; stations whose numbers didn't change keep their
+version. Loading precomputes the approach, lift and retreat poses of every
+station from the ``Z_*`` clearances, so the path planner and the transport
+planner never add offsets per move::
+
+    registry = PoseRegistry(STATIONS_FILE, Z_APPROACH, Z_LIFT, Z_RETREAT)
+    registry.import_session("teach_2026-10-18.csv")
+    registry.save()
+    reader = registry["reader tray"]
+    flex = registry.slot("C2")
+
+A teach session is CSV with the columns ``name, slot, rail_mm, x, y, z,
+roll, pitch, yaw``. From the command line::
+
+    python poses.py list
+    python poses.py import teach_2026-10-18.csv
+    python poses.py history "reader tray"
+    python poses.py revert "reader tray" 2
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+from dataclasses import asdict, dataclass, field, replace
+from datetime import datetime
+from pathlib import Path
+
+
+STATIONS_FILE = Path(__file__).with_name("stations.json")
+
+XyzRpy = tuple[float, float, float, float, float, float]
+
+
+@dataclass(frozen=True)
+class Pose:
+    """A single taught station: rail position + arm Cartesian pose."""
+    rail_mm: float
+    xyz_rpy: XyzRpy
+    # same pose raised by the clearances, filled in by PoseRegistry
+    approach: XyzRpy | None = field(default=None, compare=False)
+    lift: XyzRpy | None = field(default=None, compare=False)
+    retreat: XyzRpy | None = field(default=None, compare=False)
+
+    def above(self, dz: float) -> XyzRpy:
+        x, y, z, r, p, yaw = self.xyz_rpy
+        return (x, y, z + dz, r, p, yaw)
+
+    def with_clearances(self, approach: float, lift: float, retreat: float) -> "Pose":
+        return replace(self, approach=self.above(approach), lift=self.above(lift),
+                       retreat=self.above(retreat))
+
+
+@dataclass(frozen=True)
+class TaughtPose:
+    """One version of a station as stored on disk."""
+    name: str
+    version: int
+    rail_mm: float
+    xyz_rpy: XyzRpy
+    slot: str | None = None
+    taught: str = ""                     # ISO time
+    note: str = ""
+
+
+class PoseRegistry:
+    """Versioned stations on disk, with lookup by name and deck slot."""
+
+    def __init__(self, path: Path | str = STATIONS_FILE, z_approach: float = 0.0,
+                 z_lift: float = 0.0, z_retreat: float = 0.0) -> None:
+        self.path = Path(path)
+        self.clearances = (z_approach, z_lift, z_retreat)
+        self.history: dict[str, list[TaughtPose]] = {}
+        self._poses: dict[str, Pose] = {}
+        self._slots: dict[str, str] = {}
+        if self.path.exists():
+            self.load()
+
+    # -- lookup ---------------------------------------------------------------
+
+    def __getitem__(self, name: str) -> Pose:
+        try:
+            return self._poses[name]
+        except KeyError:
+            raise KeyError(f"No station {name!r} in {self.path.name}") from None
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._poses
+
+    def names(self) -> list[str]:
+        return list(self._poses)
+
+    def slot(self, slot: str) -> Pose:
+        """The station taught for a deck slot, e.g. ``"C2"``."""
+        try:
+            return self._poses[self._slots[slot]]
+        except KeyError:
+            raise KeyError(f"No station for slot {slot!r} in {self.path.name}") from None
+
+    def current(self, name: str) -> TaughtPose:
+        return self.history[name][-1]
+
+    # -- teaching -------------------------------------------------------------
+
+    def teach(self, name: str, rail_mm: float, xyz_rpy, slot: str | None = None,
+              note: str = "") -> TaughtPose:
+        """Record a pose for ``name``; a new version only if something changed."""
+        xyz_rpy = tuple(float(v) for v in xyz_rpy)
+        if len(xyz_rpy) != 6:
+            raise ValueError(f"{name}: need x, y, z, roll, pitch, yaw, got {xyz_rpy}")
+        owner = self._slots.get(slot) if slot else None
+        if owner is not None and owner != name:
+            raise ValueError(f"Slot {slot} already belongs to station {owner!r}.")
+        versions = self.history.setdefault(name, [])
+        if versions:
+            last = versions[-1]
+            if (last.rail_mm, last.xyz_rpy, last.slot) == (float(rail_mm), xyz_rpy, slot):
+                return last
+        taught = TaughtPose(name, len(versions) + 1, float(rail_mm), xyz_rpy, slot,
+                            datetime.now().isoformat(timespec="seconds"), note)
+        versions.append(taught)
+        self._index(taught)
+        return taught
+
+    def capture(self, arm, name: str, slot: str | None = None, note: str = "") -> TaughtPose:
+        """Teach ``name`` from where the arm and rail are now."""
+        code, xyz_rpy = arm.get_position()
+        if code != 0:
+            raise RuntimeError(f"xArm error {code} reading the position")
+        code, rail_mm = arm.get_linear_track_pos()
+        if code != 0:
+            raise RuntimeError(f"xArm error {code} reading the rail position")
+        return self.teach(name, rail_mm, xyz_rpy, slot, note)
+
+    def import_session(self, path: Path | str, note: str = "") -> list[TaughtPose]:
+        """Teach every row of a session CSV; returns the stations that changed."""
+        changed = []
+        with open(path, newline="") as handle:
+            for row in csv.DictReader(handle):
+                xyz_rpy = [row[key] for key in ("x", "y", "z", "roll", "pitch", "yaw")]
+                before = self.current(row["name"]) if row["name"] in self.history else None
+                taught = self.teach(row["name"], row["rail_mm"], xyz_rpy,
+                                    row.get("slot") or None, note or Path(path).name)
+                if taught is not before:
+                    changed.append(taught)
+        return changed
+
+    def revert(self, name: str, version: int) -> TaughtPose:
+        """Make an earlier version current again (as a new version)."""
+        old = next((v for v in self.history.get(name, []) if v.version == version), None)
+        if old is None:
+            raise ValueError(f"Station {name!r} has no version {version}.")
+        return self.teach(name, old.rail_mm, old.xyz_rpy, old.slot, f"revert to v{version}")
+
+    def _index(self, taught: TaughtPose) -> None:
+        for slot, owner in list(self._slots.items()):
+            if owner == taught.name:
+                del self._slots[slot]
+        if taught.slot:
+            self._slots[taught.slot] = taught.name
+        self._poses[taught.name] = Pose(taught.rail_mm, taught.xyz_rpy).with_clearances(*self.clearances)
+
+    # -- storage --------------------------------------------------------------
+
+    def load(self) -> None:
+        data = json.loads(self.path.read_text())
+        self.history, self._poses, self._slots = {}, {}, {}
+        for name, versions in data["stations"].items():
+            self.history[name] = [TaughtPose(name=name, **{**v, "xyz_rpy": tuple(v["xyz_rpy"])})
+                                  for v in versions]
+            self._index(self.history[name][-1])
+
+    def save(self) -> None:
+        """Write the file with one line per version."""
+        stations = []
+        for name, versions in self.history.items():
+            lines = ",\n".join("   " + json.dumps({k: v for k, v in asdict(version).items() if k != "name"})
+                               for version in versions)
+            stations.append(f"  {json.dumps(name)}: [\n{lines}\n  ]")
+        self.path.write_text('{"stations": {\n' + ",\n".join(stations) + "\n}}\n")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="List, import and roll back taught stations.")
+    parser.add_argument("--file", default=STATIONS_FILE, help="station file (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list")
+    imports = commands.add_parser("import")
+    imports.add_argument("session", help="teach-session CSV")
+    history = commands.add_parser("history")
+    history.add_argument("name")
+    revert = commands.add_parser("revert")
+    revert.add_argument("name")
+    revert.add_argument("version", type=int)
+    args = parser.parse_args(argv)
+
+    registry = PoseRegistry(args.file)
+    if args.command == "list":
+        for name in registry.names():
+            taught = registry.current(name)
+            print(f"{name:20} {taught.slot or '-':4} v{taught.version:<3} rail {taught.rail_mm:7.1f}  "
+                  f"{taught.xyz_rpy}")
+    elif args.command == "import":
+        changed = registry.import_session(args.session)
+        registry.save()
+        print(f"{len(changed)} stations changed: {', '.join(t.name for t in changed) or '-'}")
+    elif args.command == "history":
+        for taught in registry.history[args.name]:
+            print(f"v{taught.version:<3} {taught.taught:19} rail {taught.rail_mm:7.1f}  "
+                  f"{taught.xyz_rpy}  {taught.note}")
+    elif args.command == "revert":
+        taught = registry.revert(args.name, args.version)
+        registry.save()
+        print(f"{args.name} is now v{taught.version}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Simulated xArm controller and BioTek reader
+===========================================
+
+Kinematic stand-ins for ``XArmAPI`` and ``BioTekReader``, so hand-off
+sequences run (and get timed) without a controller or a reader. They take
+as long as the real hardware would, using the profiles in motion.py:
+
+* rail moves: trapezoid at the rail speed and ``RAIL_ACC``;
+* Cartesian moves: trapezoid at the requested speed/acceleration. Moves
+  queued with ``wait=False`` and a blend radius run through their corners,
+  and a ``wait=True`` move waits for the whole queue;
+* joint moves: trapezoid on the joint that moves furthest;
+* gripper and tray: fixed times.
+
+Only the SDK calls example.py makes are implemented. There is no
+kinematics model: after a joint move the tool is assumed to be at
+``TUCKED_XYZ``, and a joint move after Cartesian moves is timed as
+``CARTESIAN_TRAVEL_DEG`` on the slowest joint.
+
+``speedup`` divides every wait, so a run can go faster than real time. Set
+``TELEMETRY.speedup`` to the same value and reported times stay in
+hardware seconds. Selected with ``SIMULATE`` or ``--simulate`` in example.py::
+
+    python example.py --simulate --speedup 20
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+
+from motion import profile_time, segment_time
+
+
+RAIL_ACC = 500          # mm/s^2; open_arm passes example.RAIL_ACC
+GRIPPER_S = 0.5         # bio-gripper open or close
+TRAY_S = 4.0            # reader tray open or close
+READ_S = 2.0            # one read
+TUCKED_XYZ = (200.0, 0.0, 400.0, 180.0, 0.0, 0.0)
+CARTESIAN_TRAVEL_DEG = 60.0     # largest joint move back to a joint pose after Cartesian moves
+
+
+class SimulatedXArm:
+    """Enough of ``XArmAPI`` for example.py, with modeled timing."""
+
+    def __init__(self, ip: str = "simulated", report_type: str = "rich", speedup: float = 1.0,
+                 rail_acc: float = RAIL_ACC, gripper_s: float = GRIPPER_S) -> None:
+        self.ip = ip
+        self.speedup = speedup
+        self.rail_acc = rail_acc
+        self.gripper_s = gripper_s
+        self.angles = [0.0] * 6
+        self.position = list(TUCKED_XYZ)
+        self.rail_mm = 0.0
+        self.rail_speed = 100.0
+        self.gripper_closed = False
+        self.queue: list[tuple[tuple, float, float, float | None]] = []   # point, speed, acc, radius
+        self.queue_start = tuple(TUCKED_XYZ)
+        self.report_callbacks = []
+        self.error_callbacks = []
+        self.busy = 0.0                   # modeled seconds spent moving, summed over devices
+        self._lock = threading.Lock()
+
+    def _wait(self, seconds: float) -> None:
+        with self._lock:
+            self.busy += seconds
+        time.sleep(seconds / self.speedup)
+
+    def settle(self, seconds: float) -> None:
+        """A pause in the caller's sequence (e.g. after the gripper), in hardware time."""
+        self._wait(seconds)
+
+    def _report(self) -> None:
+        for callback in self.report_callbacks:
+            joints = list(self.angles) if self.angles is not None else None
+            callback({"joints": joints, "cartesian": list(self.position)})
+
+    # -- setup; accepted and ignored -------------------------------------------
+
+    def register_error_warn_changed_callback(self, callback) -> bool:
+        self.error_callbacks.append(callback)
+        return True
+
+    def register_report_callback(self, callback=None, **kwargs) -> bool:
+        self.report_callbacks.append(callback)
+        return True
+
+    def clean_warn(self) -> int:
+        return 0
+
+    def clean_error(self) -> int:
+        return 0
+
+    def motion_enable(self, enable: bool = True, servo_id=None) -> int:
+        return 0
+
+    def set_mode(self, mode: int = 0) -> int:
+        return 0
+
+    def set_state(self, state: int = 0) -> int:
+        return 0
+
+    def set_tcp_offset(self, offset, **kwargs) -> int:
+        return 0
+
+    def set_tcp_load(self, weight, center_of_gravity, **kwargs) -> int:
+        return 0
+
+    def set_linear_track_enable(self, enable: bool) -> int:
+        return 0
+
+    def set_bio_gripper_enable(self, enable: bool, wait: bool = True) -> int:
+        return 0
+
+    def set_bio_gripper_speed(self, speed: int) -> int:
+        return 0
+
+    def disconnect(self) -> None:
+        pass
+
+    # -- rail -------------------------------------------------------------------
+
+    def set_linear_track_speed(self, speed: float) -> int:
+        self.rail_speed = speed
+        return 0
+
+    def set_linear_track_pos(self, pos: float, speed: float | None = None, wait: bool = True,
+                             **kwargs) -> int:
+        seconds = segment_time(abs(pos - self.rail_mm), 0, 0, speed or self.rail_speed, self.rail_acc)
+        self.rail_mm = pos
+        if wait:
+            self._wait(seconds)
+        return 0
+
+    def get_linear_track_pos(self) -> tuple[int, float]:
+        return 0, self.rail_mm
+
+    # -- arm --------------------------------------------------------------------
+
+    def set_servo_angle(self, angle=None, speed: float = 20, mvacc: float = 500,
+                        wait: bool = False, **kwargs) -> int:
+        self._flush()
+        if self.angles is None:         # after Cartesian moves; no inverse kinematics here
+            travel = CARTESIAN_TRAVEL_DEG
+        else:
+            travel = max(abs(a - b) for a, b in zip(angle, self.angles))
+        self.angles = list(angle)
+        self.position = list(TUCKED_XYZ)
+        self._report()
+        if wait:
+            self._wait(segment_time(travel, 0, 0, speed, mvacc))
+        return 0
+
+    def set_position(self, x=None, y=None, z=None, roll=None, pitch=None, yaw=None,
+                     radius=None, speed: float = 100, mvacc: float = 2000, relative: bool = False,
+                     wait: bool = False, **kwargs) -> int:
+        target = []
+        for i, value in enumerate((x, y, z, roll, pitch, yaw)):
+            base = self.position[i]
+            target.append(base if value is None else base + value if relative else value)
+        if not self.queue:
+            self.queue_start = tuple(self.position)
+        self.queue.append((tuple(target), speed, mvacc, radius))
+        self.position = target
+        self.angles = None
+        if wait:
+            self._flush()
+        return 0
+
+    def _flush(self) -> None:
+        """Run the queued Cartesian moves as one profile, blended where they have a radius."""
+        if not self.queue:
+            return
+        points = [self.queue_start] + [move[0] for move in self.queue]
+        radii = [None] + [move[3] for move in self.queue[:-1]] + [None]
+        seconds = profile_time(points, [move[1] for move in self.queue],
+                               [move[2] for move in self.queue], radii)
+        self.queue = []
+        self._report()
+        self._wait(seconds)
+
+    def get_position(self, is_radian: bool = False) -> tuple[int, list[float]]:
+        return 0, list(self.position)
+
+    # -- bio-gripper ------------------------------------------------------------
+
+    def open_bio_gripper(self, speed: int = 0, wait: bool = True, **kwargs) -> int:
+        return self._grip(False, wait)
+
+    def close_bio_gripper(self, speed: int = 0, wait: bool = True, **kwargs) -> int:
+        return self._grip(True, wait)
+
+    def _grip(self, closed: bool, wait: bool) -> int:
+        if closed != self.gripper_closed and wait:
+            self._wait(self.gripper_s)
+        self.gripper_closed = closed
+        return 0
+
+
+class SimulatedReader:
+    """``BioTekReader`` with modeled tray and read times."""
+
+    def __init__(self, port: str = "simulated", speedup: float = 1.0, tray_s: float = TRAY_S,
+                 read_s: float = READ_S) -> None:
+        self.port = port
+        self.speedup = speedup
+        self.tray_s = tray_s
+        self.read_s = read_s
+        self.tray_open = False
+
+    def open_tray(self) -> None:
+        print("[BioTek sim] open tray")
+        if not self.tray_open:
+            time.sleep(self.tray_s / self.speedup)
+        self.tray_open = True
+
+    def close_tray(self) -> None:
+        print("[BioTek sim] close tray")
+        if self.tray_open:
+            time.sleep(self.tray_s / self.speedup)
+        self.tray_open = False
+
+    def read(self, protocol: str) -> None:
+        print(f"[BioTek sim] running protocol {protocol!r}")
+        time.sleep(self.read_s / self.speedup)
@@ -0,0 +1,183 @@
+"""
+xArm command telemetry
+======================
+
+Records every motion/gripper primitive the helpers in example.py issue:
+when it was issued and finished, the controller's return code, the rail
+position and the joint angles at completion. Records go into a fixed-size
+ring buffer, so a long unattended run keeps the recent history without
+growing.
+
+Joint angles come from the controller's report stream (``open_arm``
+registers ``on_report``), so recording doesn't add a query per command.
+The rail position is the last one reached by ``move_rail``.
+
+``report()`` gives per-primitive latency statistics and a histogram, which
+show which primitives dominate cycle time when tuning ``SPEED_*``/``ACC_*``.
+Nested primitives are recorded on their own as well: a ``run_path`` time
+includes the ``gripper_close`` at its stop::
+
+    @traced("move_rail")
+    def move_rail(arm, position_mm): ...
+
+    with open_arm() as arm:
+        ...
+    print(TELEMETRY.report())
+    TELEMETRY.export_csv("handoff_telemetry.csv")
+"""
+
+from __future__ import annotations
+
+import csv
+import functools
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+
+BUFFER_SIZE = 4096
+BINS_S = (0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0)    # upper edges; the last bin is open
+
+
+class XArmError(RuntimeError):
+    """A non-zero return code from the controller."""
+
+    def __init__(self, code: int, action: str) -> None:
+        super().__init__(f"xArm error {code} during {action!r}")
+        self.code = code
+
+
+@dataclass(frozen=True)
+class Record:
+    primitive: str
+    issued: float                 # s since the telemetry started
+    completed: float
+    code: int                     # 0, the controller's code, or -1 for other exceptions
+    rail_mm: float | None
+    joints: tuple[float, ...] | None
+
+    @property
+    def latency(self) -> float:
+        return self.completed - self.issued
+
+
+class Telemetry:
+    """Ring buffer of primitive records plus the latest controller state."""
+
+    def __init__(self, size: int = BUFFER_SIZE) -> None:
+        self.records: deque[Record] = deque(maxlen=size)
+        self.events: deque[tuple[float, str, int]] = deque(maxlen=size)    # errors and warnings
+        self.t0 = time.monotonic()
+        self.speedup = 1.0                  # simulated hardware running faster than real time
+        self.rail_mm: float | None = None
+        self.joints: tuple[float, ...] | None = None
+        self._lock = threading.Lock()
+
+    def now(self) -> float:
+        """Seconds since the telemetry started, in hardware time."""
+        return (time.monotonic() - self.t0) * self.speedup
+
+    # -- controller callbacks -------------------------------------------------
+
+    def on_report(self, item: dict) -> None:
+        if "joints" in item:
+            self.joints = tuple(item["joints"]) if item["joints"] is not None else None
+
+    def on_error_warn(self, item: dict) -> None:
+        with self._lock:
+            for kind in ("error_code", "warn_code"):
+                if item.get(kind):
+                    self.events.append((self.now(), kind, item[kind]))
+
+    # -- recording ------------------------------------------------------------
+
+    def record(self, primitive: str, issued: float, code: int, arm=None) -> None:
+        joints = self.joints
+        if joints is None and arm is not None:
+            angles = getattr(arm, "angles", None)
+            joints = tuple(angles) if isinstance(angles, (list, tuple)) else None
+        with self._lock:
+            self.records.append(Record(primitive, issued, self.now(), code, self.rail_mm, joints))
+
+    # -- reporting ------------------------------------------------------------
+
+    def latencies(self) -> dict[str, list[float]]:
+        with self._lock:
+            records = list(self.records)
+        latencies: dict[str, list[float]] = {}
+        for record in records:
+            latencies.setdefault(record.primitive, []).append(record.latency)
+        return latencies
+
+    def histograms(self, bins: tuple[float, ...] = BINS_S) -> dict[str, list[int]]:
+        """Counts per latency bin (``bins`` are upper edges, plus one open bin)."""
+        histograms = {}
+        for primitive, values in self.latencies().items():
+            counts = [0] * (len(bins) + 1)
+            for value in values:
+                counts[next((i for i, edge in enumerate(bins) if value <= edge), len(bins))] += 1
+            histograms[primitive] = counts
+        return histograms
+
+    def report(self, bins: tuple[float, ...] = BINS_S) -> str:
+        """Time spent per primitive, largest total first, with a latency histogram each."""
+        latencies = self.latencies()
+        histograms = self.histograms(bins)
+        labels = [f"<={edge:g}s" for edge in bins] + [f">{bins[-1]:g}s"]
+        lines = []
+        for primitive, values in sorted(latencies.items(), key=lambda kv: -sum(kv[1])):
+            ordered = sorted(values)
+            p95 = ordered[min(int(0.95 * len(ordered)), len(ordered) - 1)]
+            lines.append(f"{primitive:14} n={len(values):<4} total {sum(values):7.1f} s  "
+                         f"mean {sum(values) / len(values):5.2f}  p50 {ordered[len(ordered) // 2]:5.2f}  "
+                         f"p95 {p95:5.2f}  max {ordered[-1]:5.2f} s")
+            lines.append("    " + "  ".join(f"{label} {count}" for label, count
+                                         in zip(labels, histograms[primitive]) if count))
+        failed = sum(record.code != 0 for record in self.records)
+        if failed or self.events:
+            lines.append(f"{failed} failed commands, {len(self.events)} controller errors/warnings")
+        return "\n".join(lines)
+
+    def export_csv(self, path) -> None:
+        with self._lock:
+            records = list(self.records)
+        with open(path, "w", newline="") as handle:
+            writer = csv.writer(handle)
+            writer.writerow(["primitive", "issued", "completed", "latency", "code", "rail_mm", "joints"])
+            for record in records:
+                writer.writerow([record.primitive, f"{record.issued:.4f}", f"{record.completed:.4f}",
+                                 f"{record.latency:.4f}", record.code, record.rail_mm,
+                                 " ".join(f"{j:.2f}" for j in record.joints or ())])
+
+
+TELEMETRY = Telemetry()
+
+
+def traced(primitive: str, telemetry: Telemetry = TELEMETRY):
+    """Record every call of a helper as ``primitive``.
+
+    The helper's first argument is taken as the arm. A ``move_rail`` call
+    also updates the rail position (its second argument) once it succeeds.
+    """
+    def wrap(helper):
+        @functools.wraps(helper)
+        def call(*args, **kwargs):
+            issued = telemetry.now()
+            arm = args[0] if args else None
+            code = 0
+            try:
+                result = helper(*args, **kwargs)
+                if primitive == "move_rail":
+                    telemetry.rail_mm = float(args[1] if len(args) > 1 else kwargs["position_mm"])
+                return result
+            except XArmError as error:
+                code = error.code
+                raise
+            except Exception:
+                code = -1
+                raise
+            finally:
+                telemetry.record(primitive, issued, code, arm)
+        return call
+    return wrap
@@ -0,0 +1,184 @@
+"""
+Multi-plate transport on the xArm rail
+======================================
+
+Orders a queue of plate moves between named stations (Flex slots, the
+reader, storage) so the arm spends as little time as possible travelling
+empty, driving the rail and tucking for it.
+
+Costs come from the cycle-time model in example.py: a transit between two
+stations at the same rail position is a straight move at travel height; a
+transit along the rail is a tuck, the rail move and the way back out. Picks
+and places are the blended station paths plus the gripper.
+
+The planner is greedy: it always runs the cheapest move that is allowed
+next. A move is allowed when it is the next move of its plate and its
+destination is free. So after dropping a plate at the reader, the arm takes
+the plate that is waiting there back to the Flex instead of returning
+empty::
+
+    stations = registry_stations(STATIONS, accepts={"hotel 1": {"96"}})
+    plan = plan_moves([Job("p1", "flex C2", "reader tray"),
+                       Job("p0", "reader tray", "hotel 1")], stations)
+    print(plan.report())
+    run_moves(arm, plan)
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+
+from example import (RAIL_ACC, RAIL_SPEED, SPEED_FAST, ACC_FAST, Pose, Waypoint, XArmAPI,
+                     go_to_station, path_time, pick_plate, place_plate, segment_time,
+                     station_path)
+from poses import PoseRegistry
+
+
+TUCK_S = 3.0           # tuck before a rail move plus the way back out (rough; measure it)
+GRIPPER_S = 0.7        # one bio-gripper open or close, including the settle
+SAME_RAIL_MM = 1.0     # stations closer than this on the rail need no rail move
+
+
+@dataclass(frozen=True)
+class Station:
+    name: str
+    pose: Pose
+    accepts: frozenset[str] = frozenset()      # plate formats; empty means any
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "accepts", frozenset(self.accepts))
+
+
+@dataclass(frozen=True)
+class Job:
+    """Move ``plate`` from station ``source`` to station ``dest``."""
+    plate: str
+    source: str
+    dest: str
+    format: str = "96"
+
+
+@dataclass
+class Plan:
+    jobs: list[Job]
+    stations: dict[str, Station]
+    start: str | None = None
+    seconds: float = 0.0
+    tucks: int = 0
+    rail_mm: float = 0.0
+    baseline: "Plan | None" = field(default=None, repr=False)
+
+    @property
+    def plates_per_hour(self) -> float:
+        return len(self.jobs) * 3600 / self.seconds if self.seconds else 0.0
+
+    def report(self) -> str:
+        line = (f"{len(self.jobs)} moves in {self.seconds / 60:.1f} min: "
+                f"{self.plates_per_hour:.0f} plates/hour, {self.tucks} tucks, "
+                f"{self.rail_mm / 1000:.2f} m of rail")
+        if self.baseline is not None:
+            line += (f" (queue order, tucking every visit: {self.baseline.seconds / 60:.1f} min, "
+                     f"{self.baseline.plates_per_hour:.0f} plates/hour, "
+                     f"{self.baseline.tucks} tucks)")
+        return line
+
+
+def registry_stations(registry: PoseRegistry,
+                      accepts: dict[str, set[str]] | None = None) -> dict[str, Station]:
+    """Every station of a pose registry, with its precomputed clearance poses."""
+    accepts = accepts or {}
+    return {name: Station(name, registry[name], accepts.get(name, frozenset()))
+            for name in registry.names()}
+
+
+def transit_time(a: Station | None, b: Station, always_tuck: bool = False) -> tuple[float, bool, float]:
+    """Seconds from retreat at ``a`` to presenting at ``b``, whether it tucks, rail mm."""
+    if a is None:
+        return TUCK_S + segment_time(b.pose.rail_mm, 0, 0, RAIL_SPEED, RAIL_ACC), True, b.pose.rail_mm
+    rail = abs(a.pose.rail_mm - b.pose.rail_mm)
+    if rail < SAME_RAIL_MM and not always_tuck:
+        leave = station_path(a.pose, "release")[-1]
+        arrive = station_path(b.pose, "grip")[0]
+        return path_time([leave, Waypoint(arrive.xyz_rpy, SPEED_FAST, ACC_FAST, stop=True)]), False, 0.0
+    return TUCK_S + segment_time(rail, 0, 0, RAIL_SPEED, RAIL_ACC), True, rail
+
+
+def handling_time(station: Station, action: str) -> float:
+    return path_time(station_path(station.pose, action)) + GRIPPER_S
+
+
+def _check_jobs(jobs: list[Job], stations: dict[str, Station]) -> None:
+    for job in jobs:
+        for name in (job.source, job.dest):
+            if name not in stations:
+                raise ValueError(f"Unknown station {name!r} in the move of {job.plate}.")
+        accepts = stations[job.dest].accepts
+        if accepts and job.format not in accepts:
+            raise ValueError(f"{job.plate} is a {job.format} plate; {job.dest} only takes "
+                             f"{', '.join(sorted(accepts))}.")
+
+
+def _cost(jobs: list[Job], stations: dict[str, Station], start: str | None,
+          always_tuck: bool = False) -> Plan:
+    plan = Plan(list(jobs), stations, start)
+    here = stations[start] if start else None
+    for job in jobs:
+        for station, action in ((stations[job.source], "grip"), (stations[job.dest], "release")):
+            seconds, tucked, rail = transit_time(here, station, always_tuck)
+            plan.seconds += seconds + handling_time(station, action)
+            plan.tucks += tucked
+            plan.rail_mm += rail
+            here = station
+    return plan
+
+
+def plan_moves(jobs: list[Job], stations: dict[str, Station], start: str | None = None,
+               occupied: dict[str, str] | None = None) -> Plan:
+    """Order ``jobs`` greedily by cost; ``occupied`` maps station to plate at the start.
+
+    Moves of one plate keep their queue order. Raises ValueError if the
+    queue can't finish because every allowed destination is taken.
+    """
+    _check_jobs(jobs, stations)
+    if occupied is None:
+        occupied = {}
+        for job in jobs:
+            if job.plate not in occupied.values() and job.source not in occupied:
+                occupied[job.source] = job.plate
+    occupied = dict(occupied)
+    pending = list(jobs)
+    order = []
+    here = stations[start] if start else None
+    while pending:
+        nexts = {}
+        for job in pending:
+            nexts.setdefault(job.plate, job)
+        allowed = [job for job in nexts.values()
+                   if occupied.get(job.source) == job.plate and job.dest not in occupied]
+        if not allowed:
+            raise ValueError("No move can run next: every destination is occupied ("
+                             + ", ".join(f"{job.plate} -> {job.dest}" for job in nexts.values())
+                             + ").")
+        job = min(allowed, key=lambda j: (transit_time(here, stations[j.source])[0],
+                                          pending.index(j)))
+        pending.remove(job)
+        order.append(job)
+        del occupied[job.source]
+        occupied[job.dest] = job.plate
+        here = stations[job.dest]
+    plan = _cost(order, stations, start)
+    plan.baseline = _cost(jobs, stations, start, always_tuck=True)   # one go_to_station per visit
+    return plan
+
+
+def run_moves(arm: XArmAPI, plan: Plan) -> None:
+    """Carry out a plan, tucking only when the rail has to move."""
+    rail = plan.stations[plan.start].pose.rail_mm if plan.start else None
+    for job in plan.jobs:
+        print(f"{job.plate}: {job.source} -> {job.dest}")
+        for name, move in ((job.source, pick_plate), (job.dest, place_plate)):
+            station = plan.stations[name]
+            if rail is None or abs(station.pose.rail_mm - rail) >= SAME_RAIL_MM:
+                go_to_station(arm, station.pose)
+                rail = station.pose.rail_mm
+            move(arm, station.pose)
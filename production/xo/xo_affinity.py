@@ -7,6 +7,9 @@ import math
 import random
 import subprocess
 
+sys.path.append('/data/user_storage')
+from lib.tips import TipAllocator
+
 
 metadata = {
     'protocolName': 'XO affinity assay - 12 point 1:1 dilution, 384 well plate',
@@ -60,73 +63,40 @@ def setup(protocol):
     water = trough.wells()[1]
     side = int(protocol.params.side)
 
-    #single tips
-    global tip_20, tip_300
-    tip_20 = 0
-    tip_300 = 0
-
-def pickup_tips(number, pipette, protocol):
-    global last_tip20, last_tip300, tip_20, tip_300
-    nozzle_dict = {2: "G1", 3: "F1", 4: "E1", 5: "D1", 6: "C1", 7: "B1"}
-   
-    if pipette == p20m: 
-        last_tip20 = tip_20
-        if number == 1:
-            p20m.configure_nozzle_layout(style=SINGLE,start="H1")
-        elif number > 1 and number < 8:
-            p20m.configure_nozzle_layout(style=PARTIAL_COLUMN, start="H1", end=nozzle_dict[number])
-        else:
-            p20m.configure_nozzle_layout(style=ALL)
-        p20m.pick_up_tip(tips20)
-        tip_20 += number
-
-    elif pipette == p300m:
-        last_tip300 = tip_300
-        if number == 1:
-            p300m.configure_nozzle_layout(style=SINGLE,start="H1")
-        elif number > 1 and number < 8:
-            p300m.configure_nozzle_layout(style=PARTIAL_COLUMN,start="H1", end=nozzle_dict[number])
-        else:
-            p300m.configure_nozzle_layout(style=ALL)
-        p300m.pick_up_tip(tips300)
-        tip_300 += number
-
-def return_tips(pipette):
-    if pipette == p20m:
-        # p20m.configure_nozzle_layout(style=ALL)
-        p20m.drop_tip(dirty_tips20.wells()[last_tip20])
-    elif pipette == p300m:
-        # p300m.configure_nozzle_layout(style=ALL)
-        p300m.drop_tip(dirty_tips300.wells()[last_tip300])
+    # tips
+    global tips
+    tips = TipAllocator(protocol)
+    tips.add_pipette(p20m, [tips20], dirty_racks=[dirty_tips20])
+    tips.add_pipette(p300m, [tips300], dirty_racks=[dirty_tips300])
 
 def make_high(protocol):
-    pickup_tips(8, p300m, protocol)
+    tips.pickup_tips(8, p300m)
     p300m.distribute(170.2, buff, dilution_plate.rows()[0][0:4], new_tip='never')
-    return_tips(p300m)
+    tips.return_tips(p300m)
     
     for i in [0,1]:
-        pickup_tips(8, p20m, protocol)
+        tips.pickup_tips(8, p20m)
         p20m.transfer(4.8, metals.rows()[0][i], dilution_plate.rows()[0][i*2], mix_after=(10,20), new_tip='never')
         p20m.transfer(4.8, dilution_plate.rows()[0][i*2], dilution_plate.rows()[0][1+(2*i)], mix_after=(10,20), new_tip='never')
         p20m.transfer(25, dilution_plate.rows()[0][1+(2*i)], plate.rows()[i][0+side], new_tip='never')
-        return_tips(p20m)
+        tips.return_tips(p20m)
 
 def make_low(protocol):
     for i in [0,1]:
-        pickup_tips(8, p300m, protocol)
+        tips.pickup_tips(8, p300m)
         p300m.transfer(150, water, dilution_plate.rows()[0][(i*2)+1], mix_after=(3,150), new_tip='never')
         p300m.distribute(25, dilution_plate.rows()[0][(i*2)+1], plate.rows()[i][1+side:12+side], new_tip='never')
-        return_tips(p300m)
+        tips.return_tips(p300m)
 
 def add_protein(protocol):
     for i in range(0,16):
-        pickup_tips(1, p300m, protocol)
+        tips.pickup_tips(1, p300m)
         p300m.transfer(25, protein, plate.rows()[i][0+side], mix_after=(3, 25), new_tip='never')
         p300m.drop_tip()
 
 def titrate(protocol):
     for i in [0,1]:
-        pickup_tips(8, p300m, protocol)
+        tips.pickup_tips(8, p300m)
         p300m.transfer(25, plate.rows()[i][0+side:10+side], plate.rows()[i][1+side:11+side], mix_after=(5, 25), new_tip='never')
         p300m.aspirate(25, plate.rows()[i][10+side])
-        return_tips(p300m)
+        tips.return_tips(p300m)
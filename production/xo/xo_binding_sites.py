@@ -7,6 +7,9 @@ import math
 import random
 import subprocess
 
+sys.path.append('/data/user_storage')
+from lib.tips import TipAllocator
+
 
 metadata = {
     'protocolName': 'Xylenol Orange Titration - 12 point 1:1 dilution, 384 well plate',
@@ -50,73 +53,40 @@ def setup(protocol):
     buff = trough.wells()[0]
     prot_buff = trough.wells()[1]
 
-    #single tips
-    global tip_20, tip_300
-    tip_20 = 0
-    tip_300 = 0
-
-def pickup_tips(number, pipette, protocol):
-    global last_tip20, last_tip300, tip_20, tip_300
-    nozzle_dict = {2: "G1", 3: "F1", 4: "E1", 5: "D1", 6: "C1", 7: "B1"}
-   
-    if pipette == p20m: 
-        last_tip20 = tip_20
-        if number == 1:
-            p20m.configure_nozzle_layout(style=SINGLE,start="H1")
-        elif number > 1 and number < 8:
-            p20m.configure_nozzle_layout(style=PARTIAL_COLUMN, start="H1", end=nozzle_dict[number])
-        else:
-            p20m.configure_nozzle_layout(style=ALL)
-        p20m.pick_up_tip(tips20)
-        tip_20 += number
-
-    elif pipette == p300m:
-        last_tip300 = tip_300
-        if number == 1:
-            p300m.configure_nozzle_layout(style=SINGLE,start="H1")
-        elif number > 1 and number < 8:
-            p300m.configure_nozzle_layout(style=PARTIAL_COLUMN,start="H1", end=nozzle_dict[number])
-        else:
-            p300m.configure_nozzle_layout(style=ALL)
-        p300m.pick_up_tip(tips300)
-        tip_300 += number
-
-def return_tips(pipette):
-    if pipette == p20m:
-        # p20m.configure_nozzle_layout(style=ALL)
-        p20m.drop_tip(dirty_tips20.wells()[last_tip20])
-    elif pipette == p300m:
-        # p300m.configure_nozzle_layout(style=ALL)
-        p300m.drop_tip(dirty_tips300.wells()[last_tip300])
+    # tips
+    global tips
+    tips = TipAllocator(protocol)
+    tips.add_pipette(p20m, [tips20], dirty_racks=[dirty_tips20])
+    tips.add_pipette(p300m, [tips300], dirty_racks=[dirty_tips300])
 
 def distribute_buffs(protocol):
-    pickup_tips(8, p300m, protocol)
+    tips.pickup_tips(8, p300m)
     p300m.transfer(66.6, buff, plate.rows()[0][0], new_tip='never')
     p300m.transfer(50, buff, plate.rows()[0][1:12], new_tip='never')
     p300m.transfer(66.6, buff, plate.rows()[0][12], new_tip='never')
     p300m.transfer(50, buff, plate.rows()[0][13:24], new_tip='never')
-    return_tips(p300m)
+    tips.return_tips(p300m)
 
-    pickup_tips(8, p300m, protocol)
+    tips.pickup_tips(8, p300m)
     p300m.transfer(66.6, prot_buff, plate.rows()[1][0], new_tip='never')
     p300m.transfer(50, prot_buff, plate.rows()[1][1:12], new_tip='never')
     p300m.transfer(66.6, prot_buff, plate.rows()[1][12], new_tip='never')
     p300m.transfer(50, prot_buff, plate.rows()[1][13:24], new_tip='never')
-    return_tips(p300m)
+    tips.return_tips(p300m)
 
 def add_metal(protocol):
     for metal in range(0,8):
-        pickup_tips(1, p20m, protocol)
+        tips.pickup_tips(1, p20m)
         p20m.transfer(2, metals_loc[metal], plate.rows()[metal*2][0], mix_after=(3,5), new_tip='never')
         p20m.drop_tip()
-        pickup_tips(1, p20m, protocol)
+        tips.pickup_tips(1, p20m)
         p20m.transfer(2, metals_loc[metal], plate.rows()[metal*2+1][0], mix_after=(3,5), new_tip='never')
         p20m.drop_tip()
     for metal in range(0,8):
-        pickup_tips(1, p20m, protocol)
+        tips.pickup_tips(1, p20m)
         p20m.transfer(2, metals_loc[metal+8], plate.rows()[metal*2][12], mix_after=(3,5), new_tip='never')
         p20m.drop_tip()
-        pickup_tips(1, p20m, protocol)
+        tips.pickup_tips(1, p20m)
         p20m.transfer(2, metals_loc[metal+8], plate.rows()[metal*2+1][12], mix_after=(3,5), new_tip='never')
         p20m.drop_tip()
 
@@ -124,8 +94,8 @@ def titrate(protocol):
     rows = [0,0,1,1]
     cols = [0,12,0,12]
     for row, col in zip(rows,cols):
-        pickup_tips(8, p20m, protocol)
+        tips.pickup_tips(8, p20m)
         p20m.transfer(16.66, plate.rows()[0+row][0+col:10+col], plate.rows()[0+row][1+col:11+col], 
                     mix_before=(5, 20), new_tip='never')
-        return_tips(p20m)
+        tips.return_tips(p20m)
 
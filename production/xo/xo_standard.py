@@ -7,6 +7,9 @@ import math
 import random
 import subprocess
 
+sys.path.append('/data/user_storage')
+from lib.tips import TipAllocator
+
 
 metadata = {
     'protocolName': 'XO standards',
@@ -61,63 +64,44 @@ def setup(protocol):
     start_col = protocol.params.start_col - 1 
     samples = protocol.params.samples
 
-    #single tips
-    global tip_300
-    tip_300 = 0
-
-def pickup_tips(number, pipette, protocol):
-    global last_tip300, tip_300
-    nozzle_dict = {2: "G1", 3: "F1", 4: "E1", 5: "D1", 6: "C1", 7: "B1"}
-
-    if pipette == p300m:
-        last_tip300 = tip_300
-        if number == 1:
-            p300m.configure_nozzle_layout(style=SINGLE,start="H1")
-        elif number > 1 and number < 8:
-            p300m.configure_nozzle_layout(style=PARTIAL_COLUMN,start="H1", end=nozzle_dict[number])
-        else:
-            p300m.configure_nozzle_layout(style=ALL)
-        p300m.pick_up_tip(tips300)
-        tip_300 += number
-
-def return_tips(pipette):
-    if pipette == p300m:
-        # p300m.configure_nozzle_layout(style=ALL)
-        p300m.drop_tip(dirty_tips300.wells()[last_tip300])
+    # tips
+    global tips
+    tips = TipAllocator(protocol)
+    tips.add_pipette(p300m, [tips300], dirty_racks=[dirty_tips300])
 
 def add_xo(protocol):
-    pickup_tips(8, p300m, protocol)
+    tips.pickup_tips(8, p300m)
     for i in range(2):
         p300m.transfer(200, xo, plate.columns()[i][0], new_tip='never')
 
     for i in range(samples // 8):
         p300m.transfer(200, xo, plate.columns()[i+2][0], new_tip='never')
-    return_tips(p300m)
+    tips.return_tips(p300m)
 
-    pickup_tips(samples % 8, p300m, protocol)
     if samples % 8 != 0:
+        tips.pickup_tips(samples % 8, p300m)
         p300m.transfer(200, xo, plate.columns()[samples // 8 + 2][samples % 8], new_tip='never')
-    p300m.drop_tip()
+        p300m.drop_tip()
 
 def make_standard_curve(protocol):    
     for i in range(2):
-        pickup_tips(1, p300m, protocol)
+        tips.pickup_tips(1, p300m)
         for well in range(1,8):
             p300m.transfer(100, buff, dilution_plate.columns()[start_col+i][well], new_tip='never')
         for well in range(1,8):
             p300m.transfer(100, dilution_plate.columns()[start_col+i][well-1], dilution_plate.columns()[start_col+i][well], new_tip='never', mix_after=(3, 100))
         p300m.drop_tip()
-        pickup_tips(8, p300m, protocol)
+        tips.pickup_tips(8, p300m)
         p300m.transfer(100, dilution_plate.columns()[start_col+i][0], plate.columns()[start_col+i][0], new_tip='never', mix_after=(3,100))
-        return_tips(p300m)
+        tips.return_tips(p300m)
 
 def add_samples(protocol):
     for i in range(samples // 8):
-        pickup_tips(8, p300m, protocol)
+        tips.pickup_tips(8, p300m)
         p300m.transfer(20, sample_plate.columns()[i][0], plate.columns()[i+2][0], mix_after=(3, 200), new_tip='never')
-        return_tips(p300m)
+        tips.return_tips(p300m)
 
-    pickup_tips(samples % 8, p300m, protocol)
     if samples % 8 != 0:
+        tips.pickup_tips(samples % 8, p300m)
         p300m.transfer(20, sample_plate.columns()[samples // 8][samples % 8], plate.columns()[samples // 8 + 2][samples % 8], mix_after=(3, 200), new_tip='never')
-    p300m.drop_tip()
\ No newline at end of file
+        p300m.drop_tip()
\ No newline at end of file
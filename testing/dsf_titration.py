@@ -6,6 +6,9 @@ import math
 import random
 import subprocess
 
+sys.path.append('/data/user_storage')
+from lib.tips import TipAllocator
+
 
 metadata = {
     'protocolName': 'DSF metal titration - hit follow up, 96well',
@@ -149,46 +152,11 @@ def setup(protocol):
     titrations = metals * samples
 
     # tips
-    global tip20_dict, tip300_dict
-    tip20_dict = {key: ['H','G','F','E','D','C','B','A'] for key in range(1, 12 + 1)}
-    # tip300_dict = {key: ['H','G','F','E','D','C','B','A'] for key in range(1, 12 + 1)}
-    tip300_dict = {key: ['A','B','C','D','E','F','G','H'] for key in range(1, 12 + 1)}
+    global tips
+    tips = TipAllocator(protocol)
+    tips.add_pipette(p20m, [tips20], start="A1")
+    tips.add_pipette(p300m, [tips300])
 
-def pickup_tips(number, pipette, protocol):
-    nozzle_dict = {2: "G1", 3: "F1", 4: "E1", 5: "D1", 6: "C1", 7: "B1"}
-    if number > 8 or number < 1 or pipette not in [p20m, p300m]:
-        protocol.comment(f"Custom tip pick up function doesn't support combination of \
-                           {pipette} for pipette and {number} for tips.")
-        raise ValueError(f"Custom tip pick up function doesn't support combination of \
-                           {pipette} for pipette and {number} for tips.")
-    elif pipette == p20m:
-        if number == 1:
-            p20m.configure_nozzle_layout(style=SINGLE,start="A1")
-        elif number > 1 and number < 8:
-            p20m.configure_nozzle_layout(style=PARTIAL_COLUMN, start="A1", end=nozzle_dict[number])
-        else:
-            p20m.configure_nozzle_layout(style=ALL)
-        for col in tip20_dict:
-            if len(tip20_dict[col]) >= number:
-                p20m.pick_up_tip(tips20[str(tip20_dict[col][number-1] + str(col))])
-                tip20_dict[col] = tip20_dict[col][number:]
-                break
-    elif pipette == p300m:
-        if number == 1:
-            p300m.configure_nozzle_layout(style=SINGLE,start="H1")
-        elif number > 1 and number < 8:
-            p300m.configure_nozzle_layout(style=PARTIAL_COLUMN,start="H1", end=nozzle_dict[number])
-        else:
-            p300m.configure_nozzle_layout(style=ALL)
-        for col in tip300_dict:
-            if len(tip300_dict[col]) >= number:
-                p300m.pick_up_tip(tips300[str(tip300_dict[col][number-1] + str(col))])
-                tip300_dict[col] = tip300_dict[col][number:]
-                break
-    else:
-        protocol.comment("Custom tip pick up function doesn't recognize inputs.")
-        raise ValueError("Custom tip pick up function doesn't recognize inputs.")
-         
 def check_params(protocol):
     True
     # if start_vol > max_vol:
@@ -216,7 +184,7 @@ def titrate(protocol):
     metals_per_plate = metals_per_row * metal_rows
 
     # add 2x spyro to last well of deep well
-    pickup_tips(1, p300m, protocol)
+    tips.pickup_tips(1, p300m)
     for metal in range(0, metals):
         p300m.aspirate(titration_dil_vol, sypro2)
         row = metal % metal_rows
@@ -227,7 +195,7 @@ def titrate(protocol):
     # distribute spyro to 4 other wells
     for metal in range(0, metals):
         if (metal + 1) % metal_rows == 0:
-            pickup_tips(8, p300m, protocol)
+            tips.pickup_tips(8, p300m)
             for j in range(1, len_titration - 1):
                 stock = ((metal // metal_rows) * len_titration) + (len_titration - 1)
                 col = ((metal // metal_rows) * len_titration) + j
@@ -236,7 +204,7 @@ def titrate(protocol):
             p300m.drop_tip()
     if metals % 8 != 0:
         num_tips = metals % 8
-        pickup_tips(num_tips, p300m, protocol)
+        tips.pickup_tips(num_tips, p300m)
         metal = metals - 1
         for j in range(1, len_titration - 1):
             stock = ((metal // metal_rows) * len_titration) + (len_titration - 1)